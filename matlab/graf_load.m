@@ -17,8 +17,22 @@ function g = graf_load(filepath)
 %       .y_axis_L       - scale struct
 %       .y_axis_R       - scale struct
 %       .z_axis         - scale struct
-%       .traces         - struct indexed by trace name (Tr0, Tr1, ...)
+%       .traces         - struct indexed by trace name (Tr0, Tr1, ...); axes
+%                         stored as a trace table (see read_trace_table)
+%                         come back the same way, with every saved field
 %       .surfaces       - struct indexed by surface name (Sf0, Sf1, ...)
+%
+%   Files written with write_graf(..., storage=...) hold their large arrays
+%   as chunked, gzip/shuffle-filtered datasets. h5read decodes those through
+%   the standard HDF5 filter pipeline, so nothing here changes. The 'lzf'
+%   option is h5py-specific and is NOT readable from MATLAB; use 'gzip' for
+%   files that need to open here.
+%
+%   Files written with write_graf(..., precision=...) may hold trace data and
+%   surface grids as float32/float16 or as quantized integer codes (see
+%   PrecisionPolicy in Python). hdf5_read_data decodes them back to double.
+%   MATLAB's h5read has no half-precision type, so use 'float32' or
+%   'quantize' rather than 'float16' for files that need to open here.
 
     info = h5info(filepath);
     g = struct();
@@ -63,7 +77,9 @@ function ax = read_axis(filepath, ax_path, ax_info)
     % Traces
     ax.traces = struct();
     tr_group = hdf5_find_group(ax_info, 'traces');
-    if ~isempty(tr_group)
+    if ~isempty(tr_group) && is_record_table(filepath, [ax_path '/traces'])
+        ax.traces = read_trace_table(filepath, [ax_path '/traces']);
+    elseif ~isempty(tr_group)
         for ti = 1:numel(tr_group.Groups)
             tr_info = tr_group.Groups(ti);
             tr_name = last_token(tr_info.Name);
@@ -111,9 +127,9 @@ function tr = read_trace(filepath, tr_path)
     tr.line_type     = hdf5_read_str(filepath, [tr_path '/line_type']);
     tr.marker_type   = hdf5_read_str(filepath, [tr_path '/marker_type']);
 
-    tr.x_data = double(h5read(filepath, [tr_path '/x_data']));
-    tr.y_data = double(h5read(filepath, [tr_path '/y_data']));
-    tr.z_data = double(h5read(filepath, [tr_path '/z_data']));
+    tr.x_data = hdf5_read_data(filepath, [tr_path '/x_data']);
+    tr.y_data = hdf5_read_data(filepath, [tr_path '/y_data']);
+    tr.z_data = hdf5_read_data(filepath, [tr_path '/z_data']);
 
     tr.line_color   = double(h5read(filepath, [tr_path '/line_color']));
     tr.marker_color = double(h5read(filepath, [tr_path '/marker_color']));
@@ -124,10 +140,10 @@ function tr = read_trace(filepath, tr_path)
 
     % Error bar fields
     tr.has_error_bars  = hdf5_read_bool(filepath, [tr_path '/has_error_bars']);
-    tr.x_err_neg       = double(h5read(filepath, [tr_path '/x_err_neg']));
-    tr.x_err_pos       = double(h5read(filepath, [tr_path '/x_err_pos']));
-    tr.y_err_neg       = double(h5read(filepath, [tr_path '/y_err_neg']));
-    tr.y_err_pos       = double(h5read(filepath, [tr_path '/y_err_pos']));
+    tr.x_err_neg       = hdf5_read_data(filepath, [tr_path '/x_err_neg']);
+    tr.x_err_pos       = hdf5_read_data(filepath, [tr_path '/x_err_pos']);
+    tr.y_err_neg       = hdf5_read_data(filepath, [tr_path '/y_err_neg']);
+    tr.y_err_pos       = hdf5_read_data(filepath, [tr_path '/y_err_pos']);
     tr.err_line_color  = double(h5read(filepath, [tr_path '/err_line_color']));
     tr.err_cap_color   = double(h5read(filepath, [tr_path '/err_cap_color']));
     tr.err_line_width  = double(h5read(filepath, [tr_path '/err_line_width']));
@@ -136,6 +152,66 @@ function tr = read_trace(filepath, tr_path)
     tr.err_cap_visible = hdf5_read_bool(filepath, [tr_path '/err_cap_visible']);
 end
 
+function traces = read_trace_table(filepath, tbl_path)
+% Axes with many traces are stored column-wise (pytype 'record_table'):
+%   keys      - trace names (Tr0, Tr1, ...)
+%   <field>   - one dataset per scalar field, element i for trace i; colors
+%               are N x k arrays, fields that mix types are JSON strings
+%   <field>/  - one group per data field: 'values' holds every distinct
+%               array concatenated, 'offsets' their 0-based starts (plus the
+%               end), 'slots' the 0-based distinct array each trace uses
+% Every field is read once and split into one struct per trace.
+    traces = struct();
+    names = hdf5_read_str_array(filepath, [tbl_path '/keys']);
+    fields = jsondecode(normalize_str(h5readatt(filepath, tbl_path, 'fields')));
+    n = numel(names);
+    cols = cell(numel(fields), 1);
+    for fi = 1:numel(fields)
+        f_path = [tbl_path '/' fields{fi}];
+        try
+            offsets = double(h5read(filepath, [f_path '/offsets']));
+        catch
+            cols{fi} = hdf5_read_column(filepath, f_path, n);
+            continue;
+        end
+        values = hdf5_read_data(filepath, [f_path '/values']);
+        slots  = double(h5read(filepath, [f_path '/slots'])) + 1;
+        col = cell(n, 1);
+        for i = 1:n
+            col{i} = values(offsets(slots(i)) + 1 : offsets(slots(i) + 1));
+        end
+        cols{fi} = col;
+    end
+    for i = 1:n
+        tr = struct();
+        for fi = 1:numel(fields)
+            tr.(fields{fi}) = cols{fi}{i};
+        end
+        traces.(names{i}) = tr;
+    end
+end
+
+function col = hdf5_read_column(filepath, dset_path, n)
+% One scalar field of a trace table as an n x 1 cell array (see 'coltype').
+    coltype = normalize_str(h5readatt(filepath, dset_path, 'coltype'));
+    switch coltype
+        case {'str', 'json'}
+            col = hdf5_read_str_array(filepath, dset_path);
+            if strcmp(coltype, 'json')
+                col = cellfun(@jsondecode, col, 'UniformOutput', false);
+            end
+            col = col(:);
+        case {'int_tuple', 'float_tuple'}
+            raw = double(h5read(filepath, dset_path));   % k x n (column-major)
+            col = num2cell(raw, 1)';
+        case 'bool'
+            col = num2cell(logical(h5read(filepath, dset_path)));
+        otherwise
+            col = num2cell(double(h5read(filepath, dset_path)));
+    end
+    col = reshape(col, n, 1);
+end
+
 % ---------------------------------------------------------------------------
 % Surface
 % ---------------------------------------------------------------------------
@@ -149,17 +225,73 @@ function sf = read_surface(filepath, sf_path)
     sf.colorbar_orientation = hdf5_read_str(filepath, [sf_path '/colorbar_orientation']);
     sf.alpha = double(h5read(filepath, [sf_path '/alpha']));
 
-    % 2D grids: Python stores row-major (C order); h5read gives column-major,
-    % which already corresponds to the correct layout for MATLAB surf/pcolor.
-    sf.x_grid = double(h5read(filepath, [sf_path '/x_grid']))';
-    sf.y_grid = double(h5read(filepath, [sf_path '/y_grid']))';
-    sf.z_grid = double(h5read(filepath, [sf_path '/z_grid']))';
+    % x/y grids may be stored compactly (see Surface.grid_layout in Python):
+    %   GRID_UNIFORM     - [start, step, count] per axis
+    %   GRID_RECTILINEAR - one 1-D vector per axis (x per column, y per row)
+    %   GRID_CURVILINEAR - full 2-D arrays (also what older files contain)
+    % They are expanded to full 2-D grids here so graf_to_fig is unchanged.
+    sf.grid_layout = hdf5_read_str(filepath, [sf_path '/grid_layout']);
+    x_raw = hdf5_read_data(filepath, [sf_path '/x_grid']);
+    y_raw = hdf5_read_data(filepath, [sf_path '/y_grid']);
+    switch sf.grid_layout
+        case 'GRID_UNIFORM'
+            x_vec = x_raw(1) + x_raw(2) * (0:x_raw(3)-1);
+            y_vec = y_raw(1) + y_raw(2) * (0:y_raw(3)-1);
+            [sf.x_grid, sf.y_grid] = meshgrid(x_vec, y_vec);
+        case 'GRID_RECTILINEAR'
+            [sf.x_grid, sf.y_grid] = meshgrid(x_raw(:)', y_raw(:)');
+        otherwise
+            % 2D grids: Python stores row-major (C order); h5read gives column-major,
+            % which already corresponds to the correct layout for MATLAB surf/pcolor.
+            sf.x_grid = x_raw';
+            sf.y_grid = y_raw';
+    end
+    sf.z_grid = hdf5_read_data(filepath, [sf_path '/z_grid'])';
 end
 
 % ---------------------------------------------------------------------------
 % HDF5 helpers
 % ---------------------------------------------------------------------------
 
+function arr = hdf5_read_data(filepath, dset_path)
+% Read a numeric data array as double, decoding quantized datasets
+% (graf_encoding = 'quantize': value = offset + code * scale, with the top
+% three codes of the integer type reserved for NaN, +Inf and -Inf) and
+% arithmetic sequences (pytype 'arithmetic': [start, step, n, last]).
+% float32/float16 datasets need no decoding beyond the conversion to double.
+% Arrays shared by several traces are HDF5 hard links and read normally.
+    raw = h5read(filepath, dset_path);
+    arr = double(raw);
+    try
+        pytype = normalize_str(h5readatt(filepath, dset_path, '__pytype__'));
+    catch
+        pytype = '';
+    end
+    if strcmp(pytype, 'arithmetic')
+        p = arr(:);
+        arr = p(1) + p(2) * (0:p(3)-1)';
+        if p(3) > 0
+            arr(end) = p(4);
+        end
+        return;
+    end
+    try
+        enc = normalize_str(h5readatt(filepath, dset_path, 'graf_encoding'));
+    catch
+        enc = '';
+    end
+    if strcmp(enc, 'quantize')
+        scale  = double(h5readatt(filepath, dset_path, 'graf_scale'));
+        offset = double(h5readatt(filepath, dset_path, 'graf_offset'));
+        top = double(intmax(class(raw)));
+        codes = arr;
+        arr = offset + codes * scale;
+        arr(codes == top)     = NaN;
+        arr(codes == top - 1) = Inf;
+        arr(codes == top - 2) = -Inf;
+    end
+end
+
 function val = hdf5_read_scalar(filepath, dset_path, default_val)
 % Read a scalar double dataset; return default_val if the dataset is absent.
     try
@@ -238,6 +370,15 @@ function s = normalize_str(raw)
     s = strtrim(strrep(s, char(0), ''));
 end
 
+function tf = is_record_table(filepath, grp_path)
+% True if the group is a column-wise record table (see read_trace_table).
+    try
+        tf = strcmp(normalize_str(h5readatt(filepath, grp_path, '__pytype__')), 'record_table');
+    catch
+        tf = false;
+    end
+end
+
 function grp = hdf5_find_group(parent_info, name)
 % Return the sub-group info struct whose name ends in /name, or [].
     grp = [];
@@ -2,18 +2,25 @@ import h5py
 import json
 import pickle
 import matplotlib
-import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
 from abc import ABC, abstractmethod
 # from stardust.io import hdf_to_dict, dict_to_hdf
-from stardust.tome import dict_to_tome, tome_to_dict
 from stardust.serializer import Packable
 import pylogfile.base as plf
 from stardust.io import dict_summary
+from graf.storage import StorageOptions, LazyArray, INDEX_KEY, read_group, read_value, read_json
+from graf.storage import write_value, write_dict, write_json, replace_value, append_list_item, recorded_storage
+from graf.storage import init_root, create_extendable, extend_dataset
+from graf.storage import PrecisionPolicy, EncodedArray, ArithmeticArray, RecordTable, is_record_table
+from graf.storage import DecimationPolicy
+from graf.storage import leaf_digest, entries_digest, tree_digest, refresh_digests, verify_digests, diff_digests
+from graf.storage import stored_digest, ATTR_DIGEST
+from graf.codecs import get_codec, read_graf_packet, select_axis_keys
 import matplotlib.font_manager as fm
 import os
 from matplotlib.gridspec import GridSpec
 import matplotlib.colors as mcolors
+import matplotlib.ticker as mticker
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 import mpl_toolkits.mplot3d as mpl3d
 from matplotlib.collections import QuadMesh
@@ -24,6 +31,9 @@ import numpy as np
 from colorama import Fore, Style
 import hashlib
 import platform
+import threading
+import itertools
+import concurrent.futures
 import socket
 import sys
 import datetime
@@ -37,6 +47,17 @@ import datetime
 
 GRAF_VERSION = "0.0.0"
 PROVENANCE_SCHEMA = "1.0"   # version of the info.provenance / info.history layout
+INDEX_SCHEMA = "1.0"        # version of the root table-of-contents layout (INDEX_KEY)
+ARCHIVE_SCHEMA = "1.0"      # version of the GrafArchive layout and its root index
+
+# Root attribute marking a GrafArchive (holding its ARCHIVE_SCHEMA)
+ATTR_ARCHIVE = "graf_archive"
+
+# Axes with at least this many traces are written as a trace table (see
+# storage.RecordTable): a fixed number of datasets per axis instead of some
+# twenty-five per trace. write_graf(trace_table_min=...) overrides it; 0
+# disables tables.
+TRACE_TABLE_MIN_TRACES = 256
 LINE_TYPES = ["-", "-.", ":", "--", "None"]
 
 # gid tag applied to the invisible marker-only companion artists that
@@ -124,7 +145,7 @@ def _cpu_model() -> str:
 		return ""
 
 
-def _system_info() -> dict:
+def _probe_system_info() -> dict:
 	"""Machine identity for retroactive workstation tracking. This is mildly
 	identifying (hostname, CPU) but intended for a personal/internal archive;
 	pass include_system_info=False to write_graf/save_graf to omit it. Username
@@ -148,10 +169,47 @@ def _system_info() -> dict:
 	return info
 
 
+# The machine identity is probed once per process (the CPU probe can spawn a
+# subprocess) and shared by every save; see system_info().
+_SYSTEM_INFO = None
+_SYSTEM_INFO_LOCK = threading.Lock()
+
+
+def system_info(refresh:bool=False) -> dict:
+	"""The machine identity stamped into provenance (hostname, os_platform,
+	machine_arch, cpu_model). Probed on first use and cached for the rest of
+	the process, unless set with set_system_info(); refresh=True probes
+	again. Returns a copy."""
+	global _SYSTEM_INFO
+	with _SYSTEM_INFO_LOCK:
+		if _SYSTEM_INFO is None or refresh:
+			_SYSTEM_INFO = _probe_system_info()
+		return dict(_SYSTEM_INFO)
+
+
+def set_system_info(info:dict=None, **fields) -> dict:
+	"""Sets the machine identity used by every later save in this process,
+	so the machine is never probed - e.g. a batch job taking it from its
+	manifest: set_system_info(manifest["machine"]). Keyword fields are
+	merged over `info`. With no arguments the identity is cleared and probed
+	again on the next save. Returns the new identity."""
+	global _SYSTEM_INFO
+	with _SYSTEM_INFO_LOCK:
+		if info is None and not fields:
+			_SYSTEM_INFO = None
+			return {}
+		_SYSTEM_INFO = {str(k): str(v) for k, v in {**(info or {}), **fields}.items()}
+		return dict(_SYSTEM_INFO)
+
+
 def _json_default(o):
-	"""Coerce numpy / bytes / complex into JSON-safe values for stable hashing."""
-	if isinstance(o, np.ndarray):
-		return o.tolist()
+	"""Coerce numpy / bytes / complex into JSON-safe values (e.g. for the index)."""
+	if isinstance(o, (np.ndarray, LazyArray)):
+		return np.asarray(o).tolist()
+	if isinstance(o, EncodedArray):
+		return o.source.tolist()
+	if isinstance(o, ArithmeticArray):
+		return o.expand().tolist()
 	if isinstance(o, np.integer):
 		return int(o)
 	if isinstance(o, np.floating):
@@ -168,17 +226,144 @@ def _json_default(o):
 	return str(o)
 
 
+# Bumped whenever mark_modified() (or replacing a field) makes an array this
+# module froze writeable again. Cached digests from an older generation are
+# not trusted, since the array may be shared with other nodes.
+_thaw_generation = 0
+
+
+def _freeze(arr) -> bool:
+	"""Makes `arr` read-only so no in-place write can slip past its cached
+	digest. Returns True if this froze it, False if it was read-only already.
+	Raises ValueError if freezing wouldn't protect it (a view of a writeable
+	array can change through its base)."""
+	if not isinstance(arr, np.ndarray) or not arr.flags.writeable:
+		return False
+	base = arr.base
+	while isinstance(base, np.ndarray):
+		if base.flags.writeable:
+			raise ValueError("view of a writeable array")
+		base = base.base
+	arr.flags.writeable = False
+	return True
+
+
+def _thaw(entry):
+	"""Undoes _freeze for a _digest_cache entry."""
+	global _thaw_generation
+	val, _, _, froze = entry
+	if froze:
+		val.flags.writeable = True
+		_thaw_generation += 1
+
+
+def _node_digest(obj:Packable, exclude=(), overrides:dict=None) -> bytes:
+	"""tree_digest(obj.pack()) computed from the live object, reusing the
+	cached digests of _TrackedNode array fields instead of re-hashing them.
+	Fields named in `exclude` are left out; `overrides` maps field names to
+	digests to use in place of their own."""
+	cache = obj.__dict__.setdefault("_digest_cache", {}) if isinstance(obj, _TrackedNode) else None
+	overrides = overrides or {}
+	exclude = tuple(exclude) + tuple(overrides)
+	if isinstance(obj, _TrackedNode):
+		exclude += obj._omitted_fields()
+	entries = list(overrides.items())
+	for mi in obj.manifest:
+		if mi in exclude:
+			continue
+		val = getattr(obj, mi)
+		if cache is not None and isinstance(val, (np.ndarray, LazyArray)):
+			hit = cache.get(mi)
+			if hit is None or hit[0] is not val or hit[2] != _thaw_generation or \
+					(isinstance(val, np.ndarray) and val.flags.writeable):
+				digest = leaf_digest(val)
+				try:
+					froze = _freeze(val) or (hit is not None and hit[0] is val and hit[3])
+				except ValueError:
+					cache.pop(mi, None)  # can't be protected: re-hashed every time
+					entries.append((mi, digest))
+					continue
+				hit = cache[mi] = (val, digest, _thaw_generation, froze)
+			entries.append((mi, hit[1]))
+		else:
+			entries.append((mi, tree_digest(val)))
+	for mi in obj.obj_manifest:
+		if mi not in exclude:
+			entries.append((mi, _node_digest(getattr(obj, mi))))
+	for mi in obj.list_manifest:
+		if mi not in exclude:
+			entries.append((mi, leaf_digest([x.pack() for x in getattr(obj, mi)])))
+	for mi in obj.dict_manifest:
+		if mi not in exclude:
+			children = getattr(obj, mi)
+			entries.append((mi, entries_digest((str(k), _node_digest(v)) for k, v in children.items())))
+	return entries_digest(entries)
+
+
+class _TrackedNode:
+	''' Mixin for the Packables that hold data arrays (Trace, Surface, Scale,
+	Axis, Graf). The digest of each array field is cached the first time it
+	is hashed and dropped when the field is reassigned, so hashing a Graf
+	only re-reads the arrays that were replaced since the last hash.
+
+	numpy cannot report in-place writes, so a hashed array is made
+	read-only (trace.y_data[3] = 0.0 then raises ValueError). Call
+	mark_modified() on its owner to make its arrays writeable again before
+	editing them in place. Arrays that are views of a writeable array can't
+	be protected that way and are re-hashed every time instead. Arrays that
+	a file stores once for several traces (e.g. a shared x-axis) are read
+	back as read-only views of one array and stay read-only: assign a copy
+	to edit one. '''
+
+	def __setattr__(self, name, value):
+		cache = self.__dict__.get("_digest_cache")
+		entry = cache.pop(name, None) if cache else None
+		if entry is not None and entry[0] is not value:
+			_thaw(entry)
+		object.__setattr__(self, name, value)
+
+	def mark_modified(self):
+		''' Makes the arrays of this object (not of its children) writeable
+		again and forgets their cached digests. '''
+		for entry in self.__dict__.get("_digest_cache", {}).values():
+			_thaw(entry)
+		self.__dict__["_digest_cache"] = {}
+
+	def content_hash(self) -> str:
+		''' SHA-256 (hex) of this object's packed content (see graf.storage.tree_digest). '''
+		return _node_digest(self).hex()
+
+	def _omitted_fields(self) -> tuple:
+		''' Manifest fields that pack() leaves out in the current state. '''
+		return ()
+
+
 def _stable_content_hash(obj) -> str:
-	"""Deterministic SHA-256 of a packed structure (keys sorted). Used to detect
-	whether the data actually changed between saves, and to fingerprint content."""
+	"""Deterministic SHA-256 (hex) of a packed structure (see graf.storage.tree_digest).
+	Used to detect whether the data actually changed between saves, and to
+	fingerprint content."""
 	try:
-		blob = json.dumps(obj, sort_keys=True, default=_json_default,
-						  ensure_ascii=False).encode("utf-8")
-		return hashlib.sha256(blob).hexdigest()
+		return tree_digest(obj).hex()
 	except Exception:
 		return ""
 
 
+def _options_key(options):
+	"""Comparable stand-in for a storage/precision argument of write_graf."""
+	if options is None or isinstance(options, (str, int, float)):
+		return options
+	return _stable_content_hash(getattr(options, "__dict__", options))
+
+
+def _file_stamp(path: str):
+	"""(size, mtime_ns, inode) of a file, or None if it does not exist."""
+	try:
+		st = os.stat(path)
+		return (st.st_size, st.st_mtime_ns, st.st_ino)
+	except OSError:
+		return None
+
+
 def _sha256_file(path: str) -> str:
 	"""SHA-256 of a source file's bytes (for verifiable 'this came from that')."""
 	try:
@@ -190,6 +375,216 @@ def _sha256_file(path: str) -> str:
 	except Exception:
 		return ""
 
+# ==============================================================================
+# Table of contents
+# ------------------------------------------------------------------------------
+# write_graf stores a small JSON index at the file root (storage.INDEX_KEY)
+# describing every axis, trace and surface: where it lives, what it is, and
+# shape/dtype/range statistics for each data array. inspect_graf() reads only
+# that one dataset, so cataloguing a directory of files never touches data.
+# ==============================================================================
+
+def _array_stats(arr, with_values:bool=True) -> dict:
+	''' Shape, dtype, byte size and (optionally) finite min/max and NaN count
+	of a data array. with_values=False reports only what is known without
+	reading the data (used for LazyArrays when rebuilding a missing index). '''
+
+	if isinstance(arr, EncodedArray):
+		stats = _array_stats(arr.source, with_values=with_values)
+		stats["encoding"] = arr.encoding
+		stats["max_error"] = arr.max_error
+		stats["stored_nbytes"] = int(arr.data.nbytes)
+		return stats
+
+	if isinstance(arr, ArithmeticArray):
+		lo, hi = sorted((arr.start, arr.last))
+		cast = int if arr.dtype.kind in "iu" else float
+		return {"shape": [arr.n], "dtype": str(arr.dtype), "nbytes": arr.n * arr.dtype.itemsize,
+				"min": cast(lo), "max": cast(hi), "nan_count": 0,
+				"encoding": "arithmetic", "max_error": 0.0, "stored_nbytes": 32}
+
+	if isinstance(arr, LazyArray) and not with_values:
+		return {"shape": list(arr.shape), "dtype": str(arr.dtype), "nbytes": int(arr.nbytes),
+				"min": None, "max": None, "nan_count": None}
+
+	a = np.asarray(arr)
+	stats = {"shape": list(a.shape), "dtype": str(a.dtype), "nbytes": int(a.nbytes),
+			 "min": None, "max": None, "nan_count": 0}
+	if a.size == 0 or a.dtype.kind not in "biuf":
+		return stats
+	if a.dtype.kind == "f":
+		stats["nan_count"] = int(np.count_nonzero(np.isnan(a)))
+		finite = a[np.isfinite(a)]
+	else:
+		finite = a
+	if finite.size:
+		stats["min"] = finite.min().item()
+		stats["max"] = finite.max().item()
+	return stats
+
+def _index_entry(path:str, kind:str, label:str, obj_type:str, arrays:dict, primary:str, with_values:bool) -> dict:
+	''' One table-of-contents entry for a trace or surface. The entry-level
+	shape/dtype/min/max/nan_count describe the primary (dependent) array; nbytes
+	is the total over all arrays; per-array stats are under 'datasets'. '''
+
+	datasets = {}
+	for name, arr in arrays.items():
+		if arr is None or (not isinstance(arr, (np.ndarray, LazyArray, EncodedArray, ArithmeticArray, list))):
+			continue
+		if len(arr) == 0:
+			continue
+		datasets[name] = _array_stats(arr, with_values=with_values)
+
+	entry = {"path": path, "kind": kind, "label": label, "type": obj_type}
+	prim = datasets.get(primary, {"shape": [0], "dtype": "", "min": None, "max": None, "nan_count": 0})
+	for k in ("shape", "dtype", "min", "max", "nan_count"):
+		entry[k] = prim.get(k)
+	entry["nbytes"] = int(sum(d["nbytes"] for d in datasets.values()))
+	entry["datasets"] = datasets
+	return entry
+
+def _trace_index_entry(path:str, tr:dict, with_values:bool=True) -> dict:
+	''' Table-of-contents entry for a packed Trace stored at `path`. '''
+	primary = "z_data" if tr.get("trace_type") == Trace.TRACE_LINE3D else "y_data"
+	return _index_entry(path, "trace", str(tr.get("display_name", "")), str(tr.get("trace_type", "")),
+						{f: tr.get(f) for f in Trace.DATA_FIELDS}, primary, with_values)
+
+def _surface_index_entry(path:str, sf:dict, with_values:bool=True) -> dict:
+	''' Table-of-contents entry for a packed Surface stored at `path`. '''
+	return _index_entry(path, "surface", str(sf.get("display_name", "")), str(sf.get("surf_type", "")),
+						{f: sf.get(f) for f in ("x_grid", "y_grid", "z_grid")}, "z_grid", with_values)
+
+def _axis_index_entries(ax_key:str, ax:dict, with_values:bool=True) -> list:
+	''' Table-of-contents entries for a packed Axis: the axis itself followed
+	by each of its traces and surfaces. '''
+
+	ax_path = f"axes/{ax_key}"
+	traces = ax.get("traces", {}) or {}
+	surfaces = ax.get("surfaces", {}) or {}
+	entries = [{
+		"path": ax_path, "kind": "axis", "label": str(ax.get("title", "")),
+		"type": str(ax.get("axis_type", "")),
+		"position": [int(v) for v in ax.get("position", [0, 0])],
+		"span": [int(v) for v in ax.get("span", [1, 1])],
+		"n_traces": len(traces), "n_surfaces": len(surfaces),
+	}]
+	if isinstance(traces, RecordTable):
+		# Trace paths stay 'axes/AxN/traces/TrN', naming rows of the table
+		entries[0]["trace_layout"] = "table"
+		traces = traces.records
+	for tr_key, tr in traces.items():
+		entries.append(_trace_index_entry(f"{ax_path}/traces/{tr_key}", tr, with_values))
+	for sf_key, sf in surfaces.items():
+		entries.append(_surface_index_entry(f"{ax_path}/surfaces/{sf_key}", sf, with_values))
+	return entries
+
+def _graf_index(packet:dict, with_values:bool=True) -> dict:
+	''' Builds the table of contents for a packed Graf (as returned by
+	Graf.pack()). Paths are the HDF5 paths of each group in the file. '''
+
+	info = packet.get("info", {}) if isinstance(packet.get("info", {}), dict) else {}
+	entries = []
+	axes = packet.get("axes", {}) or {}
+	for ax_key, ax in axes.items():
+		entries.extend(_axis_index_entries(ax_key, ax, with_values))
+
+	return {
+		"index_schema": INDEX_SCHEMA,
+		"graf_version": str(info.get("version", GRAF_VERSION)),
+		"supertitle": str(packet.get("supertitle", "")),
+		"description": str(info.get("description", "")),
+		"n_axes": len(axes),
+		"entries": entries,
+	}
+
+def _encode_fields(packet:dict, fields, precision):
+	''' Replaces the float arrays named in `fields` of a packed Trace/Surface
+	with their lossy encodings under `precision` (in place on the packet
+	dict, never on the object it was packed from). '''
+
+	policy = PrecisionPolicy.coerce(precision)
+	if policy is None:
+		return
+	for f in fields:
+		if f in packet and isinstance(packet[f], (np.ndarray, LazyArray)):
+			packet[f] = policy.encode(packet[f])
+
+def _encode_trace_packet(packet:dict, tr, precision):
+	''' Stores exact arithmetic sequences (typically linspace x-axes) of a
+	packed Trace as [start, step, n, last], then applies the lossy precision
+	policy to the remaining float arrays. '''
+
+	for f in Trace.DATA_FIELDS:
+		if isinstance(packet.get(f), (np.ndarray, LazyArray)):
+			seq = ArithmeticArray.detect(np.asarray(packet[f]))
+			if seq is not None:
+				packet[f] = seq
+	_encode_fields(packet, Trace.DATA_FIELDS, tr.precision if tr.precision is not None else precision)
+
+def _decimated(x, y, policy:DecimationPolicy):
+	''' The fields of a 2D line trace holding (x, y) once decimated under
+	`policy` (display envelope in x_data / y_data, full data in x_full /
+	y_full unless dropped), or None if it is short enough to keep. '''
+
+	x = np.asarray(x)
+	y = np.asarray(y)
+	if len(x) != len(y):
+		return None
+	idx = policy.indices(y)
+	if idx is None:
+		return None
+	return {
+		"x_data": x[idx], "y_data": y[idx],
+		"x_full": x if policy.keep_full else np.empty(0, dtype=x.dtype),
+		"y_full": y if policy.keep_full else np.empty(0, dtype=y.dtype),
+		"decimation": policy.method, "full_length": len(y),
+	}
+
+def _decimate_axis_packet(packet:dict, ax, policy:DecimationPolicy):
+	''' Replaces the data of each long 2D line of a packed Axis with its
+	display envelope (on the packet only, never on the Axis itself). Error
+	bar and 3D traces are left as they are. '''
+
+	for key, tr in ax.traces.items():
+		if tr.trace_type != Trace.TRACE_LINE2D or tr.has_error_bars:
+			continue
+		fields = _decimated(*tr._source_data(), policy)
+		if fields is not None:
+			packet["traces"][key].update(fields)
+
+def _trace_table(packet:dict, traces:dict, precision):
+	''' Packed traces of one axis as a RecordTable, or None if they cannot be
+	tabulated. The precision policy is applied to each concatenated data
+	column (so a rel_tol is relative to the range over all of the axis's
+	traces), and is only used if every trace resolves to the same one;
+	otherwise the table is stored exactly. Traces that were not decimated
+	get empty decimation fields if others were. '''
+
+	policies = [PrecisionPolicy.coerce(tr.precision if tr.precision is not None else precision)
+				for tr in traces.values()]
+	specs = {json.dumps(p.to_dict() if p is not None else None, sort_keys=True) for p in policies}
+	policy = policies[0] if len(specs) == 1 else None
+	return RecordTable.build(packet, ragged=Trace.DATA_FIELDS, encode=policy.encode if policy is not None else None,
+							 optional=Trace.DECIMATION_DEFAULTS)
+
+def _encode_axis_packet(packet:dict, ax, precision, table_min:int=None):
+	''' Applies each trace's/surface's own precision (or `precision`) to a
+	packed Axis. Uniform surface grids ([start, step, count]) stay exact.
+	Axes with at least `table_min` traces (default TRACE_TABLE_MIN_TRACES)
+	get their traces stored as one trace table. '''
+
+	if table_min is None:
+		table_min = TRACE_TABLE_MIN_TRACES
+	table = _trace_table(packet["traces"], ax.traces, precision) if len(ax.traces) >= table_min > 0 else None
+	if table is not None:
+		packet["traces"] = table
+	else:
+		for key, tr in ax.traces.items():
+			_encode_trace_packet(packet["traces"][key], tr, precision)
+	for key, sf in ax.surfaces.items():
+		fields = ("z_grid",) if sf.grid_layout == Surface.GRID_UNIFORM else ("x_grid", "y_grid", "z_grid")
+		_encode_fields(packet["surfaces"][key], fields, sf.precision if sf.precision is not None else precision)
+
 try:
 	# Requires Python >= 3.9
 	import importlib.resources
@@ -248,7 +643,7 @@ def sample_colormap(cmap_name:str=None, listed_cmap:mcolors.ListedColormap=None,
 		cmap = listed_cmap.resampled(N) # Resample in requested resolution
 		colors = [cmap(i) for i in range(N)]
 	elif cmap_name is not None:
-		cmap = plt.get_cmap(cmap_name) # Get ListedColormap from name
+		cmap = matplotlib.colormaps.get_cmap(cmap_name) # Get ListedColormap from name
 		colors = [cmap(i / (N - 1)) for i in range(N)]
 	else:
 		raise Exception("A colormap name or object must be provided")
@@ -359,37 +754,241 @@ def _unparse_marker(graf_marker_code) -> str:
 		return 's'
 	return graf_marker_code
 
+def _key_index(key:str):
+	''' Returns N from a 'TrN' / 'SfN' / 'AxN' key, or None. '''
+	try:
+		return int(key[2:])
+	except (TypeError, ValueError):
+		return None
+
+def _as_data_array(values, copy:bool=False) -> np.ndarray:
+	''' Returns `values` as a contiguous NumPy array in its original dtype.
+
+	Trace data is held as ndarrays end-to-end (capture, pack, TOME dataset,
+	unpack) so a million-point float32 or int16 trace is never inflated into a
+	list of Python floats. Non-numeric inputs (e.g. object arrays produced by
+	matplotlib unit conversion, or legacy files that stored lists) are coerced
+	to float64, which is what GrAF always stored before. Pass copy=True when
+	capturing from an artist so later edits to the source don't leak in;
+	with copy=False a numeric, contiguous source is returned as-is (no copy). '''
+
+	if values is None:
+		return np.empty(0)
+	arr = np.array(values) if copy else np.asarray(values)
+	if arr.dtype.kind not in "biuf":
+		try:
+			arr = arr.astype(np.float64)
+		except (TypeError, ValueError):
+			arr = np.asarray([float(v) for v in np.ravel(arr)])
+	return np.ascontiguousarray(arr)
+
+def _as_grid_array(values, copy:bool=False) -> np.ndarray:
+	''' Like _as_data_array, for surface grids. Masked arrays (pcolormesh and
+	imshow hand those back) are filled with NaN so the mask survives on disk
+	as a plain numeric dataset. '''
+
+	if np.ma.isMaskedArray(values):
+		if np.ma.getmaskarray(values).any():
+			values = np.ma.filled(values.astype(np.float64), np.nan)
+		else:
+			values = np.ma.getdata(values)
+	return _as_data_array(values, copy=copy)
+
+def _arithmetic_params(values, rel_tol:float=1e-12):
+	''' Returns (start, step) if `values` is an arithmetic sequence that
+	start + step*arange(n) reproduces to within rel_tol of its magnitude,
+	otherwise None. Used to store regular grids as (start, step, count). '''
+
+	arr = np.asarray(values)
+	if arr.ndim != 1 or len(arr) < 2 or arr.dtype.kind not in "biuf":
+		return None
+	arr = arr.astype(np.float64, copy=False)
+	if not np.all(np.isfinite(arr)):
+		return None
+	start = float(arr[0])
+	step = (float(arr[-1]) - start) / (len(arr) - 1)
+	recon = start + step * np.arange(len(arr))
+	scale = max(float(np.max(np.abs(arr))), abs(step), np.finfo(np.float64).tiny)
+	if np.max(np.abs(recon - arr)) > rel_tol * scale:
+		return None
+	return start, step
+
+def _patch_perimeter_offsets(rstride:int, cstride:int):
+	''' (row, col) offsets within a patch of each vertex of its perimeter, in
+	the order matplotlib's plot_surface emits them (cbook._array_perimeter:
+	top left-to-right, right side down, bottom right-to-left, left side up). '''
+
+	rs, cs = rstride, cstride
+	rows = np.concatenate((np.zeros(cs), np.arange(rs), np.full(cs, rs), np.arange(rs, 0, -1)))
+	cols = np.concatenate((np.arange(cs), np.full(rs, cs), np.arange(cs, 0, -1), np.zeros(rs)))
+	return rows.astype(np.intp), cols.astype(np.intp)
+
+def _surface_patch_grid(verts:np.ndarray, seg_lens:np.ndarray):
+	''' Rebuilds the (X, Y, Z) grids a plot_surface() Poly3DCollection was made
+	from, without sorting or hashing any coordinates, by recognizing its
+	face layout: row-major patches of rstride x cstride points, each emitted
+	as its perimeter. Points inside a patch (stride > 1) were never drawn and
+	are NaN. Returns None if the faces do not follow that layout (e.g.
+	non-finite data made matplotlib drop vertices). '''
+
+	n_faces = len(seg_lens)
+	if n_faces == 0 or not np.all(seg_lens == seg_lens[0]) or seg_lens[0] % 2 or seg_lens[0] < 4:
+		return None
+	per = int(seg_lens[0])
+	faces = verts.reshape(n_faces, per, 3)
+	half = per // 2
+	for cstride in range(1, half):
+		rstride = half - cstride
+		# The first patch of the second row starts at the first patch's
+		# bottom-left corner.
+		corner = faces[0, 2 * cstride + rstride]
+		hits = np.flatnonzero(np.all(faces[1:, 0, :2] == corner[:2], axis=1))
+		ncols = int(hits[0]) + 1 if len(hits) else n_faces
+		if n_faces % ncols:
+			continue
+		nrows = n_faces // ncols
+		pr, pc = _patch_perimeter_offsets(rstride, cstride)
+		rows = (np.arange(nrows)[:, None, None] * rstride + pr).repeat(ncols, axis=1).reshape(-1)
+		cols = (np.arange(ncols)[None, :, None] * cstride + pc).repeat(nrows, axis=0).reshape(-1)
+		flat = faces.reshape(-1, 3)
+		grid = np.full((nrows * rstride + 1, ncols * cstride + 1, 3), np.nan)
+		grid[rows, cols] = flat
+		# Every shared edge point must agree with the value that won
+		if np.array_equal(grid[rows, cols], flat, equal_nan=True):
+			return grid[..., 0], grid[..., 1], grid[..., 2]
+	return None
+
+def _nearest_index(values, targets) -> np.ndarray:
+	''' For each target, the index np.argmin(np.abs(values - target)) gives:
+	the nearest value, the lowest index on ties, and argmin's NaN rules. One
+	sort plus a binary search per target instead of a scan of `values` per
+	target; the rare targets whose answer rounding could make ambiguous (or
+	that are not finite) are settled by argmin itself. '''
+
+	vals = np.asarray(values, dtype=np.float64).reshape(-1)
+	tgt = np.asarray(targets, dtype=np.float64).reshape(-1)
+	if tgt.size == 0 or vals.size == 0:
+		return np.zeros(tgt.size, dtype=np.intp)
+	nans = np.flatnonzero(np.isnan(vals))
+	if nans.size:
+		# Some distance is NaN for every target; argmin returns the first
+		return np.where(np.isnan(tgt), 0, nans[0]).astype(np.intp)
+
+	order = np.argsort(vals, kind="stable")
+	svals = vals[order]
+	n = svals.size
+	pos = np.searchsorted(svals, tgt, side="left")
+	hi = np.minimum(pos, n - 1)
+	with np.errstate(invalid="ignore"):  # inf - inf, as argmin sees it
+		# Candidates are the first (lowest-index) entries of the runs of equal
+		# values on either side of the target
+		lo = np.searchsorted(svals, svals[np.maximum(pos - 1, 0)], side="left")
+		d_lo = np.abs(svals[lo] - tgt)
+		d_hi = np.abs(svals[hi] - tgt)
+		take_hi = (d_hi < d_lo) | ((d_hi == d_lo) & (order[hi] < order[lo]))
+		best = np.where(take_hi, hi, lo)
+		out = order[best]
+
+		# A farther run at exactly the same (rounded) distance would also be a
+		# candidate for argmin; so would anything for a non-finite target.
+		d = np.where(take_hi, d_hi, d_lo)
+		before = lo - 1
+		after = np.searchsorted(svals, svals[hi], side="right")
+		tie = ((before >= 0) & (np.abs(svals[np.maximum(before, 0)] - tgt) == d)) | \
+			  ((after < n) & (np.abs(svals[np.minimum(after, n - 1)] - tgt) == d))
+		for i in np.flatnonzero(tie | ~np.isfinite(tgt) | ~np.isfinite(d)):
+			out[i] = int(np.argmin(np.abs(vals - tgt[i])))
+	return out
+
+def _last_occurrence(idx:np.ndarray) -> np.ndarray:
+	''' Positions in `idx` of the last occurrence of each distinct value, so a
+	scatter through them matches writing every element in order. '''
+
+	_, first_from_end = np.unique(idx[::-1], return_index=True)
+	return len(idx) - 1 - first_from_end
+
+def _segment_endpoints(lc) -> np.ndarray:
+	''' First two points of every segment of a LineCollection, as an (n, 2, 2)
+	array. Plain two-point paths (what errorbar draws) are stacked straight
+	from their vertices; anything else goes through get_segments(), which
+	walks each path in Python. '''
+
+	paths = lc.get_paths()
+	if len(paths) == 0:
+		return np.empty((0, 2, 2))
+	if all(p.codes is None and len(p.vertices) == 2 for p in paths):
+		arr = np.asarray([p.vertices for p in paths], dtype=np.float64)
+		if np.isfinite(arr).all():
+			return arr
+	segs = lc.get_segments()
+	try:
+		arr = np.asarray(segs, dtype=np.float64)
+		if arr.ndim == 3 and arr.shape[1] >= 2 and arr.shape[2] == 2:
+			return arr[:, :2, :]
+	except ValueError:
+		pass
+	return np.array([np.asarray(s, dtype=np.float64)[:2] for s in segs])
+
+# Axes whose on-figure bounds agree to within this are at the same place
+TWIN_POSITION_TOL = 1e-3
+
 def has_twinx(ax):
 	''' Checks if a matplotlib axis has a twin-axis (specifically a 2nd Y that shares a common
 	X AND occupies the same location in the figure, e.g. created via ax.twinx()). Merely sharing
 	x-limits isn't enough - separate stacked subplots created with sharex=True also share x-limits
 	with every other panel via get_shared_x_axes(), but sit at different positions and are not
 	twins, so that alone would misclassify an entire sharex-linked gridspec/subplots figure as
-	twin pairs (dropping all but 2 of its axes). '''
+	twin pairs (dropping all but 2 of its axes).
 
-	# Get list of siblings that share x-limits
-	sibling_list = ax.get_shared_x_axes().get_siblings(ax)
-	own_bounds = ax.get_position().bounds
+	To classify every axis of a figure use _twinned_axes(), which does it in
+	one pass. '''
 
-	# Scan over all axes in figure
-	for fig_ax in ax.figure.axes:
+	own_bounds = ax.get_position().bounds
+	fig_axes = set(ax.figure.axes)
 
-		# Skip axis if is original axis
-		if fig_ax == ax:
+	# Only x-sharing siblings in the same figure at the same on-figure
+	# location count as a genuine twin.
+	for sib_ax in ax.get_shared_x_axes().get_siblings(ax):
+		if sib_ax is ax or sib_ax not in fig_axes:
 			continue
-
-		# Scan over all x-sharing siblings, only counting ones at the same
-		# on-figure location as a genuine twin.
-		for sib_ax in sibling_list:
-			if sib_ax != fig_ax:
-				continue
-			sib_bounds = sib_ax.get_position().bounds
-			if all(abs(a - b) < 1e-3 for a, b in zip(own_bounds, sib_bounds)):
-				return True
+		sib_bounds = sib_ax.get_position().bounds
+		if all(abs(a - b) < TWIN_POSITION_TOL for a, b in zip(own_bounds, sib_bounds)):
+			return True
 
 	# No twin was found
 	return False
 
+def _twinned_axes(axes) -> set:
+	''' The members of `axes` for which has_twinx() holds (counting only
+	twins within `axes`). Axes are bucketed by their bounds quantized to
+	TWIN_POSITION_TOL, so each one is only compared with the few axes at (or
+	next to) its own place rather than with every x-sharing sibling, which
+	keeps large sharex=True grids linear. '''
+
+	def cell(bounds):
+		return tuple(int(round(v / TWIN_POSITION_TOL)) for v in bounds)
+
+	bounds = {ax: ax.get_position().bounds for ax in axes}
+	buckets = {}
+	for ax, b in bounds.items():
+		buckets.setdefault(cell(b), []).append(ax)
+
+	# Bounds within the tolerance land in the same or an adjacent cell
+	neighbours = list(itertools.product((-1, 0, 1), repeat=4))
+	twinned = set()
+	for ax, b in bounds.items():
+		key = cell(b)
+		shared = ax.get_shared_x_axes()
+		for off in neighbours:
+			for other in buckets.get(tuple(k + o for k, o in zip(key, off)), ()):
+				if other is not ax and shared.joined(ax, other) and \
+						all(abs(p - q) < TWIN_POSITION_TOL for p, q in zip(b, bounds[other])):
+					twinned.add(ax)
+					break
+			if ax in twinned:
+				break
+	return twinned
+
 def _infer_grid_positions(axes, tol=0.01):
 	''' Infers a GridSpec-style (row, col) position + span for each axis by
 	coordinate-compressing its on-figure bounding box (ax.get_position(),
@@ -417,19 +1016,23 @@ def _infer_grid_positions(axes, tol=0.01):
 				clusters.append([v])
 		return [sum(c) / len(c) for c in clusters]
 
-	def nearest_index(edges, value):
-		return min(range(len(edges)), key=lambda i: abs(edges[i] - value))
-
 	x_edges = cluster([b.x0 for b in bboxes.values()] + [b.x1 for b in bboxes.values()])
 	y_edges = cluster([b.y0 for b in bboxes.values()] + [b.y1 for b in bboxes.values()])
 	num_rows = len(y_edges) - 1
 
+	# Snap every edge of every box to its grid line in one batch
+	boxes = list(bboxes.values())
+	x0_idx = _nearest_index(x_edges, [b.x0 for b in boxes])
+	x1_idx = _nearest_index(x_edges, [b.x1 for b in boxes])
+	y0_all = _nearest_index(y_edges, [b.y0 for b in boxes])
+	y1_all = _nearest_index(y_edges, [b.y1 for b in boxes])
+
 	positions = {}
-	for ax, b in bboxes.items():
-		col_start = nearest_index(x_edges, b.x0)
-		col_stop = max(nearest_index(x_edges, b.x1), col_start + 1)
-		y0_idx = nearest_index(y_edges, b.y0)
-		y1_idx = nearest_index(y_edges, b.y1)
+	for i, ax in enumerate(bboxes):
+		col_start = int(x0_idx[i])
+		col_stop = max(int(x1_idx[i]), col_start + 1)
+		y0_idx = int(y0_all[i])
+		y1_idx = int(y1_all[i])
 		# Grid rows are numbered top-to-bottom; figure y increases bottom-to-top.
 		row_start = num_rows - max(y1_idx, y0_idx + 1)
 		row_stop = num_rows - y0_idx
@@ -510,7 +1113,7 @@ class GraphStyle(Packable):
 		self.obj_manifest.append("graph_font")
 		self.obj_manifest.append("label_font")
 	
-class Surface(Packable):
+class Surface(_TrackedNode, Packable):
 	''' Represents a surface or image that can be displayed on a set of axes. 
 	Fundamentally what differentiates a surface from a Trace is if it has a single
 	independent axis or two.'''
@@ -518,6 +1121,13 @@ class Surface(Packable):
 	SURF_IMAGE = "SURF_IMAGE"
 	SURF_SURFACE = "SURF_SURFACE"
 	
+	# How x_grid/y_grid are stored. Curvilinear keeps full 2-D coordinate
+	# arrays; rectilinear keeps one 1-D vector per axis (x per column, y per
+	# row); uniform keeps [start, step, count] per axis.
+	GRID_CURVILINEAR = "GRID_CURVILINEAR"
+	GRID_RECTILINEAR = "GRID_RECTILINEAR"
+	GRID_UNIFORM = "GRID_UNIFORM"
+	
 	def __init__(self, mpl_source=None, log:plf.LogPile=None):
 		super().__init__(log)
 
@@ -526,9 +1136,12 @@ class Surface(Packable):
 		self.cmap = []
 
 		self.uniform_grid = False
-		self.x_grid = []
-		self.y_grid = []
-		self.z_grid = []
+		# Files written before grid_layout existed always hold 2-D grids, so
+		# curvilinear is the default that unpack() falls back to.
+		self.grid_layout = Surface.GRID_CURVILINEAR
+		self.x_grid = np.empty(0)
+		self.y_grid = np.empty(0)
+		self.z_grid = np.empty(0)
 		self.line_type = LINE_TYPES[0]
 		self.line_width = 1
 		self.display_name = ""
@@ -547,6 +1160,10 @@ class Surface(Packable):
 		self.colorbar_vmin = float('nan')
 		self.colorbar_vmax = float('nan')
 
+		# Write-time PrecisionPolicy overriding the one given to write_graf.
+		# Not saved - the encoding is recorded on each dataset instead.
+		self.precision = None
+
 		if mpl_source is not None:
 			self.mimic(mpl_source=mpl_source)
 	
@@ -601,10 +1218,10 @@ class Surface(Packable):
 			np.allclose(y_corners, y_corners[:, 0:1])
 		)
 
-		# Store corners — pcolormesh accepts (M+1)×(N+1) corner arrays directly
-		self.x_grid = x_corners.tolist()
-		self.y_grid = y_corners.tolist()
-		self.z_grid = mpl_source.get_array().tolist()
+		# Store corners — pcolormesh accepts (M+1)×(N+1) corner arrays, or the
+		# equivalent 1-D corner vectors when the mesh is rectilinear.
+		self._set_grid(x_corners, y_corners)
+		self.z_grid = _as_grid_array(mpl_source.get_array(), copy=True)
 
 		# Alpha
 		self.alpha = mpl_source.get_alpha()
@@ -627,7 +1244,7 @@ class Surface(Packable):
 		
 		# Get Z data - dimensions will be used to find X and Y
 		zg_raw = mpl_source.get_array()
-		self.z_grid = zg_raw.tolist()
+		self.z_grid = _as_grid_array(zg_raw, copy=True)
 		
 		# Get X and Y coordinates
 		x_min, x_max, y_min, y_max = mpl_source.get_extent()
@@ -636,10 +1253,8 @@ class Surface(Packable):
 		
 		self.uniform_grid = True # Imshow requires a uniform grid
 		
-		# Create grids from lists
-		_xg, _yg = np.meshgrid(x_list, y_list)
-		self.x_grid = _xg.tolist()
-		self.y_grid = _yg.tolist()
+		# Imshow grids are regular by construction - no meshgrid needed
+		self._set_axis_vectors(x_list, y_list)
 		
 		# Alpha
 		self.alpha = mpl_source.get_alpha()
@@ -655,9 +1270,12 @@ class Surface(Packable):
 	def mimic_poly3d(self, mpl_source):
 		''' Mimics a matplotlib Poly3DCollection (produced by ax.plot_surface()).
 
-		Reconstructs the original X/Y/Z grid by collecting all polygon vertices and
-		finding unique X and Y coordinate values. This assumes the surface was created
-		from a meshgrid-style input (the standard use case for plot_surface).
+		Reconstructs the original X/Y/Z grid from the polygon vertices. Faces in
+		plot_surface's own patch order are decoded directly (see
+		_surface_patch_grid), which also recovers curvilinear grids; otherwise
+		the grid axes are the unique X and Y coordinate values, which assumes
+		the surface was created from a meshgrid-style input (the standard use
+		case for plot_surface).
 		'''
 
 		self.surf_type = Surface.SURF_SURFACE
@@ -668,9 +1286,12 @@ class Surface(Packable):
 		if hasattr(mpl_source, '_vec') and hasattr(mpl_source, '_segslices'):
 			# mpl >= 3.9: _vec rows are (x, y, z, 1), columns are all verts concatenated
 			all_verts = mpl_source._vec[:3, :].T  # shape (n_verts, 3)
+			seg_lens = np.fromiter((sl.stop - sl.start for sl in mpl_source._segslices), dtype=np.intp,
+								   count=len(mpl_source._segslices))
 		elif hasattr(mpl_source, '_segments3d'):
 			# mpl < 3.9: list of per-face vertex arrays
 			all_verts = np.vstack([np.asarray(s) for s in mpl_source._segments3d])
+			seg_lens = np.array([len(s) for s in mpl_source._segments3d], dtype=np.intp)
 		else:
 			raise AttributeError(
 				"Cannot extract vertex data from Poly3DCollection: "
@@ -678,28 +1299,40 @@ class Surface(Packable):
 				"Unsupported matplotlib version."
 			)
 
-		# Unique x and y values define the two grid axes
-		unique_x = np.unique(np.round(all_verts[:, 0], 8))
-		unique_y = np.unique(np.round(all_verts[:, 1], 8))
-		ncols = len(unique_x)
-		nrows = len(unique_y)
-
-		# Build fast index lookups: coordinate value → grid index
-		x_to_idx = {round(float(x), 8): i for i, x in enumerate(unique_x)}
-		y_to_idx = {round(float(y), 8): i for i, y in enumerate(unique_y)}
-
-		# Walk every vertex and fill the Z grid
-		Z_grid = np.full((nrows, ncols), np.nan)
-		for vx, vy, vz in all_verts:
-			xi = x_to_idx[round(float(vx), 8)]
-			yi = y_to_idx[round(float(vy), 8)]
-			Z_grid[yi, xi] = vz
-
-		X_grid, Y_grid = np.meshgrid(unique_x, unique_y)
 		self.uniform_grid = True
-		self.x_grid = X_grid.tolist()
-		self.y_grid = Y_grid.tolist()
-		self.z_grid = Z_grid.tolist()
+
+		# Fast path: faces in plot_surface's own patch order give the grid
+		# directly, with exact coordinates.
+		grids = _surface_patch_grid(np.asarray(all_verts, dtype=np.float64), seg_lens)
+		if grids is not None:
+			X, Y, Z = grids
+			x_vec, y_vec = X[0, :], Y[:, 0]
+			known = ~np.isnan(X)
+			if np.array_equal(X[known], np.broadcast_to(x_vec, X.shape)[known]) and \
+					np.array_equal(Y[known], np.broadcast_to(y_vec[:, None], Y.shape)[known]):
+				# Rectilinear: keep the ascending orientation the general
+				# path produces
+				if len(x_vec) > 1 and x_vec[0] > x_vec[-1]:
+					x_vec, Z = x_vec[::-1], Z[:, ::-1]
+				if len(y_vec) > 1 and y_vec[0] > y_vec[-1]:
+					y_vec, Z = y_vec[::-1], Z[::-1, :]
+				self._set_axis_vectors(x_vec, y_vec)
+				self.z_grid = np.ascontiguousarray(Z)
+			elif known.all():
+				self._set_grid(X, Y)
+				self.z_grid = Z
+			else:
+				grids = None
+
+		if grids is None:
+			# Unique x and y values define the two grid axes; every vertex is
+			# scattered into its (row, col) cell (later vertices win).
+			unique_x, x_idx = np.unique(np.round(all_verts[:, 0], 8), return_inverse=True)
+			unique_y, y_idx = np.unique(np.round(all_verts[:, 1], 8), return_inverse=True)
+			Z_grid = np.full((len(unique_y), len(unique_x)), np.nan)
+			Z_grid[y_idx.reshape(-1), x_idx.reshape(-1)] = all_verts[:, 2]
+			self._set_axis_vectors(unique_x, unique_y)
+			self.z_grid = Z_grid
 
 		# Colormap
 		try:
@@ -712,9 +1345,13 @@ class Surface(Packable):
 		if self.alpha is None:
 			self.alpha = 1
 
-		# Edge color (may be empty/broadcast for plot_surface defaults)
+		# Edge color (may be empty/broadcast for plot_surface defaults). The 3D
+		# colors are read directly: Poly3DCollection.get_edgecolor() runs a
+		# full depth-sorted projection of every face first.
 		try:
-			ec = mpl_source.get_edgecolor()
+			ec = getattr(mpl_source, '_edgecolor3d', None)
+			if ec is None:
+				ec = mpl_source.get_edgecolor()
 			if ec is not None and len(ec) > 0:
 				self.line_color = tuple(float(c) for c in np.asarray(ec[0])[:3])
 		except Exception:
@@ -730,6 +1367,59 @@ class Surface(Packable):
 		# Colorbar
 		self._mimic_colorbar(mpl_source)
 
+	def _set_axis_vectors(self, x_vec, y_vec):
+		''' Stores a rectilinear grid from its 1-D x (per column) and y (per row)
+		vectors, collapsing to [start, step, count] when both are regular. '''
+
+		x_vec = _as_data_array(x_vec, copy=True)
+		y_vec = _as_data_array(y_vec, copy=True)
+		x_ar = _arithmetic_params(x_vec)
+		y_ar = _arithmetic_params(y_vec)
+		if x_ar is not None and y_ar is not None:
+			self.grid_layout = Surface.GRID_UNIFORM
+			self.x_grid = np.array([x_ar[0], x_ar[1], len(x_vec)], dtype=np.float64)
+			self.y_grid = np.array([y_ar[0], y_ar[1], len(y_vec)], dtype=np.float64)
+		else:
+			self.grid_layout = Surface.GRID_RECTILINEAR
+			self.x_grid = x_vec
+			self.y_grid = y_vec
+
+	def _set_grid(self, x_2d, y_2d):
+		''' Stores a 2-D coordinate grid, keeping the full arrays only when the
+		mesh is genuinely curvilinear. '''
+
+		x_2d = np.asarray(x_2d)
+		y_2d = np.asarray(y_2d)
+		if x_2d.ndim == 2 and y_2d.ndim == 2 and x_2d.size and y_2d.size \
+				and np.array_equal(x_2d, np.broadcast_to(x_2d[0:1, :], x_2d.shape)) \
+				and np.array_equal(y_2d, np.broadcast_to(y_2d[:, 0:1], y_2d.shape)):
+			self._set_axis_vectors(x_2d[0, :], y_2d[:, 0])
+		else:
+			self.grid_layout = Surface.GRID_CURVILINEAR
+			self.x_grid = _as_data_array(x_2d, copy=True)
+			self.y_grid = _as_data_array(y_2d, copy=True)
+
+	def get_axis_vectors(self):
+		''' Returns the grid as (x, y) 1-D vectors (x per column, y per row), or
+		None if the grid is curvilinear and has no such form. '''
+
+		if self.grid_layout == Surface.GRID_UNIFORM:
+			xs, xd, xn = np.asarray(self.x_grid, dtype=np.float64)
+			ys, yd, yn = np.asarray(self.y_grid, dtype=np.float64)
+			return xs + xd * np.arange(int(xn)), ys + yd * np.arange(int(yn))
+		elif self.grid_layout == Surface.GRID_RECTILINEAR:
+			return np.asarray(self.x_grid), np.asarray(self.y_grid)
+		return None
+
+	def get_grid(self):
+		''' Returns the full 2-D (X, Y) coordinate arrays regardless of how the
+		grid is stored, e.g. for plot_surface() or external consumers. '''
+
+		vecs = self.get_axis_vectors()
+		if vecs is None:
+			return np.asarray(self.x_grid), np.asarray(self.y_grid)
+		return np.meshgrid(vecs[0], vecs[1])
+
 	def apply_to(self, ax, gstyle:GraphStyle):
 		''' Applies this surface to the given axes. Returns the matplotlib mappable
 		so the caller can attach a colorbar if needed. '''
@@ -745,9 +1435,15 @@ class Surface(Packable):
 			return None
 
 	def _apply_to_image(self, ax):
-		x = np.array(self.x_grid)
-		y = np.array(self.y_grid)
-		z = np.array(self.z_grid)
+		# pcolormesh takes 1-D x/y vectors directly, so compact grids are never
+		# expanded to full matrices here
+		vecs = self.get_axis_vectors()
+		if vecs is None:
+			x = np.asarray(self.x_grid)
+			y = np.asarray(self.y_grid)
+		else:
+			x, y = vecs
+		z = np.asarray(self.z_grid)
 		cmap = mcolors.ListedColormap(self.cmap)
 		vmin, vmax = self._clim(z)
 		# shading='auto' correctly handles both old .graf files (center coordinates,
@@ -757,9 +1453,8 @@ class Surface(Packable):
 
 	def _apply_to_surface(self, ax):
 		''' Reconstructs a 3D surface via ax.plot_surface(). '''
-		X = np.array(self.x_grid)
-		Y = np.array(self.y_grid)
-		Z = np.array(self.z_grid)
+		X, Y = self.get_grid()
+		Z = np.asarray(self.z_grid)
 		cmap = mcolors.ListedColormap(self.cmap)
 		vmin, vmax = self._clim(Z)
 		return ax.plot_surface(X, Y, Z, cmap=cmap, alpha=self.alpha,
@@ -781,7 +1476,7 @@ class Surface(Packable):
 			return
 
 		# Determine the exact color limits to enforce.
-		vmin, vmax = self._clim(np.array(self.z_grid))
+		vmin, vmax = self._clim(np.asarray(self.z_grid))
 
 		# Pin the mappable before creating the colorbar so matplotlib builds
 		# the colorbar axis to exactly this range.
@@ -817,6 +1512,7 @@ class Surface(Packable):
 		self.manifest.append("cmap")
 
 		self.manifest.append("uniform_grid")
+		self.manifest.append("grid_layout")
 		self.manifest.append("x_grid")
 		self.manifest.append("y_grid")
 		self.manifest.append("z_grid")
@@ -838,7 +1534,18 @@ class Surface(Packable):
 		self.manifest.append("colorbar_vmin")
 		self.manifest.append("colorbar_vmax")
 
-class Trace(Packable):
+	def unpack(self, data:dict, strict:bool=False):
+		''' Unpacks as usual, then normalises the grids to ndarrays (legacy files
+		stored nested lists). '''
+
+		report = super().unpack(data, strict=strict)
+		for field in ("x_grid", "y_grid", "z_grid"):
+			val = getattr(self, field)
+			if not isinstance(val, LazyArray): # Lazy reads stay on disk until used
+				setattr(self, field, _as_grid_array(val))
+		return report
+
+class Trace(_TrackedNode, Packable):
 	''' Represents a trace that can be displayed on a set of axes'''
 	
 	TRACE_LINE2D = "TRACE_LINE2D"
@@ -846,14 +1553,24 @@ class Trace(Packable):
 	TRACE_COLOR = "TRACE_COLOR"
 	TRACE_SURFACE = "TRACE_SURFACE"
 	
-	def __init__(self, mpl_line=None, mpl_img=None, mpl_surf=None, use_twin=False, log:plf.LogPile=None):
+	# Array-valued fields, held as ndarrays in their source dtype
+	DATA_FIELDS = ("x_data", "y_data", "z_data", "x_err_neg", "x_err_pos", "y_err_neg", "y_err_pos",
+				   "x_full", "y_full")
+
+	# Packed only for decimated traces (see pack / unpack), with the values
+	# the others read back
+	DECIMATION_FIELDS = ("decimation", "full_length", "x_full", "y_full")
+	DECIMATION_DEFAULTS = {"decimation": "", "full_length": 0, "x_full": np.empty(0), "y_full": np.empty(0)}
+	
+	def __init__(self, mpl_line=None, mpl_img=None, mpl_surf=None, use_twin=False, log:plf.LogPile=None,
+				 copy_data:bool=True):
 		super().__init__(log)
 		
 		self.trace_type = Trace.TRACE_LINE2D
 		self.use_yaxis_R = use_twin # Only supported for Trace_line2D
-		self.x_data = []
-		self.y_data = []
-		self.z_data = []
+		self.x_data = np.empty(0)
+		self.y_data = np.empty(0)
+		self.z_data = np.empty(0)
 		self.line_type = LINE_TYPES[0]
 		self.marker_type = MARKER_TYPES[0]
 		self.marker_size = 1
@@ -868,10 +1585,10 @@ class Trace(Packable):
 
 		# Error bar fields
 		self.has_error_bars = False
-		self.x_err_neg = []
-		self.x_err_pos = []
-		self.y_err_neg = []
-		self.y_err_pos = []
+		self.x_err_neg = np.empty(0)
+		self.x_err_pos = np.empty(0)
+		self.y_err_neg = np.empty(0)
+		self.y_err_pos = np.empty(0)
 		self.err_line_color = (0.5, 0.5, 0.5)
 		self.err_line_width = 1.0
 		self.err_cap_size = 3.0
@@ -879,9 +1596,20 @@ class Trace(Packable):
 		self.err_cap_width = 1.0
 		self.err_cap_visible = True
 
+		# Decimation (see DecimationPolicy): x_data / y_data then hold the
+		# display envelope and x_full / y_full the full-resolution data, if kept.
+		self.decimation = ""
+		self.full_length = 0
+		self.x_full = np.empty(0)
+		self.y_full = np.empty(0)
+
+		# Write-time PrecisionPolicy overriding the one given to write_graf.
+		# Not saved - the encoding is recorded on each dataset instead.
+		self.precision = None
+
 		if mpl_line is not None:
 			
-			self.mimic(mpl_line=mpl_line, use_twin=use_twin)
+			self.mimic(mpl_line=mpl_line, use_twin=use_twin, copy_data=copy_data)
 			# # Check for 2D vs 3D
 			# if isinstance(mpl_line, mpl3d.art3d.Line3D):
 			# 	self.mimic(mpl_line=mpl_line, use_twin=use_twin)
@@ -892,18 +1620,24 @@ class Trace(Packable):
 		elif mpl_surf is not None:
 			self.mimic(mpl_surf=mpl_surf)
 	
-	def mimic(self, mpl_line=None, mpl_img=None, mpl_surf=None, use_twin=False):
+	def mimic(self, mpl_line=None, mpl_img=None, mpl_surf=None, use_twin=False, copy_data:bool=True):
+		''' Captures a matplotlib line. With copy_data=True (default) each data
+		array is copied once, contiguous and in its source dtype. With
+		copy_data=False the Trace holds the artist's own arrays without copying
+		them: use it only when neither the artist nor the Trace is modified
+		before the Trace is written. Hashing the Trace (e.g. on write) makes
+		those arrays read-only (see _TrackedNode). '''
 		
 		if mpl_line is not None:
 			# if isinstance(mpl_line, mlines.Line2D):
 			if isinstance(mpl_line, mpl3d.art3d.Line3D):
 				self.log.lowdebug(f"Detected line as 3D", detail=f"Type={type(mpl_line)}")
-				self.mimic_3dline(mpl_line)
+				self.mimic_3dline(mpl_line, copy_data=copy_data)
 			else:
 				self.log.lowdebug(f"Detected line as 2D", detail=f"Type={type(mpl_line)}")
-				self.mimic_2dline(mpl_line, use_twin=use_twin)
+				self.mimic_2dline(mpl_line, use_twin=use_twin, copy_data=copy_data)
 				
-	def mimic_2dline(self, mpl_line, use_twin=False):
+	def mimic_2dline(self, mpl_line, use_twin=False, copy_data:bool=True):
 	
 		self.trace_type = Trace.TRACE_LINE2D
 		self.use_yaxis_R = use_twin
@@ -928,9 +1662,9 @@ class Trace(Packable):
 		# 	self.marker_color = hexstr_to_rgb(mpl_line.get_markerfacecolor())
 		
 		# Get x-data
-		self.x_data = [float(x) for x in mpl_line.get_xdata()]
-		self.y_data = [float(x) for x in mpl_line.get_ydata()]
-		self.z_data = []
+		self.x_data = _as_data_array(mpl_line.get_xdata(), copy=copy_data)
+		self.y_data = _as_data_array(mpl_line.get_ydata(), copy=copy_data)
+		self.z_data = np.empty(0)
 		
 		# Get line type
 		self.line_type = mpl_line.get_linestyle()
@@ -947,7 +1681,7 @@ class Trace(Packable):
 		self.line_width = mpl_line.get_linewidth()
 		self.display_name = str(mpl_line.get_label())
 
-	def mimic_3dline(self, mpl_line):
+	def mimic_3dline(self, mpl_line, copy_data:bool=True):
 	
 		self.trace_type = Trace.TRACE_LINE3D
 		self.use_yaxis_R = False
@@ -975,12 +1709,9 @@ class Trace(Packable):
 		data3d = mpl_line.get_data_3d()
 		
 		# Unpack into x, y and z
-		self.x_data = data3d[0]
-		self.y_data = data3d[1]
-		self.z_data = data3d[2]
-		# self.x_data = [float(xtup[0]) for xtup in data3d]
-		# self.y_data = [float(xtup[1]) for xtup in data3d]
-		# self.z_data = [float(xtup[2]) for xtup in data3d]
+		self.x_data = _as_data_array(data3d[0], copy=copy_data)
+		self.y_data = _as_data_array(data3d[1], copy=copy_data)
+		self.z_data = _as_data_array(data3d[2], copy=copy_data)
 		
 		# Get line type
 		self.line_type = mpl_line.get_linestyle()
@@ -997,8 +1728,9 @@ class Trace(Packable):
 		self.line_width = mpl_line.get_linewidth()
 		self.display_name = str(mpl_line.get_label())
 	
-	def mimic_errorbar(self, container: ErrorbarContainer, use_twin: bool = False):
-		''' Extracts data and styling from a matplotlib ErrorbarContainer. '''
+	def mimic_errorbar(self, container: ErrorbarContainer, use_twin: bool = False, copy_data: bool = True):
+		''' Extracts data and styling from a matplotlib ErrorbarContainer.
+		copy_data is as for mimic(). '''
 		self.trace_type = Trace.TRACE_LINE2D
 		self.has_error_bars = True
 		self.use_yaxis_R = use_twin
@@ -1010,9 +1742,9 @@ class Trace(Packable):
 
 		# fmt='none' yields plotline=None; fall back to defaults in that case
 		if plotline is not None:
-			self.x_data = [float(x) for x in plotline.get_xdata()]
-			self.y_data = [float(y) for y in plotline.get_ydata()]
-			self.z_data = []
+			self.x_data = _as_data_array(plotline.get_xdata(), copy=copy_data)
+			self.y_data = _as_data_array(plotline.get_ydata(), copy=copy_data)
+			self.z_data = np.empty(0)
 			self.line_color = mcolors.to_rgb(plotline.get_color())
 			self.alpha = plotline.get_alpha() or 1.0
 			self.marker_color = mcolors.to_rgb(plotline.get_markerfacecolor())
@@ -1024,23 +1756,18 @@ class Trace(Packable):
 			self.line_width = float(plotline.get_linewidth())
 		else:
 			# Recover x/y from bar line segments when there is no plotline
-			x_vals, y_vals = [], []
-			for lc in barlinecols:
-				for seg in lc.get_segments():
-					cx = (seg[0][0] + seg[1][0]) / 2
-					cy = (seg[0][1] + seg[1][1]) / 2
-					x_vals.append(cx)
-					y_vals.append(cy)
-			self.x_data = sorted(set(round(v, 10) for v in x_vals))
-			self.y_data = []  # cannot reliably recover y without plotline
-			self.z_data = []
+			ends = np.concatenate([_segment_endpoints(lc) for lc in barlinecols]) if barlinecols else np.empty((0, 2, 2))
+			x_vals = (ends[:, 0, 0] + ends[:, 1, 0]) / 2
+			self.x_data = np.unique(np.round(np.asarray(x_vals, dtype=float), 10))
+			self.y_data = np.empty(0)  # cannot reliably recover y without plotline
+			self.z_data = np.empty(0)
 			self.line_type = 'None'
 			self.marker_type = 'None'
 
 		# Recover per-point error values from bar line collections.
 		# When plotline is None (e.g. fmt='none') y_data is empty so skip.
-		x_arr = np.array(self.x_data)
-		y_arr = np.array(self.y_data)
+		x_arr = self.x_data
+		y_arr = self.y_data
 		n = len(x_arr)
 		if n == 0 or len(y_arr) == 0:
 			return
@@ -1052,26 +1779,38 @@ class Trace(Packable):
 		for lc in barlinecols:
 			self.err_line_color = mcolors.to_rgb(lc.get_colors()[0])
 			self.err_line_width = float(np.ravel(lc.get_linewidths())[0])
-			for seg in lc.get_segments():
-				x0, y0 = seg[0]
-				x1, y1 = seg[1]
-				if abs(x1 - x0) < abs(y1 - y0):
-					# Vertical segment → y-error bar; match by nearest x
-					ci = int(np.argmin(np.abs(x_arr - (x0 + x1) / 2)))
-					cy = y_arr[ci]
-					y_err_neg[ci] = cy - min(y0, y1)
-					y_err_pos[ci] = max(y0, y1) - cy
-				else:
-					# Horizontal segment → x-error bar; match by nearest y
-					ci = int(np.argmin(np.abs(y_arr - (y0 + y1) / 2)))
-					cx = x_arr[ci]
-					x_err_neg[ci] = cx - min(x0, x1)
-					x_err_pos[ci] = max(x0, x1) - cx
-
-		self.x_err_neg = x_err_neg.tolist()
-		self.x_err_pos = x_err_pos.tolist()
-		self.y_err_neg = y_err_neg.tolist()
-		self.y_err_pos = y_err_pos.tolist()
+
+		# Every bar segment at once, in drawing order. Each one is matched to
+		# the data point nearest its midpoint; where several hit one point the
+		# last drawn wins.
+		ends = np.concatenate([_segment_endpoints(lc) for lc in barlinecols]) if barlinecols else np.empty((0, 2, 2))
+		x0, y0 = ends[:, 0, 0], ends[:, 0, 1]
+		x1, y1 = ends[:, 1, 0], ends[:, 1, 1]
+		vertical = np.abs(x1 - x0) < np.abs(y1 - y0)
+
+		# Vertical segment → y-error bar; match by nearest x
+		a, b = y0[vertical], y1[vertical]
+		ci = _nearest_index(x_arr, (x0[vertical] + x1[vertical]) / 2)
+		keep = _last_occurrence(ci)
+		ci, a, b = ci[keep], a[keep], b[keep]
+		cy = np.asarray(y_arr)[ci].astype(np.float64)
+		y_err_neg[ci] = cy - np.where(b < a, b, a)
+		y_err_pos[ci] = np.where(b > a, b, a) - cy
+
+		# Horizontal segment → x-error bar; match by nearest y
+		horizontal = ~vertical
+		a, b = x0[horizontal], x1[horizontal]
+		ci = _nearest_index(y_arr, (y0[horizontal] + y1[horizontal]) / 2)
+		keep = _last_occurrence(ci)
+		ci, a, b = ci[keep], a[keep], b[keep]
+		cx = np.asarray(x_arr)[ci].astype(np.float64)
+		x_err_neg[ci] = cx - np.where(b < a, b, a)
+		x_err_pos[ci] = np.where(b > a, b, a) - cx
+
+		self.x_err_neg = x_err_neg
+		self.x_err_pos = x_err_pos
+		self.y_err_neg = y_err_neg
+		self.y_err_pos = y_err_pos
 
 		# Cap properties — capthick sets markeredgewidth, not linewidth
 		if caplines:
@@ -1086,6 +1825,44 @@ class Trace(Packable):
 			self.err_cap_size = 0.0
 			self.err_cap_visible = False
 
+	def full_data(self) -> tuple:
+		''' (x, y) at full resolution: x_full / y_full if the trace was
+		decimated with its full data kept, otherwise x_data / y_data.
+
+		Raises ValueError if the trace was decimated without keeping its full
+		data (DecimationPolicy keep_full=False): only the envelope is left. '''
+
+		if self.decimation and len(self.y_full) == 0:
+			raise ValueError(f"Trace '{self.display_name}' was decimated to {len(self.y_data)} of "
+							 f"{self.full_length} points without keeping the full data.")
+		return self._source_data()
+
+	def _source_data(self) -> tuple:
+		''' The highest-resolution (x, y) this trace holds: full_data(), or
+		the envelope if the full data was dropped. '''
+
+		if self.decimation and len(self.y_full) > 0:
+			return self.x_full, self.y_full
+		return self.x_data, self.y_data
+
+	def decimate(self, policy=4096) -> bool:
+		''' Replaces the data of a long 2D line with its display envelope under
+		`policy` (a DecimationPolicy, or anything DecimationPolicy.coerce()
+		accepts, e.g. a point budget), moving the full-resolution data to
+		x_full / y_full unless the policy drops it. Re-decimating works from
+		the full data when it was kept. Error bar and 3D traces are left as
+		they are. Returns True if the trace was decimated. '''
+
+		policy = DecimationPolicy.coerce(policy)
+		if policy is None or self.trace_type != Trace.TRACE_LINE2D or self.has_error_bars:
+			return False
+		fields = _decimated(*self._source_data(), policy)
+		if fields is None:
+			return False
+		for name, value in fields.items():
+			setattr(self, name, value)
+		return True
+
 	def apply_to(self, ax, gstyle:GraphStyle):
 		self.gs = gstyle
 
@@ -1104,17 +1881,17 @@ class Trace(Packable):
 
 		#TODO: Error check line type, marker type, and sizes
 
-		ax.add_line(matplotlib.lines.Line2D(self.x_data, self.y_data, linewidth=self.line_width, linestyle=self.line_type, color=self.line_color, marker=_unparse_marker(self.marker_type), markersize=self.marker_size, markerfacecolor=self.marker_color, label=self.display_name, alpha=self.alpha))
+		ax.add_line(matplotlib.lines.Line2D(np.asarray(self.x_data), np.asarray(self.y_data), linewidth=self.line_width, linestyle=self.line_type, color=self.line_color, marker=_unparse_marker(self.marker_type), markersize=self.marker_size, markerfacecolor=self.marker_color, label=self.display_name, alpha=self.alpha))
 
 	def apply_to_errorbar(self, ax):
 		''' Reconstructs an errorbar plot from stored data and styling. '''
-		x = np.array(self.x_data)
-		y = np.array(self.y_data)
+		x = np.asarray(self.x_data)
+		y = np.asarray(self.y_data)
 
-		y_err_neg = np.array(self.y_err_neg)
-		y_err_pos = np.array(self.y_err_pos)
-		x_err_neg = np.array(self.x_err_neg)
-		x_err_pos = np.array(self.x_err_pos)
+		y_err_neg = np.asarray(self.y_err_neg)
+		y_err_pos = np.asarray(self.y_err_pos)
+		x_err_neg = np.asarray(self.x_err_neg)
+		x_err_pos = np.asarray(self.x_err_pos)
 
 		yerr = np.vstack([y_err_neg, y_err_pos]) if np.any(y_err_neg > 0) or np.any(y_err_pos > 0) else None
 		xerr = np.vstack([x_err_neg, x_err_pos]) if np.any(x_err_neg > 0) or np.any(x_err_pos > 0) else None
@@ -1143,7 +1920,7 @@ class Trace(Packable):
 		
 		#TODO: Error check line type, marker type, and sizes
 		
-		ax.add_line(mpl3d.art3d.Line3D(self.x_data, self.y_data, self.z_data, linewidth=self.line_width, linestyle=self.line_type, color=self.line_color, marker=_unparse_marker(self.marker_type), markersize=self.marker_size, markerfacecolor=self.marker_color, label=self.display_name, alpha=self.alpha))
+		ax.add_line(mpl3d.art3d.Line3D(np.asarray(self.x_data), np.asarray(self.y_data), np.asarray(self.z_data), linewidth=self.line_width, linestyle=self.line_type, color=self.line_color, marker=_unparse_marker(self.marker_type), markersize=self.marker_size, markerfacecolor=self.marker_color, label=self.display_name, alpha=self.alpha))
 	
 	def set_manifest(self):
 		self.manifest.append("trace_type")
@@ -1173,8 +1950,99 @@ class Trace(Packable):
 		self.manifest.append("err_cap_color")
 		self.manifest.append("err_cap_width")
 		self.manifest.append("err_cap_visible")
+
+		self.manifest.append("decimation")
+		self.manifest.append("full_length")
+		self.manifest.append("x_full")
+		self.manifest.append("y_full")
+
+	def _omitted_fields(self) -> tuple:
+		return () if self.decimation else Trace.DECIMATION_FIELDS
+
+	def pack(self):
+		''' Packs as usual, leaving out the decimation fields of a trace that
+		was not decimated. '''
+
+		d = super().pack()
+		for field in self._omitted_fields():
+			d.pop(field, None)
+		return d
+
+	def unpack(self, data:dict, strict:bool=False):
+		''' Unpacks as usual, then normalises the data fields to ndarrays so files
+		written before the switch from float lists read back the same way as new
+		ones (TOME already returns native datasets as ndarrays). The decimation
+		fields are only stored for decimated traces and default otherwise. '''
+
+		if "decimation" not in data:
+			data = {**Trace.DECIMATION_DEFAULTS, **data}
+		report = super().unpack(data, strict=strict)
+		for field in Trace.DATA_FIELDS:
+			val = getattr(self, field)
+			if not isinstance(val, LazyArray): # Lazy reads stay on disk until used
+				setattr(self, field, _as_data_array(val))
+		return report
 	
-class Scale(Packable):
+def _auto_ticks(vmin:float, vmax:float, log:bool=False) -> tuple:
+	''' Ticks and tick labels matplotlib's default locator and formatter
+	would give a view of [vmin, vmax], without an axes to attach them to. '''
+
+	if log:
+		locator, formatter = mticker.LogLocator(), mticker.LogFormatterSciNotation()
+	else:
+		locator, formatter = mticker.AutoLocator(), mticker.ScalarFormatter()
+	ticks = locator.tick_values(vmin, vmax)
+	formatter.create_dummy_axis()
+	formatter.axis.set_view_interval(vmin, vmax)
+	return [float(t) for t in ticks], [str(lbl) for lbl in formatter.format_ticks(ticks)]
+
+def _finite_range(values, positive:bool=False):
+	''' (min, max) of the finite (and, for log scales, positive) entries of
+	`values`, or None if there are none. '''
+
+	arr = np.asarray(values)
+	if arr.size == 0 or arr.dtype.kind not in "biuf":
+		return None
+	if arr.dtype.kind == "f" or positive:
+		keep = np.isfinite(arr) if arr.dtype.kind == "f" else np.ones(arr.shape, dtype=bool)
+		if positive:
+			keep &= arr > 0
+		arr = arr[keep]
+		if arr.size == 0:
+			return None
+	return float(arr.min()), float(arr.max())
+
+def _cell_edges(centers:np.ndarray) -> np.ndarray:
+	''' Cell edges for 1-D cell centers, as pcolormesh(shading='nearest')
+	places them: midway between neighbours, mirrored at the ends. '''
+
+	c = np.asarray(centers, dtype=np.float64)
+	if c.size == 1:
+		return np.array([c[0] - 0.5, c[0] + 0.5])
+	mid = (c[:-1] + c[1:]) / 2
+	return np.concatenate(([c[0] - (mid[0] - c[0])], mid, [c[-1] + (c[-1] - mid[-1])]))
+
+def _error_pair(err, n:int, name:str):
+	''' Splits an errorbar() style error spec (scalar, shape (N,) or (2, N))
+	into (negative, positive) float arrays of length n. '''
+
+	if err is None:
+		return np.zeros(n), np.zeros(n)
+	arr = np.asarray(err, dtype=np.float64)
+	if arr.ndim == 2 and arr.shape[0] == 2:
+		neg, pos = arr[0], arr[1]
+	else:
+		neg = pos = arr
+	try:
+		neg = np.array(np.broadcast_to(neg, (n,)))
+		pos = np.array(np.broadcast_to(pos, (n,)))
+	except ValueError:
+		raise ValueError(f"{name} has shape {arr.shape}; expected a scalar, ({n},) or (2, {n}).")
+	if np.any(neg < 0) or np.any(pos < 0):
+		raise ValueError(f"{name} must not contain negative values.")
+	return neg, pos
+
+class Scale(_TrackedNode, Packable):
 	''' Defines a singular axis/scale such as an x-axis.'''
 	
 	SCALE_ID_X = 0
@@ -1258,6 +2126,29 @@ class Scale(Packable):
 		else:
 			print(f"ERROR: Unrecognized Scale-id: {scale_id}")
  
+	def fit(self, lo:float, hi:float, margin:float=None):
+		''' Sets limits and ticks for data spanning [lo, hi] as matplotlib's
+		autoscaling would: the range is padded by `margin` (default: rcParams
+		'axes.xmargin') of its span, in log space for log scales, and ticked by
+		the default locator and formatter. No figure is created. '''
+
+		if margin is None:
+			margin = matplotlib.rcParams["axes.xmargin"]
+		use_log = (str(self.scale_type).lower() == "log")
+		self.is_valid = True
+		if use_log:
+			lo, hi = mticker.LogLocator().nonsingular(lo, hi)
+			pad = (np.log10(hi) - np.log10(lo)) * margin
+			vmin, vmax = lo / 10**pad, hi * 10**pad
+		else:
+			lo, hi = mticker.AutoLocator().nonsingular(lo, hi)
+			pad = (hi - lo) * margin
+			vmin, vmax = lo - pad, hi + pad
+		self.val_min = float(vmin)
+		self.val_max = float(vmax)
+		self.tick_list, self.tick_label_list = _auto_ticks(vmin, vmax, log=use_log)
+		self.minor_tick_list = []
+
 	def _log_safe_limits(self):
 		''' Keep limits strictly positive so set_*lim won't choke on a log axis
 		(e.g. if scale_type was edited to "log" on data that includes <= 0). '''
@@ -1356,7 +2247,7 @@ def get_axis_type(mpl_axis):
 	elif len(mpl_axis.images) > 0: # From imagesc?
 		return AXISTYPE_IMAGE
 
-class Axis(Packable):
+class Axis(_TrackedNode, Packable):
 	'''' Defines a set of axes, including the x-y-(z), grid lines, etc. and contains
 	data to display on the axes.'''
 	
@@ -1365,7 +2256,8 @@ class Axis(Packable):
 	AXIS_IMAGE = "AXIS_IMAGE"
 	AXIS_SURFACE = "AXIS_SURFACE"
 	
-	def __init__(self, gs:GraphStyle, ax=None, twin_ax=None, log:plf.LogPile=None, position_override=None): #:matplotlib.axes._axes.Axes=None):
+	def __init__(self, gs:GraphStyle, ax=None, twin_ax=None, log:plf.LogPile=None, position_override=None,
+				 copy_data:bool=True): #:matplotlib.axes._axes.Axes=None):
 		super().__init__(log)
 
 		self.gs = gs # Copy of GraphStyle in Graf class - do not add to manifest
@@ -1385,7 +2277,7 @@ class Axis(Packable):
 
 		# Initialize with axes if possible
 		if ax is not None:
-			self.mimic(ax, twin=twin_ax, position_override=position_override)
+			self.mimic(ax, twin=twin_ax, position_override=position_override, copy_data=copy_data)
 	
 	def set_manifest(self):
 		self.manifest.append("axis_type")
@@ -1401,7 +2293,7 @@ class Axis(Packable):
 		self.dict_manifest["surfaces"] = Surface()
 		self.manifest.append("title")
 	
-	def mimic(self, ax, twin=None, position_override=None):
+	def mimic(self, ax, twin=None, position_override=None, copy_data:bool=True):
 
 		# Only treat as surface/image when real raster/mesh collections are present.
 		# LineCollection objects (e.g. from ax.errorbar) live in ax.collections but
@@ -1418,9 +2310,9 @@ class Axis(Packable):
 			self._mimic_surface(ax, position_override=position_override)
 		else:
 			self.log.debug(f"Mimicing Trace object")
-			self._mimic_line(ax, twin=twin, position_override=position_override)
+			self._mimic_line(ax, twin=twin, position_override=position_override, copy_data=copy_data)
 
-	def _mimic_line(self, ax, twin=None, position_override=None):
+	def _mimic_line(self, ax, twin=None, position_override=None, copy_data:bool=True):
 		
 		# Identify main and twin axis
 		if twin is None:
@@ -1477,7 +2369,7 @@ class Axis(Packable):
 				continue
 			self.log.lowdebug(f"Mimicing errorbar container: {container}")
 			t = Trace(log=self.log)
-			t.mimic_errorbar(container, use_twin=False)
+			t.mimic_errorbar(container, use_twin=False, copy_data=copy_data)
 			self.traces[f'Tr{tr_idx}'] = t
 			tr_idx += 1
 
@@ -1488,7 +2380,7 @@ class Axis(Packable):
 			if mpl_trace in errbar_lines or mpl_trace.get_gid() == CURSOR_MARKER_GID:
 				continue
 			self.log.lowdebug(f"Mimicing trace: {mpl_trace}")
-			self.traces[f'Tr{tr_idx}'] = Trace(mpl_trace, log=self.log)
+			self.traces[f'Tr{tr_idx}'] = Trace(mpl_trace, log=self.log, copy_data=copy_data)
 			tr_idx += 1
 
 		# Get lines for twin
@@ -1505,14 +2397,14 @@ class Axis(Packable):
 				if not isinstance(container, ErrorbarContainer):
 					continue
 				t = Trace(log=self.log)
-				t.mimic_errorbar(container, use_twin=True)
+				t.mimic_errorbar(container, use_twin=True, copy_data=copy_data)
 				self.traces[f'Tr{tr_idx}'] = t
 				tr_idx += 1
 
 			for mpl_trace in twin_ax.lines:
 				if mpl_trace in twin_errbar_lines or mpl_trace.get_gid() == CURSOR_MARKER_GID:
 					continue
-				self.traces[f'Tr{tr_idx}'] = Trace(mpl_trace, use_twin=True, log=self.log)
+				self.traces[f'Tr{tr_idx}'] = Trace(mpl_trace, use_twin=True, log=self.log, copy_data=copy_data)
 				tr_idx += 1
 		
 		self.title = str(main_ax.get_title())
@@ -1580,6 +2472,232 @@ class Axis(Packable):
 			self.position = [row_start, col_start]
 			self.span = [row_stop-row_start, col_stop-col_start]
 
+	# ------------------------------------------------------------------
+	# Building from arrays (see Graf.new)
+	# ------------------------------------------------------------------
+
+	@staticmethod
+	def _next_key(items:dict, prefix:str) -> str:
+		used = [_key_index(k) for k in items]
+		return f"{prefix}{max([i for i in used if i is not None], default=-1) + 1}"
+
+	def _style_trace(self, tr:Trace, label:str, color, line_type:str, marker_type:str, line_width:float,
+					 marker_size:float, marker_color, alpha:float):
+		''' Applies builder styling to `tr`, with matplotlib's defaults (color
+		cycle, rcParams line width and marker size) where a value is None. '''
+
+		if color is None:
+			cycle = matplotlib.rcParams["axes.prop_cycle"].by_key().get("color", ["C0"])
+			n = sum(1 for t in self.traces.values() if t is not tr and t.use_yaxis_R == tr.use_yaxis_R)
+			color = cycle[n % len(cycle)]
+		if line_type not in LINE_TYPES:
+			raise ValueError(f"Unknown line type {line_type!r}; expected one of {LINE_TYPES}.")
+		tr.display_name = str(label)
+		tr.line_color = mcolors.to_rgb(color)
+		tr.marker_color = mcolors.to_rgb(color if marker_color is None else marker_color)
+		tr.line_type = line_type
+		tr.marker_type = marker_type if marker_type in MARKER_TYPES else _parse_marker(marker_type)
+		tr.line_width = float(matplotlib.rcParams["lines.linewidth"] if line_width is None else line_width)
+		tr.marker_size = float(matplotlib.rcParams["lines.markersize"] if marker_size is None else marker_size)
+		tr.alpha = 1 if alpha is None else alpha
+
+	def add_trace(self, x, y, z=None, *, label:str="", color=None, line_type:str="-", marker_type:str="None",
+				  line_width:float=None, marker_size:float=None, marker_color=None, alpha:float=1,
+				  use_twin:bool=False, copy_data:bool=True, autoscale:bool=True) -> Trace:
+		''' Adds a line trace built directly from data arrays, as ax.plot()
+		would have drawn it, and refits the axis limits and ticks.
+
+		Args:
+			x, y: Data, kept in their source dtype.
+			z: Optional z data, which makes this a 3D line (and the axis 3D).
+			label: Display name.
+			color: Any matplotlib color; default is the next color of the
+				rcParams color cycle.
+			line_type: One of LINE_TYPES.
+			marker_type: One of MARKER_TYPES, or a matplotlib marker code.
+			use_twin: Plot against the right-hand y-axis (2D only).
+			copy_data: As for Trace.mimic; False keeps the given arrays.
+			autoscale: Refit the scales (see autoscale()).
+
+		Returns:
+			The new Trace.
+		'''
+
+		tr = Trace(log=self.log)
+		tr.trace_type = Trace.TRACE_LINE2D if z is None else Trace.TRACE_LINE3D
+		tr.use_yaxis_R = bool(use_twin) and z is None
+		tr.x_data = _as_data_array(x, copy=copy_data)
+		tr.y_data = _as_data_array(y, copy=copy_data)
+		tr.z_data = np.empty(0) if z is None else _as_data_array(z, copy=copy_data)
+		if len(tr.x_data) != len(tr.y_data) or (z is not None and len(tr.z_data) != len(tr.x_data)):
+			raise ValueError("x, y (and z) must have the same length.")
+		self._style_trace(tr, label, color, line_type, marker_type, line_width, marker_size, marker_color, alpha)
+
+		self.traces[self._next_key(self.traces, "Tr")] = tr
+		if tr.use_yaxis_R:
+			self.y_axis_R.is_valid = True
+		if z is not None:
+			self.z_axis.is_valid = True
+		if autoscale:
+			self.autoscale()
+		return tr
+
+	def add_errorbar(self, x, y, yerr=None, xerr=None, *, label:str="", color=None, line_type:str="-",
+					 marker_type:str="None", line_width:float=None, marker_size:float=None, marker_color=None,
+					 alpha:float=1, ecolor=None, elinewidth:float=None, capsize:float=None, capthick:float=None,
+					 copy_data:bool=True, autoscale:bool=True) -> Trace:
+		''' Adds an error bar trace, as ax.errorbar() would have drawn it.
+		yerr / xerr are a scalar, an (N,) array of symmetric errors or a (2, N)
+		array of (negative, positive) errors. ecolor, elinewidth, capsize and
+		capthick default as in errorbar(); the remaining arguments are those of
+		add_trace(). '''
+
+		tr = Trace(log=self.log)
+		tr.trace_type = Trace.TRACE_LINE2D
+		tr.has_error_bars = True
+		tr.x_data = _as_data_array(x, copy=copy_data)
+		tr.y_data = _as_data_array(y, copy=copy_data)
+		n = len(tr.x_data)
+		if len(tr.y_data) != n:
+			raise ValueError("x and y must have the same length.")
+		tr.y_err_neg, tr.y_err_pos = _error_pair(yerr, n, "yerr")
+		tr.x_err_neg, tr.x_err_pos = _error_pair(xerr, n, "xerr")
+		self._style_trace(tr, label, color, line_type, marker_type, line_width, marker_size, marker_color, alpha)
+
+		tr.err_line_color = tr.line_color if ecolor is None else mcolors.to_rgb(ecolor)
+		tr.err_line_width = tr.line_width if elinewidth is None else float(elinewidth)
+		tr.err_cap_size = float(matplotlib.rcParams["errorbar.capsize"] if capsize is None else capsize)
+		tr.err_cap_color = tr.err_line_color
+		tr.err_cap_width = float(matplotlib.rcParams["lines.markeredgewidth"] if capthick is None else capthick)
+		tr.err_cap_visible = tr.err_cap_size > 0
+
+		self.traces[self._next_key(self.traces, "Tr")] = tr
+		if autoscale:
+			self.autoscale()
+		return tr
+
+	def add_surface(self, x, y, z, *, surf_type:str=Surface.SURF_IMAGE, cmap="viridis", alpha:float=1,
+					label:str="", line_width:float=None, vmin:float=None, vmax:float=None,
+					colorbar:bool=False, colorbar_label:str="", colorbar_orientation:str="vertical",
+					copy_data:bool=True, autoscale:bool=True) -> Surface:
+		''' Adds a surface built directly from grid arrays.
+
+		SURF_IMAGE is a pcolormesh: x and y are 1-D cell edges (length N+1 and
+		M+1 for an (M, N) z) or cell centers (length N and M, turned into edges
+		as pcolormesh does), or 2-D corner grids. SURF_SURFACE is a 3D
+		plot_surface: x and y give the vertex positions, as 1-D vectors or 2-D
+		grids shaped like z, and the axis becomes 3D.
+
+		Args:
+			cmap: Colormap name or object, sampled as when mimicking.
+			vmin, vmax: Color limits (default: the data range).
+			colorbar: Record a colorbar, ticked over the color limits.
+
+		Returns:
+			The new Surface.
+		'''
+
+		sf = Surface(log=self.log)
+		sf.surf_type = surf_type
+		sf.z_grid = _as_grid_array(z, copy=copy_data)
+		if sf.z_grid.ndim != 2:
+			raise ValueError(f"z must be 2-D, got shape {sf.z_grid.shape}.")
+		rows, cols = sf.z_grid.shape
+		x = np.asarray(x)
+		y = np.asarray(y)
+		if x.ndim == 1 and y.ndim == 1:
+			if surf_type == Surface.SURF_IMAGE:
+				x = x if len(x) == cols + 1 else _cell_edges(x)
+				y = y if len(y) == rows + 1 else _cell_edges(y)
+				ok = (len(x), len(y)) == (cols + 1, rows + 1)
+			else:
+				ok = (len(x), len(y)) == (cols, rows)
+			if not ok:
+				raise ValueError(f"x / y lengths {len(x)}, {len(y)} do not match z of shape {sf.z_grid.shape}.")
+			sf.uniform_grid = True
+			sf._set_axis_vectors(x, y)
+		elif x.shape == y.shape and x.ndim == 2:
+			sf._set_grid(x, y)
+			sf.uniform_grid = sf.grid_layout != Surface.GRID_CURVILINEAR
+		else:
+			raise ValueError(f"x and y must both be 1-D or both 2-D of one shape (got {x.shape}, {y.shape}).")
+
+		if surf_type == Surface.SURF_IMAGE:
+			sf.line_type = "None"
+		if line_width is not None:
+			sf.line_width = float(line_width)
+		sf.display_name = str(label)
+		sf.alpha = 1 if alpha is None else alpha
+		sf.cmap = sample_colormap(cmap, N=30)
+		if vmin is not None:
+			sf.colorbar_vmin = float(vmin)
+		if vmax is not None:
+			sf.colorbar_vmax = float(vmax)
+		if colorbar:
+			sf.has_colorbar = True
+			sf.colorbar_label = str(colorbar_label)
+			sf.colorbar_orientation = colorbar_orientation
+			lo, hi = sf._clim(np.asarray(sf.z_grid))
+			if lo is not None:
+				ticks, labels = _auto_ticks(lo, hi)
+				keep = [i for i, t in enumerate(ticks) if lo <= t <= hi]
+				sf.colorbar_ticks = [ticks[i] for i in keep]
+				sf.colorbar_tick_labels = [labels[i] for i in keep]
+
+		self.surfaces[self._next_key(self.surfaces, "Sf")] = sf
+		if surf_type == Surface.SURF_SURFACE:
+			self.axis_type = Axis.AXIS_SURFACE
+			self.z_axis.is_valid = True
+		elif self.axis_type != Axis.AXIS_SURFACE:
+			self.axis_type = Axis.AXIS_IMAGE
+		if autoscale:
+			self.autoscale()
+		return sf
+
+	def autoscale(self, margin:float=None):
+		''' Fits every valid scale to the data of this axis's traces and
+		surfaces (error bars included), as matplotlib's autoscaling would (see
+		Scale.fit). Image axes get no margin, like pcolormesh. '''
+
+		if margin is None and self.axis_type == Axis.AXIS_IMAGE:
+			margin = 0.0
+		ranges = {}
+
+		def grow(scale_name, values):
+			scale = getattr(self, scale_name)
+			rng = _finite_range(values, positive=(str(scale.scale_type).lower() == "log"))
+			if rng is None:
+				return
+			old = ranges.get(scale_name, rng)
+			ranges[scale_name] = (min(old[0], rng[0]), max(old[1], rng[1]))
+
+		for tr in self.traces.values():
+			y_scale = "y_axis_R" if tr.use_yaxis_R else "y_axis_L"
+			x = np.asarray(tr.x_data)
+			y = np.asarray(tr.y_data)
+			if tr.has_error_bars and len(tr.x_err_neg) == len(x) and len(tr.y_err_neg) == len(y):
+				grow("x_axis", x - np.asarray(tr.x_err_neg))
+				grow("x_axis", x + np.asarray(tr.x_err_pos))
+				grow(y_scale, y - np.asarray(tr.y_err_neg))
+				grow(y_scale, y + np.asarray(tr.y_err_pos))
+			else:
+				grow("x_axis", x)
+				grow(y_scale, y)
+			if tr.trace_type == Trace.TRACE_LINE3D:
+				grow("z_axis", tr.z_data)
+		for sf in self.surfaces.values():
+			vecs = sf.get_axis_vectors()
+			xg, yg = vecs if vecs is not None else (sf.x_grid, sf.y_grid)
+			grow("x_axis", xg)
+			grow("y_axis_L", yg)
+			if sf.surf_type == Surface.SURF_SURFACE:
+				grow("z_axis", sf.z_grid)
+
+		for name, (lo, hi) in ranges.items():
+			scale = getattr(self, name)
+			if scale.is_valid:
+				scale.fit(lo, hi, margin=margin)
+
 	def apply_to(self, ax, gstyle:GraphStyle, twin_ax=None, fig=None):
 
 		if self.axis_type == Axis.AXIS_LINE2D or self.axis_type == Axis.AXIS_LINE3D:
@@ -1662,11 +2780,12 @@ class Axis(Packable):
 		"""
 		
 		# Scan over all traces
-		for idx, tr in enumerate(self.traces.values()):
+		for key, tr in self.traces.items():
 			
-			# Return index if match
-			if tr.label == search_label:
-				return idx
+			# Return index if match (index is the N in the 'TrN' key, which
+			# is what Graf.get_trace looks traces up by)
+			if tr.display_name == search_label:
+				return _key_index(key)
 		
 		return None
 		
@@ -1696,11 +2815,12 @@ class MetaInfo(Packable):
 		self.manifest.append("provenance")
 		self.manifest.append("history")
 	
-class Graf(Packable):
+class Graf(_TrackedNode, Packable):
 	""" Class used to read, write and extract data from GrAF files.
 	"""
 	
-	def __init__(self, fig=None, description:str="", conditions:dict={}, log:plf.LogPile=None):
+	def __init__(self, fig=None, description:str="", conditions:dict={}, log:plf.LogPile=None,
+				 copy_data:bool=True, decimate=None):
 		super().__init__(log)
 
 		self.style = GraphStyle(log=self.log)
@@ -1711,8 +2831,21 @@ class Graf(Packable):
 
 		self.axes = {} # Has to be a dictinary so HDF knows how to handle it
 
+		# Open file handle backing LazyArray data after read_graf(lazy=True).
+		# Not part of the manifest.
+		self._lazy_file = None
+		self._lazy_filename = None
+		# abspath -> (write options + content hash, file stamp) of the last
+		# write_graf to each file, to skip rewriting unchanged data.
+		self._saved_files = {}
+		# Guards info.provenance / info.history, which AsyncSaver updates
+		# from its worker thread when a background save finishes.
+		self._provenance_lock = threading.RLock()
+
 		if fig is not None:
-			self.mimic(fig)
+			self.mimic(fig, copy_data=copy_data)
+			if decimate is not None:
+				self.decimate(decimate)
 	
 	def set_manifest(self):
 		self.obj_manifest.append("style")
@@ -1721,9 +2854,43 @@ class Graf(Packable):
 		self.manifest.append("fig_width_cm")
 		self.manifest.append("fig_height_cm")
 		self.dict_manifest["axes"] = Axis(GraphStyle())
+
+	@classmethod
+	def new(cls, rows:int=1, cols:int=1, *, description:str="", conditions:dict={}, width_cm:float=None,
+			height_cm:float=None, log:plf.LogPile=None):
+		''' Returns an empty Graf with a rows x cols grid of 2D axes (keys Ax0,
+		Ax1, ... in row-major order), to be filled through Axis.add_trace(),
+		add_errorbar() and add_surface(). No matplotlib figure is involved,
+		which makes this the cheap way to archive data that is never shown.
+
+			graf = Graf.new(1, 2)
+			graf.get_axis((0, 0)).add_trace(t, v, label="sweep")
+			graf.get_axis((0, 1)).add_surface(f, t, spectrogram)
+			graf.write_graf("run.graf")
+		'''
+
+		if rows < 1 or cols < 1:
+			raise ValueError(f"A Graf needs at least one row and column (got {rows} x {cols}).")
+		graf = cls(description=description, conditions=conditions, log=log)
+		if width_cm is not None:
+			graf.fig_width_cm = float(width_cm)
+		if height_cm is not None:
+			graf.fig_height_cm = float(height_cm)
+		for r in range(rows):
+			for c in range(cols):
+				ax = Axis(graf.style, log=graf.log)
+				ax.position = [r, c]
+				ax.span = [1, 1]
+				ax.y_axis_R.is_valid = False
+				ax.z_axis.is_valid = False
+				graf.axes[f"Ax{r * cols + c}"] = ax
+		return graf
 	
-	def mimic(self, fig):
-		''' Tells the Graf object to mimic the matplotlib figure as best as possible. '''
+	def mimic(self, fig, copy_data:bool=True):
+		''' Tells the Graf object to mimic the matplotlib figure as best as possible.
+
+		copy_data=False captures trace data without copying it (see
+		Trace.mimic); the Graf then shares its arrays with the figure's lines. '''
 		
 		print(self.log)
 		print(self.log.terminal_level)
@@ -1745,6 +2912,8 @@ class Graf(Packable):
 		# Find twin-axes and merge them here.
 		sole_axes = [] # This is a list of axes
 		twin_axes = [] # This is a list of lists of axes. Each sub-list contains a list of shared-axes
+		twin_group = {} # axis -> its list in twin_axes
+		twinned = _twinned_axes(fig.get_axes())
 		for ax in fig.get_axes():
 
 			# Skip colorbar axes — they are stored per-surface, not as independent axes
@@ -1753,18 +2922,18 @@ class Graf(Packable):
 				continue
 
 			# Check if axis is twinned
-			if has_twinx(ax):
+			if ax in twinned:
 				self.log.lowdebug(f"Adding axis ({ax}) to twin-axes.")
 				
 				# Check if its the main or secondary axis - add to list accordingly
 				if ax._sharex is None:
 					# If primary - add to twins list
-					twin_axes.append([ax])
-				else:
-					# Scan over twin axes lists
-					for tals in twin_axes:
-						if ax._sharex in tals:
-							tals.append(ax)
+					twin_group[ax] = [ax]
+					twin_axes.append(twin_group[ax])
+				elif ax._sharex in twin_group:
+					# Join the list holding the axis it shares x with
+					twin_group[ax._sharex].append(ax)
+					twin_group[ax] = twin_group[ax._sharex]
 			else:
 				self.log.lowdebug(f"Adding axis ({ax}) to sole-axes.")
 				
@@ -1796,7 +2965,7 @@ class Graf(Packable):
 		ax_idx = 0
 		for ax in sole_axes:
 			self.axes[f'Ax{ax_idx}'] = Axis(self.style, ax, log=self.log,
-											 position_override=inferred_positions.get(ax))
+											 position_override=inferred_positions.get(ax), copy_data=copy_data)
 			ax_idx += 1
 
 		# Mimic all twin-axes
@@ -1806,7 +2975,8 @@ class Graf(Packable):
 				self.log.warning(f"Failed to properly identify twin axes. Skipping.")
 				continue
 			self.axes[f'Ax{idx+idx_offset}'] = Axis(self.style, ax[0], twin_ax=ax[1], log=self.log,
-													 position_override=inferred_positions.get(ax[0]))
+													 position_override=inferred_positions.get(ax[0]),
+													 copy_data=copy_data)
 
 		# Defensive guard: this should be unreachable now that unsupported axes
 		# get an inferred position, but a figure with real axes must never
@@ -1858,7 +3028,8 @@ class Graf(Packable):
 		except:
 			return None
 	
-	def get_xdata(self, axis_pos:tuple=(0, 0), trace_idx:int=None, trace_label:str=None, use_np_array:bool=True):
+	def get_xdata(self, axis_pos:tuple=(0, 0), trace_idx:int=None, trace_label:str=None, use_np_array:bool=True,
+				  full:bool=False):
 		"""
 		Returns the X-data of the specified trace on the specified axes.
 		
@@ -1867,6 +3038,8 @@ class Graf(Packable):
 			trace_idx (int): Index of trace to access. Alternative to trace_label
 			trace_label (str): Label of trace to access. Alternative to trace_idx
 			use_np_array (bool): Return data in np array format
+			full (bool): For a decimated trace, return the full-resolution
+				data instead of the display envelope (see Trace.full_data)
 		
 		Returns:
 			X-data of specified trace
@@ -1876,14 +3049,16 @@ class Graf(Packable):
 		tr = self.get_trace(axis_pos=axis_pos, trace_idx=trace_idx, trace_label=trace_label)
 		if tr is None:
 			return None
+		x = tr.full_data()[0] if full else tr.x_data
 		
 		# Return data list
 		if use_np_array:
-			return np.array(tr.x_data)
+			return np.asarray(x)
 		else:
-			return list(tr.x_data)
+			return np.asarray(x).tolist()
 		
-	def get_ydata(self, axis_pos:tuple=(0, 0), trace_idx:int=None, trace_label:str=None, use_np_array:bool=True):
+	def get_ydata(self, axis_pos:tuple=(0, 0), trace_idx:int=None, trace_label:str=None, use_np_array:bool=True,
+				  full:bool=False):
 		"""
 		Returns the X-data of the specified trace on the specified axes.
 		
@@ -1892,6 +3067,7 @@ class Graf(Packable):
 			trace_idx (int): Index of trace to access. Alternative to trace_label
 			trace_label (str): Label of trace to access. Alternative to trace_idx
 			use_np_array (bool): Return data in np array format
+			full (bool): As for get_xdata
 		
 		Returns:
 			X-data of specified trace
@@ -1901,12 +3077,20 @@ class Graf(Packable):
 		tr = self.get_trace(axis_pos=axis_pos, trace_idx=trace_idx, trace_label=trace_label)
 		if tr is None:
 			return None
+		y = tr.full_data()[1] if full else tr.y_data
 		
 		# Return data list
 		if use_np_array:
-			return np.array(tr.y_data)
+			return np.asarray(y)
 		else:
-			return list(tr.y_data)
+			return np.asarray(y).tolist()
+
+	def decimate(self, policy=4096) -> int:
+		''' Decimates every long 2D line trace in place (see Trace.decimate).
+		Returns the number of traces decimated. '''
+
+		policy = DecimationPolicy.coerce(policy)
+		return sum(tr.decimate(policy) for ax in self.axes.values() for tr in ax.traces.values())
 	
 	def to_fig(self, window_title:str=None, scale:float=1.0):
 		''' Converts the Graf object to a matplotlib figure as best as possible.
@@ -1917,6 +3101,9 @@ class Graf(Packable):
 				   1.0 reproduces the original size; 2.0 doubles both dimensions.
 		'''
 
+		# pyplot (and with it a GUI backend) is only loaded to show a figure
+		import matplotlib.pyplot as plt
+
 		figsize = (self.fig_width_cm / 2.54 * scale, self.fig_height_cm / 2.54 * scale)
 		if window_title is None:
 			gen_fig = plt.figure(figsize=figsize)
@@ -1986,14 +3173,12 @@ class Graf(Packable):
 	
 	def _data_hash(self):
 		"""SHA-256 of the graph's data, excluding the volatile provenance/history
-		blocks, so it reflects only whether the actual figure content changed."""
+		blocks, so it reflects only whether the actual figure content changed.
+		Array digests are cached per node (see _TrackedNode), so only data
+		replaced or marked modified since the last hash is read."""
 		try:
-			pkt = self.pack()
-			info = pkt.get("info")
-			if isinstance(info, dict):
-				info.pop("provenance", None)
-				info.pop("history", None)
-			return _stable_content_hash(pkt)
+			info = _node_digest(self.info, exclude=("provenance", "history"))
+			return _node_digest(self, overrides={"info": info}).hex()
 		except Exception:
 			return ""
 
@@ -2032,7 +3217,7 @@ class Graf(Packable):
 				if sh:
 					prov["source_sha256"] = sh
 			if include_system_info:
-				prov.update(_system_info())
+				prov.update(system_info())
 			info.provenance = prov
 
 		# ---- history: append-only, gated on real change ----------------------
@@ -2052,8 +3237,11 @@ class Graf(Packable):
 
 	def write_graf(self, filename:str, *, source_app:str=None, action:str=None,
 				   source_file:str=None, source_format:str=None,
-				   include_system_info:bool=True):
-		"""Serialize this Graf to a TOME file.
+				   include_system_info:bool=True, storage=None, precision=None,
+				   trace_table_min:int=None, format:str=None, decimate=None,
+				   skip_unchanged:bool=False):
+		"""Serialize this Graf to a GrAF file (TOME/HDF5 unless the extension
+		or `format` names another codec - see graf.codecs).
 
 		Provenance is stamped automatically here (the single write choke point):
 		the creation record is written on first save and an append-only history
@@ -2067,26 +3255,264 @@ class Graf(Packable):
 		  source_format       : e.g. 'touchstone_s2p', 'csv'
 		  include_system_info : stamp hostname / OS / CPU (default True); set
 		                        False to omit for privacy.
+		  storage             : StorageOptions (or a dict of its arguments, or
+		                        just 'gzip'/'lzf') to write large arrays chunked
+		                        and compressed. The settings are recorded in the
+		                        file; readers decode them transparently. Default
+		                        None writes every dataset contiguous.
+		  precision           : PrecisionPolicy (or a dict of its arguments,
+		                        or just 'float32'/'float16') to store float
+		                        trace data and surface grids lossily within a
+		                        guaranteed error bound. A Trace/Surface's own
+		                        .precision overrides it. Default None keeps
+		                        data exact.
+		  trace_table_min     : axes with at least this many traces are stored
+		                        as one columnar trace table rather than one
+		                        group per trace (default
+		                        TRACE_TABLE_MIN_TRACES; 0 never). Reading is
+		                        unaffected.
+		  format              : codec name ('tome', 'npz', 'json', ...);
+		                        default picks it from the extension. storage
+		                        and precision raise ValueError for codecs
+		                        without the 'compression'/'encodings'
+		                        capability.
+		  decimate            : DecimationPolicy (or a dict of its arguments,
+		                        or just a point budget) to store long 2D
+		                        lines as a min/max display envelope, with the
+		                        full data in separate x_full / y_full
+		                        datasets unless the policy drops it. This
+		                        Graf itself is not modified (see
+		                        Graf.decimate for that). Default None.
+		  skip_unchanged      : don't rewrite the file this Graf last wrote
+		                        if the data and options are the same and the
+		                        file is untouched since. Default False
+		                        (always write).
+
+		Returns nothing. A failed write raises (the codec's error); no partly
+		written file is left behind and this Graf's provenance/history are
+		left as they were.
 		"""
-		# Hash the data BEFORE stamping (stamping mutates provenance/history).
+		codec = get_codec(filename, format)
+		if storage is not None and not codec.supports("compression"):
+			raise ValueError(f"The '{codec.name}' format does not support storage options.")
+		if precision is not None and not codec.supports("encodings"):
+			raise ValueError(f"The '{codec.name}' format does not support precision policies.")
+
+		# Saving unchanged data over the file this Graf last wrote (same
+		# options, file untouched since) would rewrite identical content.
 		content_hash = self._data_hash()
-		self._stamp_provenance(content_hash=content_hash, source_app=source_app,
-							   action=action, source_file=source_file,
-							   source_format=source_format,
-							   include_system_info=include_system_info)
-		datapacket = self.pack()
+		saved_as = (codec.name, _options_key(storage), _options_key(precision), trace_table_min,
+					_options_key(decimate), content_hash)
+		if skip_unchanged and not action and content_hash and \
+				self._saved_files.get(os.path.abspath(filename)) == (saved_as, _file_stamp(filename)):
+			self.log.debug(f"'{filename}' is up to date; not rewritten.")
+			return
+
+		# Overwriting the file this Graf was lazily read from: pull everything
+		# into memory and let go of the read handle first.
+		self._release_file(filename)
+		with self._provenance_lock:
+			stamped = (self.info.provenance, list(self.info.history))
+		datapacket, _ = self._packet_for_write(source_app=source_app, action=action, source_file=source_file,
+											   source_format=source_format, include_system_info=include_system_info,
+											   precision=precision, trace_table_min=trace_table_min,
+											   encode=codec.supports("encodings"), content_hash=content_hash,
+											   decimate=decimate)
+		# dict_to_hdf(datapacket, filename, show_detail=False)
+		try:
+			codec.write(datapacket, filename, storage=storage, index=_graf_index(datapacket))
+		except BaseException:
+			# Nothing was saved: take back the provenance stamped for it
+			with self._provenance_lock:
+				self.info.provenance, self.info.history = stamped
+			raise
+		self._saved_files[os.path.abspath(filename)] = (saved_as, _file_stamp(filename))
+
+	def _packet_for_write(self, *, source_app=None, action=None, source_file=None, source_format=None,
+						  include_system_info=True, precision=None, trace_table_min=None, encode=True,
+						  content_hash:str=None, decimate=None):
+		''' Stamps provenance and returns the packed Graf ready to be written
+		(with the TOME encodings applied unless encode=False), plus its
+		content hash (see write_graf for the arguments). '''
+
+		# Hash the data BEFORE stamping (stamping mutates provenance/history).
+		# The hash works from the live objects, so pack() runs once, here.
+		if content_hash is None:
+			content_hash = self._data_hash()
+		with self._provenance_lock:
+			self._stamp_provenance(content_hash=content_hash, source_app=source_app,
+								   action=action, source_file=source_file,
+								   source_format=source_format,
+								   include_system_info=include_system_info)
+			datapacket = self.pack()
 		try:
 			dict_summary(datapacket, verbose=1) #TODO: Make this a flag
 		except Exception:
 			pass
-		# dict_to_hdf(datapacket, filename, show_detail=False)
-		dict_to_tome(datapacket, filename, show_detail=False)
+		policy = DecimationPolicy.coerce(decimate)
+		if policy is not None:
+			for key, ax in self.axes.items():
+				_decimate_axis_packet(datapacket["axes"][key], ax, policy)
+		if encode:
+			for key, ax in self.axes.items():
+				_encode_axis_packet(datapacket["axes"][key], ax, precision, table_min=trace_table_min)
+		return datapacket, content_hash
 	
-	def read_graf(self, filename:str):
-		# datapacket = hdf_to_dict(filename)
-		datapacket = tome_to_dict(filename)
+	def append_trace(self, filename:str, axis_pos, trace, *, source_app:str=None, action:str=None, storage=None,
+					 precision=None) -> str:
+		''' Adds `trace` to the axis at `axis_pos` both in this Graf and in the
+		existing GrAF file `filename`, writing only the new trace group (see the
+		module-level append_trace()). Returns the HDF5 path of the new group. '''
+
+		if not isinstance(trace, Trace):
+			trace = Trace(trace, log=self.log)
+		self._release_file(filename)
+		path = append_trace(filename, axis_pos, trace, source_app=source_app, action=action, storage=storage,
+							precision=precision)
+		ax = self.axes.get(axis_pos, None) if isinstance(axis_pos, str) else self.get_axis(axis_pos)
+		if ax is not None:
+			ax.traces[path.split("/")[-1]] = trace
+		self._sync_history(filename)
+		return path
+
+	def append_axis(self, filename:str, axis, *, source_app:str=None, action:str=None, storage=None,
+					precision=None) -> str:
+		''' Adds `axis` both to this Graf and to the existing GrAF file
+		`filename`, writing only the new axis group (see the module-level
+		append_axis()). Returns the HDF5 path of the new group. '''
+
+		self._release_file(filename)
+		path = append_axis(filename, axis, source_app=source_app, action=action, storage=storage,
+						   precision=precision)
+		self.axes[path.split("/")[-1]] = axis
+		self._sync_history(filename)
+		return path
+
+	def _release_file(self, filename:str):
+		''' Loads everything and closes the lazy read handle if it is on
+		`filename`, so the file can be opened for writing. '''
+		if self._lazy_file is not None and self._lazy_filename == os.path.abspath(filename):
+			self.load_all()
+			self.close()
+
+	def _sync_history(self, filename:str):
+		''' Copies the history record just appended to `filename` into
+		self.info.history so the in-memory Graf matches the file. '''
+		with h5py.File(filename, 'r') as fh:
+			hist = read_value(fh["info"]["history"])
+		if not hasattr(self.info, "history") or not isinstance(self.info.history, list):
+			self.info.history = []
+		self.info.history.append(hist[-1])
+
+	def read_graf(self, filename:str, lazy:bool=False, axes:list=None, format:str=None):
+		''' Reads a GrAF file into this object.
+
+		Args:
+			filename: File to read.
+			lazy: If True, only the structure and metadata are read now. Every
+				data array (trace data, surface grids) is a LazyArray that is
+				read from disk the first time it is used. The file stays open
+				until close() is called (or the Graf is used as a context
+				manager). Codecs without the 'lazy' capability read
+				everything now.
+			axes: Optional list of axes to read, each given as a (row, col)
+				position or an axis key such as 'Ax3'. The other axis groups
+				are not read at all (for codecs with 'partial_read'; others
+				drop them after reading). Default reads every axis.
+			format: Codec name; default picks it from the extension.
+
+		Arrays the file stores once for several traces come back as
+		read-only views of one array (see _TrackedNode).
+		'''
+
+		self.close()
+		datapacket, handle = get_codec(filename, format).read(filename, lazy=lazy, axes=axes)
+		if handle is not None:
+			self._lazy_file = handle
+			self._lazy_filename = os.path.abspath(filename)
 		self.unpack(datapacket)
 
+	def load_all(self):
+		''' Reads every not-yet-loaded LazyArray into memory, so the Graf no
+		longer depends on the file it was lazily read from. '''
+
+		def _load(obj, fields):
+			for f in fields:
+				val = getattr(obj, f)
+				if isinstance(val, LazyArray):
+					setattr(obj, f, val.load())
+
+		for ax in self.axes.values():
+			for tr in ax.traces.values():
+				_load(tr, Trace.DATA_FIELDS)
+			for sf in ax.surfaces.values():
+				_load(sf, ("x_grid", "y_grid", "z_grid"))
+
+	def close(self):
+		''' Releases the file handle held after read_graf(lazy=True). Data that
+		was already used stays available; untouched LazyArrays can no longer be
+		read. Safe to call more than once. '''
+
+		if self._lazy_file is not None:
+			try:
+				self._lazy_file.close()
+			except Exception:
+				pass
+		self._lazy_file = None
+		self._lazy_filename = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
+
+	def snapshot(self):
+		''' Returns an independent copy of this Graf: every data array is
+		copied (lazily-read data is read), so later changes to this Graf, or
+		to arrays it shares with a matplotlib figure, do not affect it. The
+		write-time .precision of each trace/surface is carried over. '''
+
+		def _copy(obj):
+			if isinstance(obj, dict):
+				return {k: _copy(v) for k, v in obj.items()}
+			if isinstance(obj, list):
+				return [_copy(v) for v in obj]
+			if isinstance(obj, (np.ndarray, LazyArray)):
+				return np.array(obj, copy=True)
+			return obj
+
+		snap = Graf(log=self.log)
+		with self._provenance_lock:
+			packet = self.pack()
+		snap.unpack(_copy(packet))
+		for key, ax in self.axes.items():
+			for tr_key, tr in ax.traces.items():
+				snap.axes[key].traces[tr_key].precision = tr.precision
+			for sf_key, sf in ax.surfaces.items():
+				snap.axes[key].surfaces[sf_key].precision = sf.precision
+		return snap
+
+	def write_graf_async(self, filename:str, *, saver=None, **kwargs) -> concurrent.futures.Future:
+		''' Saves a snapshot of this Graf in the background (see AsyncSaver).
+		Only the snapshot is taken before returning; hashing, packing and
+		writing happen on the saver's worker. Takes the same keyword
+		arguments as write_graf.
+
+		When the save finishes, the history entry it wrote is appended to
+		this Graf's info.history (and its provenance set on the first
+		save), as write_graf would have done. That happens on the saver's
+		worker thread, under this Graf's _provenance_lock (which write_graf
+		and snapshot also take): read info.provenance / info.history once
+		the Future is done, or hold the lock.
+
+		Returns:
+			concurrent.futures.Future resolving to the Graf snapshot that was
+			written (or raising what write_graf raised).
+		'''
+		return (saver or default_saver()).submit(self, filename, **kwargs)
+
 def save_pklfig(figure, filename): #:matplotlib.figure.Figure, file_handle):
 	''' Writes the contents of a matplotlib figure to a pfig file. '''
 	
@@ -2095,16 +3521,1073 @@ def save_pklfig(figure, filename): #:matplotlib.figure.Figure, file_handle):
 
 def save_graf(figure, filename, description:str="", conditions:dict={},
 			  source_app:str=None, source_file:str=None, source_format:str=None,
-			  action:str=None, include_system_info:bool=True):
+			  action:str=None, include_system_info:bool=True, storage=None, precision=None,
+			  format:str=None, decimate=None):
 	''' Writes the contents of a matplotlib figure to a GrAF file.
 
 	source_app / source_file / source_format / action / include_system_info are
-	forwarded to write_graf for provenance stamping (see write_graf). '''
+	forwarded to write_graf for provenance stamping, storage / precision
+	select the dataset layout and lossy encoding, format the codec and
+	decimate the display envelope of long lines (see write_graf). Trace data is written straight from the figure's arrays,
+	without copying, since the Graf does not outlive the call. '''
 	
-	temp_graf = Graf(figure, description=description, conditions=conditions)
+	temp_graf = Graf(figure, description=description, conditions=conditions, copy_data=False)
 	temp_graf.write_graf(filename, source_app=source_app, source_file=source_file,
 						 source_format=source_format or "matplotlib_figure",
-						 action=action, include_system_info=include_system_info)
+						 action=action, include_system_info=include_system_info,
+						 storage=storage, precision=precision, format=format, decimate=decimate)
+
+class AsyncSaver:
+	''' Writes Grafs on a background thread, so a data-acquisition loop only
+	pays for taking a snapshot of each figure.
+
+	At most `max_pending` saves are queued or running at once: submit()
+	blocks until one finishes beyond that, so a producer faster than the
+	disk is slowed down instead of piling up snapshots in memory. With one
+	worker (the default) saves run in submission order, so repeated saves of
+	the same file land in order.
+
+	Threads rather than processes are used: Grafs carry their loggers and
+	are not cheaply picklable, and the expensive steps (hashing, compression,
+	file I/O) release the GIL for large arrays.
+
+		with AsyncSaver(max_pending=8) as saver:
+			for i in range(n):
+				...
+				save_graf_async(fig, f"frame_{i}.graf", saver=saver)
+	'''
+
+	def __init__(self, max_pending:int=4, max_workers:int=1):
+		if max_pending < 1:
+			raise ValueError(f"max_pending must be at least 1, got {max_pending}.")
+		self.max_pending = int(max_pending)
+		self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+															   thread_name_prefix="graf-save")
+		self._slots = threading.BoundedSemaphore(self.max_pending)
+		self._pending = set()
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _write(graf, snap, filename:str, kwargs:dict):
+		known = len(snap.info.history)
+		snap.write_graf(filename, **kwargs)
+		if graf is not None:
+			# Runs on the worker: the live Graf is only touched under its lock.
+			# Earlier queued saves of the same Graf may have stamped it since
+			# the snapshot was taken, so their entries are not repeated.
+			with graf._provenance_lock:
+				info = graf.info
+				if not info.provenance:
+					info.provenance = snap.info.provenance
+				for entry in snap.info.history[known:]:
+					if info.history:
+						if entry["action"] in ("created", "saved") and \
+								entry.get("content_sha256") == info.history[-1].get("content_sha256"):
+							continue
+						if entry["action"] == "created":
+							entry = {**entry, "action": "saved"}
+					info.history.append(entry)
+		return snap
+
+	def _done(self, future):
+		with self._lock:
+			self._pending.discard(future)
+		self._slots.release()
+
+	def submit(self, graf, filename:str, **kwargs) -> concurrent.futures.Future:
+		''' Snapshots `graf` (see Graf.snapshot) and queues it to be written
+		to `filename` with write_graf(**kwargs). Blocks while max_pending
+		saves are outstanding. '''
+
+		self._slots.acquire()
+		try:
+			snap = graf.snapshot()
+			future = self._executor.submit(self._write, graf, snap, filename, kwargs)
+		except Exception:
+			self._slots.release()
+			raise
+		with self._lock:
+			self._pending.add(future)
+		future.add_done_callback(self._done)
+		return future
+
+	@property
+	def pending(self) -> int:
+		''' Number of saves queued or running. '''
+		with self._lock:
+			return len(self._pending)
+
+	def wait(self, timeout:float=None):
+		''' Blocks until every save submitted so far has finished. Errors are
+		not raised here; they are on each save's Future. '''
+		with self._lock:
+			futures = list(self._pending)
+		concurrent.futures.wait(futures, timeout=timeout)
+
+	def shutdown(self, wait:bool=True):
+		''' Stops accepting saves; with wait=True, finishes the queued ones
+		first. '''
+		self._executor.shutdown(wait=wait)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.shutdown(wait=True)
+		return False
+
+_DEFAULT_SAVER = None
+_DEFAULT_SAVER_LOCK = threading.Lock()
+
+def default_saver() -> AsyncSaver:
+	''' The shared AsyncSaver used when none is given (created on first use;
+	its queued saves are finished when the interpreter exits). '''
+
+	global _DEFAULT_SAVER
+	with _DEFAULT_SAVER_LOCK:
+		if _DEFAULT_SAVER is None:
+			_DEFAULT_SAVER = AsyncSaver()
+		return _DEFAULT_SAVER
+
+def save_graf_async(figure, filename, description:str="", conditions:dict={}, *, saver:AsyncSaver=None,
+					**kwargs) -> concurrent.futures.Future:
+	''' Background version of save_graf: the figure is mimicked and its data
+	copied before returning (matplotlib is only touched on the calling
+	thread); hashing, packing and writing happen on `saver` (default: the
+	shared default_saver()). Keyword arguments are those of save_graf.
+
+	Returns:
+		concurrent.futures.Future resolving to the Graf that was written.
+	'''
+
+	kwargs.setdefault("source_format", "matplotlib_figure")
+	# submit() snapshots (copies) the data anyway, so don't copy it twice
+	graf = Graf(figure, description=description, conditions=conditions, copy_data=False)
+	return (saver or default_saver()).submit(graf, filename, **kwargs)
+
+def _open_axis_group(fh:h5py.Group, axis_pos):
+	''' Returns the on-disk group for the axis at `axis_pos` (a (row, col)
+	position or an 'AxN' key), or None. '''
+
+	if "axes" not in fh:
+		return None
+	keys = select_axis_keys(fh["axes"], [axis_pos])
+	return fh["axes"][keys[0]] if keys else None
+
+def read_axis(filename:str, axis_pos=(0, 0)):
+	''' Reads a single Axis (with its traces and surfaces) from a GrAF file,
+	without reading any other axis.
+
+	Args:
+		filename: GrAF file to read.
+		axis_pos: (row, col) position of the axis, or its key, e.g. 'Ax3'.
+
+	Returns:
+		Axis object, or None if no axis matches.
+	'''
+
+	with h5py.File(filename, 'r') as fh:
+		ax_grp = _open_axis_group(fh, axis_pos)
+		if ax_grp is None:
+			return None
+		ax = Axis(GraphStyle())
+		ax.unpack(read_group(ax_grp, shared={}))
+	return ax
+
+def read_trace(filename:str, axis_pos=(0, 0), trace_idx:int=None, trace_label:str=None):
+	''' Reads a single Trace from a GrAF file. Only the requested trace group
+	(plus the position/span of each axis, to locate it) is read, so pulling
+	one curve out of a large multi-axis file costs about as much as the curve.
+	On axes stored as a trace table, only that row's spans of each column are
+	read.
+
+	Args:
+		filename: GrAF file to read.
+		axis_pos: (row, col) position of the axis, or its key, e.g. 'Ax3'.
+		trace_idx: Index of trace to read. Alternative to trace_label.
+		trace_label: Display name of the trace to read. Alternative to trace_idx.
+
+	Returns:
+		Trace object, or None if no trace matches.
+	'''
+
+	if trace_idx is None and trace_label is None:
+		trace_idx = 0
+
+	with h5py.File(filename, 'r') as fh:
+		ax_grp = _open_axis_group(fh, axis_pos)
+		if ax_grp is None or "traces" not in ax_grp:
+			return None
+		tr_grp = ax_grp["traces"]
+
+		# Trace table: look the row up by key or display_name column
+		if is_record_table(tr_grp):
+			keys = RecordTable.keys(tr_grp)
+			if trace_label is not None:
+				labels = RecordTable.column(tr_grp, "display_name")
+				match = keys[labels.index(trace_label)] if trace_label in labels else None
+			else:
+				match = f"Tr{trace_idx}"
+			if match not in keys:
+				return None
+			tr = Trace()
+			tr.unpack(RecordTable.read(tr_grp, names=[match])[match])
+			return tr
+
+		if trace_label is not None:
+			match = None
+			for k in tr_grp.keys():
+				if "display_name" in tr_grp[k] and read_value(tr_grp[k]["display_name"]) == trace_label:
+					match = k
+					break
+		else:
+			match = f"Tr{trace_idx}"
+		if match is None or match not in tr_grp:
+			return None
+
+		tr = Trace()
+		tr.unpack(read_group(tr_grp[match]))
+	return tr
+
+def read_surface(filename:str, axis_pos=(0, 0), surface_idx:int=0):
+	''' Reads a single Surface from a GrAF file, touching only its group.
+
+	Args:
+		filename: GrAF file to read.
+		axis_pos: (row, col) position of the axis, or its key, e.g. 'Ax3'.
+		surface_idx: Index of the surface on that axis.
+
+	Returns:
+		Surface object, or None if no surface matches.
+	'''
+
+	with h5py.File(filename, 'r') as fh:
+		ax_grp = _open_axis_group(fh, axis_pos)
+		key = f"Sf{surface_idx}"
+		if ax_grp is None or "surfaces" not in ax_grp or key not in ax_grp["surfaces"]:
+			return None
+		sf = Surface()
+		sf.unpack(read_group(ax_grp["surfaces"][key]))
+	return sf
+
+def _next_key(grp:h5py.Group, prefix:str) -> str:
+	''' Next free 'TrN' / 'SfN' / 'AxN' key in an on-disk group (or among
+	the rows of a trace table). '''
+	used = [_key_index(k) for k in (RecordTable.keys(grp) if is_record_table(grp) else grp.keys())]
+	return f"{prefix}{max([i for i in used if i is not None], default=-1) + 1}"
+
+def _append_group(filename:str, parent_path, prefix:str, packet:dict, entries_fn, action:str,
+				  source_app:str=None, storage=None, write_fn=None) -> str:
+	''' Adds `packet` as a new group under `parent_path` of an existing GrAF
+	file, in place. Only the new group is written: existing datasets are
+	neither read nor rewritten, unless write_fn rewrites the parent. The
+	table of contents is extended and one history record naming the new
+	group (and its own SHA-256) is appended.
+
+	parent_path is either an HDF5 path or a callable taking the open file and
+	returning the parent group (or None if it does not exist). entries_fn maps
+	(new path, new key, packet) to the table-of-contents entries for the new
+	group. write_fn(parent, key, packet, storage), if given, replaces the
+	plain write of the new group; it returns True if it had to rewrite the
+	parent instead, which the history record then names under 'rewritten'.
+	action is the history label, or a callable mapping that flag to it.
+	Returns the HDF5 path of the new group and the history record. '''
+
+	with h5py.File(filename, 'a') as fh:
+		parent = parent_path(fh) if callable(parent_path) else fh.require_group(parent_path)
+		if parent is None:
+			raise KeyError(f"No matching axis in '{filename}'.")
+		if storage is None:
+			storage = recorded_storage(fh)
+		key = _next_key(parent, prefix)
+		parent_path = parent.name.lstrip('/')
+		path = f"{parent_path}/{key}"
+		rewritten = False
+		if write_fn is None:
+			write_value(parent, key, packet, storage=StorageOptions.coerce(storage))
+		else:
+			rewritten = bool(write_fn(parent, key, packet, storage=StorageOptions.coerce(storage)))
+
+		# Table of contents: add the new entries, bump the counts above them
+		index = read_json(fh, INDEX_KEY)
+		if index is not None:
+			new_entries = entries_fn(path, key, packet)
+			for e in index["entries"]:
+				if e["kind"] == "axis" and path.startswith(e["path"] + "/"):
+					for ne in new_entries:
+						if ne["kind"] in ("trace", "surface"):
+							e[f"n_{ne['kind']}s"] += 1
+			index["entries"].extend(new_entries)
+			index["n_axes"] = sum(1 for e in index["entries"] if e["kind"] == "axis")
+			write_json(fh, INDEX_KEY, index)
+
+		# History: one record for this append. The whole-file content hash is
+		# not recomputed (that would mean reading every dataset), so it is
+		# left empty and the hash of the appended group is recorded instead.
+		entry = {
+			"utc": _utc_now_iso(),
+			"action": str(action(rewritten) if callable(action) else action),
+			"by": _library_identity(),
+			"content_sha256": "",
+			"appended": path,
+			"appended_sha256": _stable_content_hash(packet),
+		}
+		if rewritten:
+			entry["rewritten"] = parent_path
+		if source_app:
+			entry["app"] = str(source_app)
+		append_list_item(fh.require_group("info"), "history", entry)
+		refresh_digests(fh, [parent_path, "info/history"])
+	return path, entry
+
+def append_trace(filename:str, axis_pos, trace, *, source_app:str=None, action:str=None, storage=None,
+				 precision=None) -> str:
+	''' Adds a Trace to an axis of an existing GrAF file without rewriting it.
+
+	Only the new trace group is written (cost is independent of how much is
+	already in the file); the table of contents and history are updated in
+	place. The trace gets the next free 'TrN' key on that axis. Axes stored
+	as a trace table are the exception: that axis's table is rewritten with
+	the new row, under `precision` (stored exactly if None).
+
+	Args:
+		filename: GrAF file to add to.
+		axis_pos: (row, col) position of the axis, or its key, e.g. 'Ax3'.
+		trace: Trace object (or a matplotlib Line2D, which is mimicked).
+		source_app: Optional app identity recorded in the history entry.
+		action: History label. Defaults to 'appended trace', or 'rewrote
+			trace table' for an axis stored as a trace table.
+		storage: Dataset layout for the new arrays. Defaults to the settings
+			the file was written with.
+		precision: Lossy encoding for the new arrays (see write_graf).
+
+	Returns:
+		HDF5 path of the new trace group, e.g. 'axes/Ax0/traces/Tr4'.
+	'''
+
+	if not isinstance(trace, Trace):
+		trace = Trace(trace)
+
+	def _parent(fh):
+		ax_grp = _open_axis_group(fh, axis_pos)
+		return None if ax_grp is None else ax_grp.require_group("traces")
+
+	raw = trace.pack()
+	packet = dict(raw)
+	_encode_trace_packet(packet, trace, precision)
+	policy = PrecisionPolicy.coerce(trace.precision if trace.precision is not None else precision)
+
+	def _write(parent, key, pkt, storage=None):
+		if not is_record_table(parent):
+			write_value(parent, key, pkt, storage=storage)
+			return False
+		# A trace table cannot grow in place: it is read back and rewritten
+		# with the new row. Only this axis's traces are rewritten.
+		records = RecordTable.read(parent)
+		records[key] = raw
+		table = RecordTable.build(records, ragged=Trace.DATA_FIELDS,
+								  encode=policy.encode if policy is not None else None,
+								  optional=Trace.DECIMATION_DEFAULTS)
+		holder, name = parent.parent, parent.name.split("/")[-1]
+		del holder[name]
+		write_value(holder, name, table if table is not None else records, storage=storage, links={})
+		return True
+
+	path, _ = _append_group(filename, _parent, "Tr", packet,
+							lambda path, key, pkt: [_trace_index_entry(path, pkt)],
+							lambda rewritten: action or ("rewrote trace table" if rewritten else "appended trace"),
+							source_app=source_app, storage=storage, write_fn=_write)
+	return path
+
+def append_axis(filename:str, axis, *, source_app:str=None, action:str=None, storage=None,
+				precision=None) -> str:
+	''' Adds an Axis (with its traces and surfaces) to an existing GrAF file
+	without rewriting it. Works like append_trace(); the axis gets the next
+	free 'AxN' key and keeps its own position/span.
+
+	Returns:
+		HDF5 path of the new axis group, e.g. 'axes/Ax2'.
+	'''
+
+	packet = axis.pack()
+	_encode_axis_packet(packet, axis, precision)
+	path, _ = _append_group(filename, "axes", "Ax", packet,
+							lambda path, key, pkt: _axis_index_entries(key, pkt),
+							action or "appended axis", source_app=source_app, storage=storage)
+	return path
+
+# MetaInfo fields an update may change. The rest identify the writing
+# library, and provenance/history are only ever stamped by GrAF itself.
+_INFO_USER_FIELDS = ("description", "conditions")
+
+def _update_group(grp:h5py.Group, updates:dict, template:Packable, where:str, exclude=()) -> list:
+	''' Writes the fields in `updates` into `grp`, the on-disk group of an
+	object of the same type as `template`. Packable values replace that whole
+	sub-group, plain dicts given for an object field (e.g. a Scale or Font)
+	are merged into it field by field, and anything else replaces the single
+	dataset. Returns the HDF5 paths that were rewritten. '''
+
+	allowed = set(template.manifest) | set(template.obj_manifest)
+	written = []
+	for k, v in updates.items():
+		if k in exclude or k not in allowed:
+			raise ValueError(f"'{k}' cannot be updated in {where}.")
+		if isinstance(v, dict) and k in template.obj_manifest and k in grp:
+			written += _update_group(grp[k], v, getattr(template, k), f"{where}/{k}")
+			continue
+		if isinstance(v, Packable):
+			v = v.pack()
+		replace_value(grp, k, v)
+		written.append(f"{grp.name.lstrip('/')}/{k}")
+	return written
+
+def update_graf(filename:str, style=None, info=None, axes_meta:dict=None, supertitle:str=None, *,
+				source_app:str=None, action:str=None) -> list:
+	''' Rewrites only the style and metadata of an existing GrAF file in
+	place. Trace and surface data are never read or rewritten, so restyling a
+	file costs a few kilobytes of I/O however large its data is.
+
+	Args:
+		filename: GrAF file to update.
+		style: GraphStyle (replaces every font), or a dict of partial updates,
+			e.g. {'title_font': {'bold': True}}.
+		info: MetaInfo or dict. Only 'description' and 'conditions' can be
+			changed; provenance and history are managed by GrAF.
+		axes_meta: Dict mapping an axis (row, col) position or 'AxN' key to an
+			Axis (all of its non-data fields are rewritten) or a dict of
+			fields, e.g. {(0, 0): {'title': 'Gain', 'x_axis': {'label': 'f (Hz)'}}}.
+		supertitle: New figure super-title.
+		source_app: Optional app identity recorded in the history entry.
+		action: History label. Defaults to 'updated metadata'.
+
+	Returns:
+		List of the HDF5 paths that were rewritten.
+
+	Raises:
+		KeyError: If an axis in axes_meta is not in the file.
+		ValueError: If a field is unknown or may not be changed (including
+			any attempt to change traces or surfaces).
+	'''
+
+	written = []
+	with h5py.File(filename, 'a') as fh:
+
+		if supertitle is not None:
+			replace_value(fh, "supertitle", str(supertitle))
+			written.append("supertitle")
+
+		if style is not None:
+			template = GraphStyle()
+			if isinstance(style, GraphStyle):
+				style = {k: getattr(style, k) for k in template.obj_manifest}
+			written += _update_group(fh.require_group("style"), style, template, "style")
+
+		if info is not None:
+			template = MetaInfo()
+			if isinstance(info, MetaInfo):
+				info = {k: getattr(info, k) for k in _INFO_USER_FIELDS}
+			protected = [k for k in template.manifest if k not in _INFO_USER_FIELDS]
+			written += _update_group(fh.require_group("info"), info, template, "info", exclude=protected)
+
+		for axis_pos, meta in (axes_meta or {}).items():
+			ax_grp = _open_axis_group(fh, axis_pos)
+			if ax_grp is None:
+				raise KeyError(f"No axis at {axis_pos} in '{filename}'.")
+			template = Axis(GraphStyle())
+			if isinstance(meta, Axis):
+				meta = {k: getattr(meta, k) for k in template.manifest + template.obj_manifest}
+			written += _update_group(ax_grp, meta, template, ax_grp.name.lstrip('/'))
+
+		if not written:
+			return written
+
+		# Keep the table of contents in step with renamed/moved axes
+		index = read_json(fh, INDEX_KEY)
+		if index is not None:
+			index["supertitle"] = str(read_value(fh["supertitle"])) if "supertitle" in fh else ""
+			if "info" in fh and "description" in fh["info"]:
+				index["description"] = str(read_value(fh["info"]["description"]))
+			for e in index["entries"]:
+				if e["kind"] == "axis" and e["path"] in fh:
+					ax_grp = fh[e["path"]]
+					e["label"] = str(read_value(ax_grp["title"])) if "title" in ax_grp else ""
+					e["type"] = str(read_value(ax_grp["axis_type"])) if "axis_type" in ax_grp else ""
+					e["position"] = [int(v) for v in read_value(ax_grp["position"])]
+					e["span"] = [int(v) for v in read_value(ax_grp["span"])]
+			write_json(fh, INDEX_KEY, index)
+
+		entry = {
+			"utc": _utc_now_iso(),
+			"action": str(action) if action else "updated metadata",
+			"by": _library_identity(),
+			"content_sha256": "",
+			"updated": ", ".join(written),
+		}
+		if source_app:
+			entry["app"] = str(source_app)
+		append_list_item(fh.require_group("info"), "history", entry)
+		refresh_digests(fh, written + ["info/history"])
+	return written
+
+class GrafStreamWriter:
+	''' Writes a GrAF file incrementally, for live acquisition.
+
+	The file, with every axis and trace (labels, styles, scales) is created
+	when the writer opens. Data is then appended chunk by chunk to resizable,
+	chunked datasets, so memory use is bounded by `buffer_points` per trace
+	however long the run is, and everything up to the last flush survives a
+	crash. On close the buffers are flushed, the axis limits are fitted to
+	the data (see `autoscale`), and the table of contents and provenance are
+	written, after which the file is an ordinary GrAF file.
+
+		fig, ax = plt.subplots()
+		ax.plot([], [], label="sweep")
+		ax.set_xlabel("Time (s)")
+		with GrafStreamWriter("run.graf", fig) as w:
+			for t, v in instrument:
+				w.append(t, v, trace="sweep")
+
+	Args:
+		filename: File to create (overwritten if it exists).
+		graf: Graf or matplotlib Figure giving the layout. Only its structure
+			and style are used; any data already in its traces is written
+			first and then appended to.
+		traces: Alternative to `graf`: labels of the traces to create on a
+			single default axis.
+		dtype: dtype of the streamed datasets for traces that start empty.
+		chunk_points: Chunk length (in points) of the streamed datasets.
+		buffer_points: Points buffered per trace before they are written.
+		flush_interval: Seconds between automatic flushes to disk (None to
+			only flush when buffers fill or flush() is called).
+		autoscale: Fit each axis's x/y limits and ticks to the streamed data
+			on close. Set False to keep the limits from `graf`.
+		storage: Optional StorageOptions; its compression is applied to the
+			streamed datasets.
+		swmr: Open the file in HDF5 single-writer/multiple-reader mode so
+			other processes can read it (h5py.File(..., 'r', swmr=True))
+			while it is being written. Requires HDF5 1.10+ to read.
+		source_app, include_system_info: Forwarded to provenance stamping.
+	'''
+
+	STREAM_FIELDS = ("x_data", "y_data", "z_data")
+
+	def __init__(self, filename:str, graf=None, traces:list=None, *, dtype=np.float64,
+				 chunk_points:int=16384, buffer_points:int=65536, flush_interval:float=5.0,
+				 autoscale:bool=True, storage=None, swmr:bool=False, source_app:str=None,
+				 include_system_info:bool=True):
+
+		if graf is None:
+			fig = matplotlib.figure.Figure()
+			ax = fig.add_subplot()
+			for label in (traces or ["Tr0"]):
+				ax.plot([], [], label=str(label))
+			graf = Graf(fig)
+		elif not isinstance(graf, Graf):
+			graf = Graf(graf)
+
+		self.filename = filename
+		self.graf = graf
+		self.buffer_points = int(buffer_points)
+		self.flush_interval = flush_interval
+		self.autoscale = autoscale
+		self.swmr = swmr
+		self.source_app = source_app
+		self.include_system_info = include_system_info
+		self.storage = StorageOptions.coerce(storage)
+
+		self._buffers = {}    # (ax_key, tr_key) -> {field: [chunks]}
+		self._buffered = {}   # (ax_key, tr_key) -> points buffered
+		self._stats = {}      # (ax_key, tr_key, field) -> [min, max, nan_count]
+		self._datasets = {}   # (ax_key, tr_key, field) -> h5py.Dataset
+		self._last_flush = datetime.datetime.now().timestamp()
+
+		# Create the skeleton: the full packed Graf, with each trace's data
+		# arrays replaced by resizable datasets.
+		self._fh = h5py.File(filename, 'w', libver=('latest' if swmr else None))
+		init_root(self._fh, self.storage)
+		self._fh.attrs[ATTR_DIGEST] = write_dict(self._fh, graf.pack(), storage=self.storage).hex()
+		for ax_key, ax in graf.axes.items():
+			for tr_key, tr in ax.traces.items():
+				grp = self._fh["axes"][ax_key]["traces"][tr_key]
+				self._buffers[(ax_key, tr_key)] = {f: [] for f in self._fields(tr)}
+				self._buffered[(ax_key, tr_key)] = 0
+				for f in self._fields(tr):
+					start = np.asarray(getattr(tr, f))
+					if start.size == 0 or start.dtype.kind not in "biuf":
+						start = np.empty(0, dtype=dtype)
+					self._datasets[(ax_key, tr_key, f)] = create_extendable(grp, f, start, chunk_len=chunk_points, storage=self.storage)
+					self._stats[(ax_key, tr_key, f)] = [None, None, 0]
+					self._update_stats((ax_key, tr_key, f), start)
+				# The template's data now lives in the file
+				for f in self._fields(tr):
+					setattr(tr, f, np.empty(0, dtype=dtype))
+		self._fh.flush()
+		if swmr:
+			self._fh.swmr_mode = True
+
+	@staticmethod
+	def _fields(tr) -> tuple:
+		if tr.trace_type == Trace.TRACE_LINE3D:
+			return GrafStreamWriter.STREAM_FIELDS
+		return GrafStreamWriter.STREAM_FIELDS[:2]
+
+	def _resolve(self, trace, axis_pos) -> tuple:
+		''' Finds the (axis key, trace key) addressed by append(). '''
+
+		if axis_pos is None:
+			axes = list(self.graf.axes.items())
+		elif isinstance(axis_pos, str):
+			axes = [(axis_pos, self.graf.axes[axis_pos])] if axis_pos in self.graf.axes else []
+		else:
+			ax = self.graf.get_axis(axis_pos)
+			axes = [(k, a) for k, a in self.graf.axes.items() if a is ax]
+
+		matches = []
+		for ax_key, ax in axes:
+			for tr_key, tr in ax.traces.items():
+				if trace is None or trace == tr_key or trace == tr.display_name or \
+						(isinstance(trace, int) and _key_index(tr_key) == trace):
+					matches.append((ax_key, tr_key))
+		if len(matches) == 1:
+			return matches[0]
+		if not matches:
+			raise KeyError(f"No trace matching {trace!r} at axis {axis_pos!r}.")
+		raise ValueError(f"Trace {trace!r} is ambiguous ({len(matches)} matches); name it or give axis_pos.")
+
+	def _update_stats(self, key, values:np.ndarray):
+		if values.size == 0 or values.dtype.kind not in "biuf":
+			return
+		st = self._stats[key]
+		if values.dtype.kind == "f":
+			nans = np.isnan(values)
+			st[2] += int(np.count_nonzero(nans))
+			values = values[np.isfinite(values)]
+		if values.size == 0:
+			return
+		lo, hi = values.min().item(), values.max().item()
+		st[0] = lo if st[0] is None else min(st[0], lo)
+		st[1] = hi if st[1] is None else max(st[1], hi)
+
+	def append(self, x_chunk, y_chunk, z_chunk=None, *, trace=None, axis_pos=None):
+		''' Appends points to a trace.
+
+		Args:
+			x_chunk, y_chunk: New points (scalars or 1-D arrays of equal length).
+			z_chunk: New z points, for 3-D traces only.
+			trace: Display name, 'TrN' key or index of the trace. May be
+				omitted when there is only one trace.
+			axis_pos: (row, col) position or 'AxN' key of the axis. Default
+				searches every axis.
+		'''
+
+		if self._fh is None:
+			raise ValueError("GrafStreamWriter is closed.")
+		key = self._resolve(trace, axis_pos)
+		fields = tuple(self._buffers[key].keys())
+		chunks = [x_chunk, y_chunk] + ([z_chunk] if len(fields) == 3 else [])
+		if len(fields) == 3 and z_chunk is None:
+			raise ValueError("3-D trace needs z_chunk.")
+		arrays = [np.atleast_1d(np.asarray(c, dtype=self._datasets[(key[0], key[1], f)].dtype)).reshape(-1)
+				  for f, c in zip(fields, chunks)]
+		if len({a.size for a in arrays}) != 1:
+			raise ValueError("x, y (and z) chunks must be the same length.")
+
+		for f, a in zip(fields, arrays):
+			self._buffers[key][f].append(a)
+			self._update_stats((key[0], key[1], f), a)
+		self._buffered[key] += arrays[0].size
+
+		if self._buffered[key] >= self.buffer_points:
+			self._write_buffer(key)
+		if self.flush_interval is not None and \
+				datetime.datetime.now().timestamp() - self._last_flush >= self.flush_interval:
+			self.flush()
+
+	def _write_buffer(self, key):
+		for f, parts in self._buffers[key].items():
+			if parts:
+				extend_dataset(self._datasets[(key[0], key[1], f)], np.concatenate(parts))
+				parts.clear()
+		self._buffered[key] = 0
+
+	def flush(self):
+		''' Writes all buffered points and flushes the file to disk. '''
+
+		if self._fh is None:
+			return
+		for key in self._buffers:
+			self._write_buffer(key)
+		self._fh.flush()
+		self._last_flush = datetime.datetime.now().timestamp()
+
+	def _fit_scales(self):
+		''' Refits each axis's x/y scales to the streamed data ranges, using a
+		scratch matplotlib axes so limits and ticks match what matplotlib
+		would have chosen for the same data. '''
+
+		for ax_key, ax in self.graf.axes.items():
+			ranges = {}
+			for tr_key, tr in ax.traces.items():
+				y_scale = "y_axis_R" if tr.use_yaxis_R else "y_axis_L"
+				for f, scale in (("x_data", "x_axis"), ("y_data", y_scale)):
+					lo, hi, _ = self._stats[(ax_key, tr_key, f)]
+					if lo is None:
+						continue
+					old = ranges.get(scale, (lo, hi))
+					ranges[scale] = (min(old[0], lo), max(old[1], hi))
+			if "x_axis" not in ranges or ax.axis_type != Axis.AXIS_LINE2D:
+				continue
+			for y_scale in ("y_axis_L", "y_axis_R"):
+				if y_scale not in ranges:
+					continue
+				scratch = matplotlib.figure.Figure().add_subplot()
+				scratch.set_xscale(ax.x_axis.scale_type)
+				scratch.set_yscale(getattr(ax, y_scale).scale_type)
+				scratch.plot(ranges["x_axis"], ranges[y_scale])
+				for name, sid in (("x_axis", Scale.SCALE_ID_X), (y_scale, Scale.SCALE_ID_Y)):
+					label = getattr(ax, name).label
+					new = Scale(self.graf.style, ax=scratch, scale_id=sid)
+					new.label = label
+					setattr(ax, name, new)
+					replace_value(self._fh["axes"][ax_key], name, new.pack())
+
+	def close(self, action:str=None):
+		''' Flushes, finalizes scales, table of contents and provenance, and
+		closes the file. Safe to call more than once. '''
+
+		if self._fh is None:
+			return
+		self.flush()
+		if self.swmr:
+			# No new objects may be created in SWMR mode; reopen normally
+			self._fh.close()
+			self._fh = h5py.File(self.filename, 'a', libver='latest')
+			self._datasets = {}
+
+		if self.autoscale:
+			self._fit_scales()
+
+		# Provenance: the content hash would mean re-reading the whole run,
+		# so it is left empty (any later full save records one).
+		self.graf._stamp_provenance(content_hash="", source_app=self.source_app,
+									action=action or "streamed", source_format="stream",
+									include_system_info=self.include_system_info)
+		info_grp = self._fh.require_group("info")
+		replace_value(info_grp, "provenance", self.graf.info.provenance)
+		replace_value(info_grp, "history", self.graf.info.history)
+
+		# Content digests of the streamed data (reads it back once)
+		streamed = [f"axes/{ax_key}/traces/{tr_key}/{f}" for (ax_key, tr_key), bufs in self._buffers.items()
+					for f in bufs]
+		refresh_digests(self._fh, streamed + ["info/provenance", "info/history"])
+
+		# Table of contents from the file structure plus the running stats
+		index = _graf_index(read_group(self._fh, lazy=True, exclude=(INDEX_KEY,)), with_values=False)
+		for e in index["entries"]:
+			if e["kind"] != "trace":
+				continue
+			_, ax_key, _, tr_key = e["path"].split("/")
+			for f, ds in e["datasets"].items():
+				st = self._stats.get((ax_key, tr_key, f))
+				if st is not None:
+					ds["min"], ds["max"], ds["nan_count"] = st
+			primary = "z_data" if "z_data" in e["datasets"] else "y_data"
+			if primary in e["datasets"]:
+				for k in ("min", "max", "nan_count"):
+					e[k] = e["datasets"][primary][k]
+		write_json(self._fh, INDEX_KEY, index)
+
+		self._fh.close()
+		self._fh = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		action = None if exc_type is None else f"streamed (interrupted: {exc_type.__name__})"
+		self.close(action=action)
+		return False
+
+class GrafArchive:
+	''' Many Grafs in one HDF5 file, under named keys - e.g. every figure of a
+	test campaign, instead of hundreds of separate .graf files.
+
+	Each member is stored in the group 'members/<name>' exactly as a
+	standalone GrAF file would be (same layout, own table of contents). The
+	root INDEX_KEY dataset lists every member with its description,
+	conditions, content hash and creation time, so listing or searching an
+	archive reads one small dataset (see inspect_archive()). Members are
+	added, replaced and removed in place; the others are never touched.
+
+		with GrafArchive("campaign.grafa") as arc:
+			arc.add("sweep_01", fig)
+			for entry in arc.members():
+				print(entry["name"], entry["description"])
+			g = arc.read("sweep_01", lazy=True)
+
+	Args:
+		filename: Archive file.
+		mode: 'r' to read, 'a' to read and add (creating the file if needed),
+			'w' to create a new archive, overwriting any existing file.
+		storage: Dataset layout for members added through this handle (see
+			write_graf). Defaults to the settings the archive was created
+			with.
+	'''
+
+	def __init__(self, filename:str, mode:str='a', storage=None):
+
+		if mode not in ("r", "a", "w"):
+			raise ValueError(f"Unrecognized mode '{mode}'. Options: ['r', 'a', 'w']")
+
+		self.filename = filename
+		self.mode = mode
+		self._fh = h5py.File(filename, mode)
+		try:
+			if ATTR_ARCHIVE not in self._fh.attrs:
+				if mode == "r" or len(self._fh.keys()) > 0:
+					raise ValueError(f"'{filename}' is not a GrAF archive.")
+				init_root(self._fh, StorageOptions.coerce(storage))
+				self._fh.attrs[ATTR_ARCHIVE] = ARCHIVE_SCHEMA
+				write_value(self._fh, "members", {})
+				self._index = {"archive_schema": ARCHIVE_SCHEMA, "graf_version": GRAF_VERSION, "members": []}
+				write_json(self._fh, INDEX_KEY, self._index)
+			else:
+				self._index = read_json(self._fh, INDEX_KEY)
+		except Exception:
+			self._fh.close()
+			raise
+		self.storage = storage if storage is not None else recorded_storage(self._fh)
+
+	def names(self) -> list:
+		''' Member names, in the order they were added. '''
+		return [e["name"] for e in self._index["members"]]
+
+	def members(self) -> list:
+		''' Index entries of every member (name, description, conditions,
+		content_sha256, created_utc, added_utc, sizes), read from the root
+		index only. '''
+		return [dict(e) for e in self._index["members"]]
+
+	def __contains__(self, name):
+		return name in self.names()
+
+	def __len__(self):
+		return len(self._index["members"])
+
+	def __iter__(self):
+		return iter(self.names())
+
+	def _member_group(self, name:str) -> h5py.Group:
+		if name not in self:
+			raise KeyError(f"No member '{name}' in archive '{self.filename}'.")
+		return self._fh["members"][name]
+
+	def add(self, name:str, graf, *, overwrite:bool=False, source_app:str=None, action:str=None,
+			include_system_info:bool=True, storage=None, precision=None) -> dict:
+		''' Writes `graf` (a Graf or a matplotlib figure) into the archive as
+		member `name`, stamping provenance as write_graf does. Only the new
+		member group and the root index are written.
+
+		Args:
+			name: Member key. Must not contain '/'.
+			graf: Graf, or a matplotlib Figure to mimic.
+			overwrite: Replace an existing member of the same name instead of
+				raising ValueError.
+			source_app, action, include_system_info, storage, precision: As
+				for write_graf.
+
+		Returns:
+			The member's root index entry.
+		'''
+
+		if self.mode == "r":
+			raise ValueError("Archive is open read-only.")
+		if not isinstance(name, str) or not name or "/" in name or name in (".", ".."):
+			raise ValueError(f"Invalid member name {name!r}.")
+		if name in self:
+			if not overwrite:
+				raise ValueError(f"Member '{name}' already exists (pass overwrite=True to replace it).")
+			self.remove(name)
+		if not isinstance(graf, Graf):
+			graf = Graf(graf)
+
+		packet, content_hash = graf._packet_for_write(source_app=source_app, action=action,
+													  include_system_info=include_system_info, precision=precision)
+		index = _graf_index(packet)
+		storage = StorageOptions.coerce(storage if storage is not None else self.storage)
+		write_value(self._fh["members"], name, packet, storage=storage, links={})
+		grp = self._fh["members"][name]
+		write_json(grp, INDEX_KEY, index)
+
+		info = graf.info
+		entry = {
+			"name": name,
+			"path": grp.name.lstrip("/"),
+			"description": str(info.description),
+			"conditions": json.loads(json.dumps(info.conditions, default=_json_default)),
+			"supertitle": str(graf.supertitle),
+			"content_sha256": content_hash,
+			"created_utc": str(info.provenance.get("created_utc", "")),
+			"added_utc": _utc_now_iso(),
+			"n_axes": index["n_axes"],
+			"n_traces": sum(1 for e in index["entries"] if e["kind"] == "trace"),
+			"n_surfaces": sum(1 for e in index["entries"] if e["kind"] == "surface"),
+			"nbytes": int(sum(e.get("nbytes", 0) for e in index["entries"])),
+		}
+		self._index["members"].append(entry)
+		write_json(self._fh, INDEX_KEY, self._index)
+		self._fh.flush()
+		return dict(entry)
+
+	def read(self, name:str, lazy:bool=False, axes:list=None):
+		''' Reads member `name` into a new Graf. With lazy=True its data arrays
+		are LazyArrays backed by this archive, which must stay open until
+		they have been used (see Graf.read_graf for `lazy` and `axes`). '''
+
+		graf = Graf()
+		graf.unpack(read_graf_packet(self._member_group(name), lazy=lazy, axes=axes))
+		return graf
+
+	def inspect(self, name:str) -> dict:
+		''' Table of contents of member `name` (see inspect_graf). '''
+		return read_json(self._member_group(name), INDEX_KEY)
+
+	def remove(self, name:str):
+		''' Deletes member `name`. As with any HDF5 delete, the space is not
+		reclaimed until the file is repacked (h5repack). '''
+
+		if self.mode == "r":
+			raise ValueError("Archive is open read-only.")
+		del self._member_group(name).parent[name]
+		self._index["members"] = [e for e in self._index["members"] if e["name"] != name]
+		write_json(self._fh, INDEX_KEY, self._index)
+
+	def close(self):
+		''' Closes the archive. Lazily read members can no longer load data.
+		Safe to call more than once. '''
+		if self._fh is not None:
+			self._fh.close()
+			self._fh = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+		return False
+
+def inspect_archive(filename:str) -> dict:
+	''' Returns the root index of a GrafArchive - one entry per member with
+	its name, description, conditions, content hash and creation time -
+	reading only that one dataset. '''
+
+	with h5py.File(filename, 'r') as fh:
+		if ATTR_ARCHIVE not in fh.attrs:
+			raise ValueError(f"'{filename}' is not a GrAF archive.")
+		return read_json(fh, INDEX_KEY)
+
+def inspect_graf(filename:str, format:str=None) -> dict:
+	''' Returns the table of contents of a GrAF file - every axis, trace and
+	surface with its path, kind, label, shape, dtype, min/max, NaN count and
+	byte size - reading only the root index dataset, never the data.
+
+	Files written before the index existed get one rebuilt from the file
+	structure instead; shapes, dtypes and sizes are exact but min, max and
+	nan_count are None (computing them would mean reading the data). Such
+	indexes are marked with 'rebuilt': True. `format` names the codec
+	(default: from the extension).
+	'''
+
+	codec = get_codec(filename, format)
+	index = codec.read_index(filename)
+	if index is not None:
+		return index
+	packet, handle = codec.read(filename, lazy=True)
+	try:
+		index = _graf_index(packet, with_values=False)
+	finally:
+		if handle is not None:
+			handle.close()
+	index["rebuilt"] = True
+	return index
+
+def verify_graf(filename:str, paths:list=None) -> dict:
+	''' Checks the data in a GrAF (TOME) file against the content digests
+	stored when it was written. Only the subtrees at `paths` (HDF5 paths such
+	as 'axes/Ax0/traces/Tr2', default: the whole file) are read; every group
+	above them is checked against its members' stored digests, so a partial
+	check still ties the verified data to the root digest.
+
+	Returns:
+		Dict with 'ok' (True if nothing mismatched), 'checked' (number of
+		nodes compared), 'mismatched' (paths whose content does not match
+		their stored digest, including the groups above a mismatch) and
+		'unverified' (paths without a stored digest, e.g. added by an older
+		version).
+
+	Raises:
+		ValueError: If the file (or a requested path) has no stored digest.
+		KeyError: If a path is not in the file.
+	'''
+
+	report = {"ok": True, "checked": 0, "mismatched": [], "unverified": []}
+	with h5py.File(filename, 'r') as fh:
+		if stored_digest(fh) is None:
+			raise ValueError(f"'{filename}' was written without content digests.")
+		for path in (paths or [""]):
+			path = path.strip("/")
+			node = fh[path] if path else fh
+			if stored_digest(node) is None:
+				raise ValueError(f"'{path}' in '{filename}' has no content digest.")
+			verify_digests(node, report, path)
+			parts = path.split("/") if path else []
+			for i in range(len(parts) - 1, -1, -1):
+				anc = "/".join(parts[:i])
+				grp = fh[anc] if anc else fh
+				stored = stored_digest(grp)
+				if stored is None:
+					continue
+				report["checked"] += 1
+				members = [(k, stored_digest(grp[k])) for k in grp.keys() if k != INDEX_KEY]
+				if any(d is None for _, d in members) or entries_digest(members) != stored:
+					if anc not in report["mismatched"]:
+						report["mismatched"].append(anc)
+	report["ok"] = not report["mismatched"]
+	return report
+
+def diff_graf(a:str, b:str) -> dict:
+	''' Compares two GrAF (TOME) files, e.g. two revisions of one figure,
+	using the content digests stored in them: only groups whose digests
+	differ are opened, so identical subtrees - however large - cost one
+	attribute read. Data without a stored digest is compared by content.
+
+	Returns:
+		Dict with 'identical' and the HDF5 paths that are 'changed', 'added'
+		(only in b) or 'removed' (only in a). Provenance and history count as
+		content here, so two saves of the same data differ in 'info/...'.
+	'''
+
+	report = {"identical": False, "changed": [], "added": [], "removed": []}
+	with h5py.File(a, 'r') as fa, h5py.File(b, 'r') as fb:
+		da, db = stored_digest(fa), stored_digest(fb)
+		if da is None or da != db:
+			diff_digests(fa, fb, report)
+	report["identical"] = not (report["changed"] or report["added"] or report["removed"])
+	return report
+
+def open_graf(filename:str, lazy:bool=True, format:str=None):
+	''' Opens a GrAF file and returns the Graf object. By default the read is
+	lazy (see Graf.read_graf), so use it as a context manager to release the
+	file when done:
+
+		with open_graf("big.graf") as g:
+			print(g.supertitle)
+			x = g.get_xdata((0, 0), 0)   # only this array is read
+	'''
+
+	temp_graf = Graf()
+	temp_graf.read_graf(filename, lazy=lazy, format=format)
+	return temp_graf
 
 def load_graf(filename):
 	''' Writes the contents of a matplotlib figure to a GrAF file. '''
@@ -0,0 +1,371 @@
+''' File formats ("codecs") for packed Grafs.
+
+Graf.write_graf/read_graf work on the packed dictionary (Graf.pack()); a
+codec turns that dictionary into a file and back. The codec is picked from
+the file extension or named explicitly with format=:
+
+	tome  .graf, .h5, .hdf5   HDF5 in TOME layout (storage.py). The full
+	                          format: lazy/partial reads, compression,
+	                          lossy encodings, in-place edits.
+	npz   .npz                numpy's zip of .npy arrays plus the structure
+	                          as JSON. Needs nothing beyond numpy; fast for
+	                          local caching.
+	json  .json               One JSON document, arrays as base64 payloads.
+	                          For web/JavaScript interop.
+
+Unknown extensions use 'tome', as every GrAF file did before codecs existed.
+Each codec declares what it supports (see CAPABILITIES) so callers can choose
+per workload; register_codec() adds new ones.
+'''
+
+import base64
+import json
+import os
+from abc import ABC, abstractmethod
+import h5py
+import numpy as np
+
+from graf.storage import INDEX_KEY, StorageOptions, LazyArray, write_tome, read_tome, read_group, read_value, read_json
+
+# What a codec can declare
+CAPABILITIES = {
+	"lazy": "read_graf(lazy=True) leaves data on disk until it is used",
+	"partial_read": "single axes/traces are read without reading the rest of the file",
+	"compression": "honours write_graf(storage=...)",
+	"encodings": "lossy precision policies, arithmetic sequences and trace tables",
+	"shared_data": "identical arrays are stored once",
+	"in_place_edit": "append_trace/append_axis/update_graf modify the file without rewriting it",
+	"index": "the table of contents (inspect_graf) is readable without the data",
+	"zero_dependency": "needs nothing beyond numpy and the standard library",
+	"text": "the file is human-readable text",
+}
+
+class GrafCodec(ABC):
+	''' Base class for file formats. Subclasses set `name`, `extensions` and
+	`capabilities` and implement write() and read() (a codec missing either
+	cannot be instantiated, so never reaches register_codec()); read_index()
+	defaults to None (no stored index). '''
+
+	name = ""
+	extensions = ()
+	capabilities = frozenset()
+
+	@abstractmethod
+	def write(self, packet:dict, filename:str, storage=None, index:dict=None):
+		''' Writes a packed Graf, and its table of contents if given. Returns
+		nothing: failures raise, without leaving a partly written file. '''
+		pass
+
+	@abstractmethod
+	def read(self, filename:str, lazy:bool=False, axes:list=None):
+		''' Reads a packed Graf (only the axes in `axes`, if given). Returns
+		the packet and an open handle backing lazily-read data (or None). '''
+		pass
+
+	def read_index(self, filename:str):
+		''' Returns the stored table of contents, or None. '''
+		return None
+
+	def supports(self, capability:str) -> bool:
+		return capability in self.capabilities
+
+	def __repr__(self):
+		return f"<{type(self).__name__} '{self.name}' {sorted(self.capabilities)}>"
+
+# ------------------------------------------------------------------------------
+# Axis selection (shared by every codec; same rule as Graf.get_axis)
+# ------------------------------------------------------------------------------
+
+def _position_span(ax_node):
+	if isinstance(ax_node, h5py.Group):
+		return read_value(ax_node['position']), read_value(ax_node['span'])
+	return ax_node['position'], ax_node['span']
+
+def axis_covers(ax_node, axis_pos) -> bool:
+	''' Checks whether an axis (an on-disk group, reading only its position/
+	span datasets, or a packed dict) spans the (row, col) position. '''
+	try:
+		pos, span = _position_span(ax_node)
+	except KeyError:
+		return False
+	for i in range(2):
+		if pos[i] > axis_pos[i] or pos[i]+span[i]-1 < axis_pos[i]:
+			return False
+	return True
+
+def select_axis_keys(axes_node, selection) -> list:
+	''' Resolves a list of axis keys ('Ax3') and/or (row, col) positions to the
+	matching keys of an axes group or packed axes dict. '''
+
+	keys = []
+	for sel in selection:
+		if isinstance(sel, str):
+			if sel in axes_node and sel not in keys:
+				keys.append(sel)
+			continue
+		for k in axes_node.keys():
+			if axis_covers(axes_node[k], sel):
+				if k not in keys:
+					keys.append(k)
+				break
+	return keys
+
+def read_graf_packet(fh:h5py.Group, lazy:bool=False, axes:list=None) -> dict:
+	''' Reads a Graf's packed dict from an open TOME file or group, optionally
+	only the axis groups named in `axes` (see Graf.read_graf). '''
+
+	if axes is None:
+		return read_group(fh, lazy=lazy, exclude=(INDEX_KEY,), shared={})
+	shared = {}
+	packet = {}
+	for k in fh.keys():
+		if k not in ("axes", INDEX_KEY):
+			packet[k] = read_value(fh[k], lazy=lazy, shared=shared)
+	packet["axes"] = {}
+	if "axes" in fh:
+		for k in select_axis_keys(fh["axes"], axes):
+			packet["axes"][k] = read_value(fh["axes"][k], lazy=lazy, shared=shared)
+	return packet
+
+def _select_packet_axes(packet:dict, axes:list) -> dict:
+	if axes is not None:
+		all_axes = packet.get("axes", {}) or {}
+		packet["axes"] = {k: all_axes[k] for k in select_axis_keys(all_axes, axes)}
+	return packet
+
+# ------------------------------------------------------------------------------
+# TOME / HDF5
+# ------------------------------------------------------------------------------
+
+class TomeCodec(GrafCodec):
+	''' HDF5 in TOME layout - the native GrAF format (see storage.py). '''
+
+	name = "tome"
+	extensions = (".graf", ".h5", ".hdf5")
+	capabilities = frozenset(("lazy", "partial_read", "compression", "encodings", "shared_data",
+							  "in_place_edit", "index"))
+
+	def write(self, packet:dict, filename:str, storage=None, index:dict=None):
+		write_tome(packet, filename, storage=storage, index=index)
+
+	def read(self, filename:str, lazy:bool=False, axes:list=None):
+		if lazy:
+			fh = h5py.File(filename, 'r')
+			try:
+				return read_graf_packet(fh, lazy=True, axes=axes), fh
+			except Exception:
+				fh.close()
+				raise
+		if axes is None:
+			return read_tome(filename, exclude=(INDEX_KEY,)), None
+		with h5py.File(filename, 'r') as fh:
+			return read_graf_packet(fh, axes=axes), None
+
+	def read_index(self, filename:str):
+		with h5py.File(filename, 'r') as fh:
+			return read_json(fh, INDEX_KEY)
+
+# ------------------------------------------------------------------------------
+# Array-free structure shared by the NPZ and JSON codecs
+# ------------------------------------------------------------------------------
+#
+# The packet becomes a JSON tree in which every array is replaced by
+# {"__ndarray__": ref} (what `ref` is depends on the codec), complex scalars
+# by {"__complex__": [re, im]} and non-finite floats (not valid JSON) by
+# {"__float__": "nan" | "inf" | "-inf"}. Tuples become lists, numpy scalars
+# Python ones - which is what a TOME round trip gives back too.
+
+ARRAY_TAG = "__ndarray__"
+COMPLEX_TAG = "__complex__"
+FLOAT_TAG = "__float__"
+
+def _to_tree(obj, put_array):
+	if isinstance(obj, dict):
+		return {str(k): _to_tree(v, put_array) for k, v in obj.items()}
+	if isinstance(obj, (list, tuple)):
+		return [_to_tree(v, put_array) for v in obj]
+	if isinstance(obj, (np.ndarray, LazyArray)):
+		arr = np.asarray(obj)
+		if arr.dtype.kind in ("U", "S", "O"):
+			arr = np.array([str(x) for x in arr.ravel().tolist()]).reshape(arr.shape)
+		return {ARRAY_TAG: put_array(arr)}
+	if isinstance(obj, (bool, np.bool_)):
+		return bool(obj)
+	if isinstance(obj, np.integer):
+		return int(obj)
+	if isinstance(obj, (float, np.floating)):
+		obj = float(obj)
+		return obj if np.isfinite(obj) else {FLOAT_TAG: str(obj)}
+	if isinstance(obj, (complex, np.complexfloating)):
+		return {COMPLEX_TAG: [float(obj.real), float(obj.imag)]}
+	if isinstance(obj, (bytes, np.bytes_)):
+		return bytes(obj).decode("utf-8", "replace")
+	return obj
+
+def _from_tree(tree, get_array):
+	if isinstance(tree, dict):
+		if len(tree) == 1 and ARRAY_TAG in tree:
+			return get_array(tree[ARRAY_TAG])
+		if len(tree) == 1 and COMPLEX_TAG in tree:
+			return complex(*tree[COMPLEX_TAG])
+		if len(tree) == 1 and FLOAT_TAG in tree:
+			return float(tree[FLOAT_TAG])
+		return {k: _from_tree(v, get_array) for k, v in tree.items()}
+	if isinstance(tree, list):
+		return [_from_tree(v, get_array) for v in tree]
+	return tree
+
+def _json_safe(obj):
+	''' JSON-serialisable copy of a table of contents (undone by
+	_from_json_safe). '''
+	return _to_tree(obj, lambda arr: arr.tolist())
+
+def _from_json_safe(tree):
+	return _from_tree(tree, lambda values: values)
+
+def _compressed(storage) -> bool:
+	storage = StorageOptions.coerce(storage)
+	return storage is not None and storage.compression is not None
+
+# ------------------------------------------------------------------------------
+# NPZ
+# ------------------------------------------------------------------------------
+
+class NpzCodec(GrafCodec):
+	''' numpy .npz: each array is a member ('a0', 'a1', ...), the structure is
+	the member 'graf' (a JSON string) and the table of contents 'graf_index',
+	which np.load reads without touching the arrays. Written with zip deflate
+	when `storage` asks for compression. Nothing is pickled. '''
+
+	name = "npz"
+	extensions = (".npz",)
+	capabilities = frozenset(("compression", "index", "zero_dependency"))
+
+	def write(self, packet:dict, filename:str, storage=None, index:dict=None):
+		arrays = {}
+
+		def _put(arr):
+			key = f"a{len(arrays)}"
+			arrays[key] = arr
+			return key
+
+		arrays["graf"] = np.array(json.dumps(_to_tree(packet, _put), allow_nan=False))
+		if index is not None:
+			arrays[INDEX_KEY] = np.array(json.dumps(_json_safe(index), allow_nan=False))
+		save = np.savez_compressed if _compressed(storage) else np.savez
+		# Written next to the target and moved over it, so a failed write
+		# leaves any existing file as it was. A file object stops numpy from
+		# appending '.npz' to other names.
+		tmp = f"{filename}.{os.getpid()}.tmp"
+		try:
+			with open(tmp, 'xb') as fh:
+				save(fh, **arrays)
+			os.replace(tmp, filename)
+		except BaseException:
+			if os.path.exists(tmp):
+				os.remove(tmp)
+			raise
+
+	def read(self, filename:str, lazy:bool=False, axes:list=None):
+		with np.load(filename, allow_pickle=False) as npz:
+			tree = json.loads(str(npz["graf"]))
+			return _select_packet_axes(_from_tree(tree, lambda key: npz[key]), axes), None
+
+	def read_index(self, filename:str):
+		with np.load(filename, allow_pickle=False) as npz:
+			if INDEX_KEY not in npz.files:
+				return None
+			return _from_json_safe(json.loads(str(npz[INDEX_KEY])))
+
+# ------------------------------------------------------------------------------
+# JSON
+# ------------------------------------------------------------------------------
+
+JSON_SCHEMA = "1.0"
+
+class JsonCodec(GrafCodec):
+	''' One JSON document: {"graf_json": JSON_SCHEMA, "graf": ..., "graf_index":
+	...}. Numeric arrays are {"dtype", "shape", "base64"} with the raw
+	little-endian bytes base64-encoded (decode with e.g. a JavaScript typed
+	array); string arrays are {"dtype": "str", "shape", "values"}. '''
+
+	name = "json"
+	extensions = (".json",)
+	capabilities = frozenset(("index", "zero_dependency", "text"))
+
+	@staticmethod
+	def _put(arr:np.ndarray) -> dict:
+		if arr.dtype.kind == "U":
+			return {"dtype": "str", "shape": list(arr.shape), "values": arr.ravel().tolist()}
+		arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder("<"))
+		return {"dtype": arr.dtype.str, "shape": list(arr.shape),
+				"base64": base64.b64encode(arr.tobytes()).decode("ascii")}
+
+	@staticmethod
+	def _get(ref:dict) -> np.ndarray:
+		if ref["dtype"] == "str":
+			return np.array(ref["values"], dtype=str).reshape(ref["shape"])
+		dtype = np.dtype(ref["dtype"])
+		arr = np.frombuffer(base64.b64decode(ref["base64"]), dtype=dtype).reshape(ref["shape"])
+		return arr.astype(dtype.newbyteorder("="))
+
+	def write(self, packet:dict, filename:str, storage=None, index:dict=None):
+		doc = {"graf_json": JSON_SCHEMA, "graf": _to_tree(packet, self._put)}
+		if index is not None:
+			doc[INDEX_KEY] = _json_safe(index)
+		text = json.dumps(doc, allow_nan=False)  # fails before the file is touched
+		with open(filename, 'w', encoding="utf-8") as fh:
+			fh.write(text)
+
+	def _load(self, filename:str) -> dict:
+		with open(filename, 'r', encoding="utf-8") as fh:
+			doc = json.load(fh)
+		if not isinstance(doc, dict) or "graf_json" not in doc:
+			raise ValueError(f"'{filename}' is not a GrAF JSON file.")
+		return doc
+
+	def read(self, filename:str, lazy:bool=False, axes:list=None):
+		return _select_packet_axes(_from_tree(self._load(filename)["graf"], self._get), axes), None
+
+	def read_index(self, filename:str):
+		index = self._load(filename).get(INDEX_KEY, None)
+		return None if index is None else _from_json_safe(index)
+
+# ------------------------------------------------------------------------------
+# Registry
+# ------------------------------------------------------------------------------
+
+DEFAULT_CODEC = "tome"
+
+_CODECS = {}
+
+def register_codec(codec:GrafCodec, overwrite:bool=False):
+	''' Makes `codec` available by name and by its extensions. '''
+
+	unknown = set(codec.capabilities) - set(CAPABILITIES)
+	if unknown:
+		raise ValueError(f"Unrecognized capabilities {sorted(unknown)}. Options: {sorted(CAPABILITIES)}")
+	if codec.name in _CODECS and not overwrite:
+		raise ValueError(f"A codec named '{codec.name}' is already registered.")
+	_CODECS[codec.name] = codec
+
+def available_codecs() -> dict:
+	''' Registered codec names mapped to their sorted capabilities. '''
+	return {name: sorted(c.capabilities) for name, c in _CODECS.items()}
+
+def get_codec(filename:str=None, format:str=None) -> GrafCodec:
+	''' Returns the codec named `format`, or else the one whose extension
+	matches `filename` (DEFAULT_CODEC if none does). '''
+
+	if format is not None:
+		if format not in _CODECS:
+			raise ValueError(f"Unrecognized format '{format}'. Options: {sorted(_CODECS)}")
+		return _CODECS[format]
+	ext = os.path.splitext(str(filename or ""))[1].lower()
+	for codec in _CODECS.values():
+		if ext in codec.extensions:
+			return codec
+	return _CODECS[DEFAULT_CODEC]
+
+for _codec in (TomeCodec(), NpzCodec(), JsonCodec()):
+	register_codec(_codec)
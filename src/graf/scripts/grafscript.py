@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import argparse
+import matplotlib.pyplot as plt
 from pylogfile.base import *
 from graf.base import *
 
@@ -13,8 +14,22 @@ parser.add_argument('--bold', help="Force use of bold fonts.", action='store_tru
 parser.add_argument('--italic', help="Force use of italic fonts.", action='store_true')
 parser.add_argument('--struct', help="Show internal strucutre of GrAF file.", action='store_true')
 parser.add_argument('-s', '--structure', help="Show internal strucutre of GrAF file, with verbose options.", action='store_true')
+parser.add_argument('--inplace', help="Write font changes back into each GrAF file (for HDF5 files only the style is rewritten, not the data).", action='store_true')
+parser.add_argument('-i', '--inspect', help="Print the table of contents of each GrAF file (reads only the index, no data) and exit.", action='store_true')
 args = parser.parse_args()
 
+def print_index(filename):
+	
+	index = inspect_graf(filename)
+	rebuilt = " (rebuilt, no statistics)" if index.get("rebuilt", False) else ""
+	print(f"{filename}: {index['n_axes']} axes, '{index['supertitle']}'{rebuilt}")
+	for entry in index['entries']:
+		if entry['kind'] == "axis":
+			print(f"  {entry['path']:<26} axis     '{entry['label']}' [{entry['type']}] traces={entry['n_traces']} surfaces={entry['n_surfaces']}")
+			continue
+		shape = "x".join(str(n) for n in entry['shape'])
+		print(f"  {entry['path']:<26} {entry['kind']:<8} '{entry['label']}' {shape} {entry['dtype']} min={entry['min']} max={entry['max']} nan={entry['nan_count']} bytes={entry['nbytes']}")
+
 def main():
 	
 	log = LogPile()
@@ -22,27 +37,26 @@ def main():
 	graphs = []
 	figs = []
 	
+	# Print table of contents only - no data is read and nothing is plotted
+	if args.inspect:
+		for filename in args.filenames:
+			print_index(filename)
+		return
+	
 	# Get filename from arguments
 	for filename in args.filenames:
 	# filename = args.filename
 	
-		len_gt5 = len(filename) > 5
-		len_gt7 = len(filename) > 7
+		# Pickled matplotlib figures (save_pklfig) are not GrAF files
+		if filename.upper().endswith(".PKLFIG"):
+			parser.error(f"'{filename}' is a pickled matplotlib figure, not a GrAF file.")
 		
-		# Read file
-		if len_gt5 and filename[-5:].upper() == ".GRAF":
-			graf1 = Graf()
-			graf1.read_graf(filename)
-		elif len_gt5 and filename[-5:].upper() == ".JSON":
-			print(f"JSON")
-			# if not log.read_graf(filename):
-			# 	print("\tFailed to read JSON file.")
-			pass
-		elif len_gt7 and filename[-7:].upper() == ".PKLFIG":
-			print(f"PklFig")
-			pass
-		else:
-			print(f"Other")
+		# Read file (read_graf picks the codec from the extension). Restyling
+		# in place rewrites only the style, so the data is read lazily: it is
+		# only needed for plotting.
+		edit_in_place = args.inplace and get_codec(filename).supports("in_place_edit")
+		graf1 = Graf()
+		graf1.read_graf(filename, lazy=edit_in_place)
 		
 		# Print strucutre if requested
 		if args.structure:
@@ -72,6 +86,15 @@ def main():
 			graf1.style.graph_font.bold = True
 			graf1.style.label_font.bold = True
 		
+		# Save restyling back to the file without touching its data
+		if args.inplace:
+			if edit_in_place:
+				graf1.close() # The lazy read handle would block the write
+				update_graf(filename, style=graf1.style, action="restyled by grafscript")
+				graf1.read_graf(filename, lazy=True) # Reopened for plotting
+			else:
+				graf1.write_graf(filename, action="restyled by grafscript")
+		
 		graphs.append(graf1)
 		
 		# Generate plot
@@ -0,0 +1,1452 @@
+''' Low-level HDF5 storage for GrAF files.
+
+GrAF files are TOME files (see stardust.tome): every group and dataset carries
+a '__pytype__' attribute naming the Python type it was written from, so any
+TOME reader (stardust.tome.tome_to_dict, the MATLAB graf_load.m) can rebuild
+the packed dictionary. This module writes that same layout, but owns the
+dataset creation step so GrAF can control how large arrays are laid out on
+disk (chunking, compression) without changing what a reader sees.
+'''
+
+import os
+import sys
+import json
+import hashlib
+import h5py
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+# Sentinel attribute used by the TOME format (must match stardust.tome)
+ATTR_TYPE = "__pytype__"
+
+# Root attribute recording the storage settings a file was written with
+ATTR_STORAGE = "graf_storage"
+
+# Attribute holding the SHA-256 (hex) of a node's content: tree_digest of the
+# value the node reads back as. A group's digest rolls up its members'
+# (except INDEX_KEY), so the root's covers the whole file (see verify_graf).
+ATTR_DIGEST = "graf_sha256"
+
+# Root dataset holding the JSON table of contents (see base._graf_index). It
+# is not part of the packed Graf, so Graf readers skip it.
+INDEX_KEY = "graf_index"
+
+COMPRESSION_TYPES = ["gzip", "lzf", None]
+
+class StorageOptions:
+	''' Describes how array datasets are laid out when a GrAF file is written.
+
+	Arrays at least `min_bytes` in size are written chunked and compressed;
+	smaller arrays (and all scalars/strings) stay contiguous, where chunking
+	would only add overhead. Everything is decoded transparently on read by
+	the standard HDF5 filter pipeline.
+
+	Args:
+		compression: 'gzip' (standard HDF5 deflate, readable everywhere
+			including MATLAB), 'lzf' (faster, but only available to h5py/
+			HDF5 builds with the lzf plugin), or None to disable.
+		compression_opts: gzip level 0-9. Ignored for lzf.
+		shuffle: Apply the byte-shuffle filter before compressing. Usually
+			improves the ratio on float data considerably.
+		min_bytes: Arrays smaller than this are stored contiguously.
+		chunks: True to let h5py choose a chunk shape, or an explicit tuple
+			applied to every compressed dataset of matching rank.
+	'''
+
+	def __init__(self, compression:str="gzip", compression_opts:int=4, shuffle:bool=True,
+				 min_bytes:int=64*1024, chunks=True):
+
+		if compression not in COMPRESSION_TYPES:
+			raise ValueError(f"Unrecognized compression '{compression}'. Options: {COMPRESSION_TYPES}")
+
+		self.compression = compression
+		self.compression_opts = compression_opts
+		self.shuffle = shuffle
+		self.min_bytes = int(min_bytes)
+		self.chunks = chunks
+
+	@classmethod
+	def coerce(cls, storage):
+		''' Accepts None, a StorageOptions, a dict of StorageOptions keyword
+		arguments, or a compression name ('gzip'/'lzf'), and returns a
+		StorageOptions or None. '''
+
+		if storage is None or isinstance(storage, StorageOptions):
+			return storage
+		if isinstance(storage, dict):
+			return cls(**storage)
+		if isinstance(storage, str):
+			return cls(compression=storage)
+		raise TypeError(f"Cannot interpret {type(storage).__name__} as storage options.")
+
+	def to_dict(self) -> dict:
+		return {
+			"compression": self.compression,
+			"compression_opts": self.compression_opts if self.compression == "gzip" else None,
+			"shuffle": bool(self.shuffle),
+			"min_bytes": self.min_bytes,
+			"chunks": self.chunks if isinstance(self.chunks, bool) else list(self.chunks),
+		}
+
+	def dataset_kwargs(self, arr:np.ndarray) -> dict:
+		''' Returns the h5py create_dataset() keyword arguments for `arr`. '''
+
+		if arr.ndim == 0 or arr.size == 0 or arr.nbytes < self.min_bytes:
+			return {}
+		if arr.dtype.kind not in "biufc":
+			return {}
+
+		kw = {}
+		if isinstance(self.chunks, bool):
+			kw["chunks"] = True
+		elif len(self.chunks) == arr.ndim:
+			kw["chunks"] = tuple(min(int(c), int(n)) for c, n in zip(self.chunks, arr.shape))
+		else:
+			kw["chunks"] = True
+		if self.compression is not None:
+			kw["compression"] = self.compression
+			if self.compression == "gzip":
+				kw["compression_opts"] = self.compression_opts
+		if self.shuffle:
+			kw["shuffle"] = True
+		return kw
+
+# Dataset attribute naming the lossy encoding of an array (see PrecisionPolicy)
+ATTR_ENCODING = "graf_encoding"
+
+PRECISION_ENCODINGS = ["none", "float32", "float16", "quantize"]
+
+DECIMATION_METHODS = ["minmax"]
+
+# Attribute tagging a dataset that is hard-linked from more than one place
+# (its value is the content digest). Readers hand out views of one array.
+ATTR_SHARED = "graf_shared"
+
+# Arrays smaller than this are not worth de-duplicating
+SHARE_MIN_BYTES = 1024
+
+class ArithmeticArray:
+	''' A 1-D array that is exactly start + step * arange(n), stored on disk as
+	[start, step, n, last] (pytype 'arithmetic'). The last element is kept
+	explicitly because np.linspace pins it to `stop`, which can differ from
+	start + step*(n-1) in the final bit. Only arrays that regenerate
+	bit-for-bit are stored this way (see detect()). '''
+
+	def __init__(self, start:float, step:float, n:int, last:float, dtype):
+		self.start = start
+		self.step = step
+		self.n = int(n)
+		self.last = last
+		self.dtype = np.dtype(dtype)
+
+	@classmethod
+	def detect(cls, arr:np.ndarray, min_points:int=16):
+		''' Returns an ArithmeticArray equal to `arr`, or None if it is not an
+		exact arithmetic sequence. Cheap for the common case: a few samples
+		are checked before the full array is regenerated and compared. '''
+
+		arr = np.asarray(arr)
+		if arr.ndim != 1 or arr.size < min_points or arr.dtype.kind not in "iuf":
+			return None
+		first = float(arr[0])
+		last = float(arr[-1])
+		n = arr.size
+		step = (last - first) / (n - 1)
+		if not np.isfinite(step) or step == 0:
+			return None
+		probe = np.array([1, n // 2, n - 2])
+		if not np.array_equal((probe * step + first).astype(arr.dtype), arr[probe]):
+			return None
+		cand = cls(first, step, n, last, arr.dtype)
+		if not np.array_equal(cand.expand(), arr):
+			return None
+		return cand
+
+	def expand(self) -> np.ndarray:
+		out = np.arange(self.n, dtype=np.float64) * self.step + self.start
+		if self.n > 0:
+			out[-1] = self.last
+		return out.astype(self.dtype)
+
+	def to_array(self) -> np.ndarray:
+		return np.array([self.start, self.step, self.n, self.last], dtype=np.float64)
+
+	def __len__(self):
+		return self.n
+
+# Reserved quantization codes, counted down from the top of the integer type
+_QUANT_SPECIALS = 3   # NaN, +inf, -inf
+
+class EncodedArray:
+	''' A float array in its lossy on-disk form (see PrecisionPolicy.encode),
+	ready to be written by write_value(). `source` is the exact array it was
+	made from. '''
+
+	def __init__(self, data:np.ndarray, pytype:str, attrs:dict, source:np.ndarray):
+		self.data = data
+		self.pytype = pytype
+		self.attrs = attrs
+		self.source = source
+
+	@property
+	def encoding(self) -> str:
+		return self.attrs[ATTR_ENCODING]
+
+	def decoded(self) -> np.ndarray:
+		''' The values a reader gets back (see decode_array). '''
+		return decode_array(self.data, {"dtype": str(self.source.dtype), **self.attrs})
+
+	@property
+	def max_error(self) -> float:
+		return self.attrs["graf_max_error"]
+
+	def __len__(self):
+		return len(self.source)
+
+class PrecisionPolicy:
+	''' Lossy encoding for floating-point data arrays (trace data, surface
+	grids), for archives where the plot, not bit-exact data, is what has to
+	be kept.
+
+	The error bound is guaranteed: every array is encoded, decoded and
+	compared to the original, and is stored exactly instead if the bound is
+	not met (or if the encoding would not make it smaller). The encoding,
+	bound and measured error are recorded on each dataset and checked when
+	the file is read.
+
+	Args:
+		encoding: 'float32' or 'float16' to cast; 'quantize' to store
+			round((x - offset) / scale) as the smallest unsigned integer type
+			that fits; 'none' to store exactly (e.g. to exempt one trace from
+			a file-wide policy).
+		abs_tol: Maximum absolute error.
+		rel_tol: Maximum error relative to the array's finite range
+			(max - min), i.e. to the extent of the plotted data.
+			Either abs_tol or rel_tol is required for 'quantize'; if both are
+			given the tighter one is used. For casts both are optional.
+		min_points: Arrays with fewer points are always stored exactly.
+	'''
+
+	def __init__(self, encoding:str="float32", abs_tol:float=None, rel_tol:float=None, min_points:int=64):
+
+		if encoding not in PRECISION_ENCODINGS:
+			raise ValueError(f"Unrecognized encoding '{encoding}'. Options: {PRECISION_ENCODINGS}")
+		if encoding == "quantize" and abs_tol is None and rel_tol is None:
+			raise ValueError("The 'quantize' encoding needs abs_tol or rel_tol.")
+		for tol in (abs_tol, rel_tol):
+			if tol is not None and not tol >= 0:
+				raise ValueError(f"Tolerances must be non-negative, got {tol}.")
+
+		self.encoding = encoding
+		self.abs_tol = abs_tol
+		self.rel_tol = rel_tol
+		self.min_points = int(min_points)
+
+	@classmethod
+	def coerce(cls, precision):
+		''' Accepts None, a PrecisionPolicy, a dict of PrecisionPolicy keyword
+		arguments, or an encoding name, and returns a PrecisionPolicy or
+		None. '''
+
+		if precision is None or isinstance(precision, PrecisionPolicy):
+			return precision
+		if isinstance(precision, dict):
+			return cls(**precision)
+		if isinstance(precision, str):
+			return cls(encoding=precision)
+		raise TypeError(f"Cannot interpret {type(precision).__name__} as a precision policy.")
+
+	def to_dict(self) -> dict:
+		return {"encoding": self.encoding, "abs_tol": self.abs_tol, "rel_tol": self.rel_tol,
+				"min_points": self.min_points}
+
+	def _bound(self, span:float):
+		bounds = []
+		if self.abs_tol is not None:
+			bounds.append(float(self.abs_tol))
+		if self.rel_tol is not None:
+			bounds.append(float(self.rel_tol) * span)
+		return min(bounds) if bounds else None
+
+	def encode(self, arr):
+		''' Returns an EncodedArray for `arr`, or `arr` itself when it is to be
+		stored exactly (non-float data, too short, bound not met, no gain). '''
+
+		arr = np.asarray(arr)
+		if self.encoding == "none" or arr.dtype.kind != "f" or arr.size < self.min_points:
+			return arr
+
+		finite_mask = np.isfinite(arr)
+		finite = arr[finite_mask]
+		span = float(finite.max() - finite.min()) if finite.size else 0.0
+		bound = self._bound(span)
+
+		if self.encoding in ("float32", "float16"):
+			target = np.dtype(self.encoding)
+			if arr.dtype.itemsize <= target.itemsize:
+				return arr
+			with np.errstate(over="ignore"):
+				data = arr.astype(target)
+			if not np.all(np.isfinite(data[finite_mask])):
+				return arr
+			err = _max_abs_error(arr, data, finite_mask)
+			if bound is not None and err > bound:
+				return arr
+			attrs = {ATTR_ENCODING: self.encoding, "graf_max_error": err}
+			if bound is not None:
+				attrs["graf_error_bound"] = bound
+			return EncodedArray(data, "ndarray", attrs, arr)
+
+		# Quantize. The step is a hair under 2*bound so rounding the decoded
+		# value in float64 cannot push the error over the bound.
+		if finite.size == 0:
+			return arr
+		offset = float(finite.min())
+		if not bound > 0:
+			return arr  # e.g. rel_tol on a constant array: nothing to round to
+		scale = 2.0 * bound * (1 - 1e-6)  # a constant array gets all-zero codes
+		top_code = int(np.floor(span / scale + 0.5))
+		code_dtype = None
+		for dt in (np.uint8, np.uint16, np.uint32):
+			if top_code <= np.iinfo(dt).max - _QUANT_SPECIALS:
+				code_dtype = np.dtype(dt)
+				break
+		if code_dtype is None or code_dtype.itemsize >= arr.dtype.itemsize:
+			return arr
+
+		codes = np.zeros(arr.shape, dtype=code_dtype)
+		codes[finite_mask] = np.rint((finite - offset) / scale).astype(code_dtype)
+		top = np.iinfo(code_dtype).max
+		codes[np.isnan(arr)] = top
+		codes[np.isposinf(arr)] = top - 1
+		codes[np.isneginf(arr)] = top - 2
+		decoded = offset + codes.astype(np.float64) * scale
+		err = _max_abs_error(arr, decoded, finite_mask)
+		if err > bound:
+			return arr
+		attrs = {ATTR_ENCODING: "quantize", "graf_max_error": err, "graf_error_bound": bound,
+				 "graf_scale": scale, "graf_offset": offset}
+		return EncodedArray(codes, "quantized", attrs, arr)
+
+def minmax_envelope(values, buckets:int) -> np.ndarray:
+	''' Sorted indices of the min/max envelope of 1-D `values`: the first and
+	last points plus the minimum and maximum of each of (about) `buckets`
+	equal runs. Drawn as a line at screen resolution it looks like the full
+	data, and every extreme (a one-sample spike included) is kept. NaNs are
+	passed over when choosing unless a run holds nothing else, so gaps stay
+	visible. '''
+
+	v = np.asarray(values)
+	n = len(v)
+	buckets = max(int(buckets), 1)
+	if n <= 2 * buckets + 2:
+		return np.arange(n)
+	lo_src = hi_src = v
+	if v.dtype.kind == "f":
+		nans = np.isnan(v)
+		if nans.any():
+			lo_src = np.where(nans, np.inf, v)
+			hi_src = np.where(nans, -np.inf, v)
+
+	# Whole runs through a reshaped view (no copy); a short tail run after
+	size = -(-n // buckets)
+	rows = n // size
+	starts = np.arange(rows) * size
+	picks = [np.array([0, n - 1]),
+			 starts + lo_src[:rows * size].reshape(rows, size).argmin(axis=1),
+			 starts + hi_src[:rows * size].reshape(rows, size).argmax(axis=1)]
+	if rows * size < n:
+		tail = rows * size
+		picks.append(np.array([tail + int(lo_src[tail:].argmin()), tail + int(hi_src[tail:].argmax())]))
+	return np.unique(np.concatenate(picks))
+
+class DecimationPolicy:
+	''' Reduces long line traces to a display envelope, for figures whose
+	traces hold far more points than any screen can show (e.g. oscilloscope
+	captures of tens of millions of samples).
+
+	Args:
+		max_points: Traces longer than this are replaced by an envelope of at
+			most this many points.
+		method: 'minmax' keeps the minimum and maximum of each of
+			max_points / 2 runs of samples, so no extreme is ever lost.
+		keep_full: Keep the full-resolution data as well, in the separate
+			x_full / y_full datasets of the trace. False drops it.
+	'''
+
+	def __init__(self, max_points:int=4096, method:str="minmax", keep_full:bool=True):
+
+		if method not in DECIMATION_METHODS:
+			raise ValueError(f"Unrecognized decimation method '{method}'. Options: {DECIMATION_METHODS}")
+		if int(max_points) < 4:
+			raise ValueError(f"max_points must be at least 4, got {max_points}.")
+
+		self.max_points = int(max_points)
+		self.method = method
+		self.keep_full = bool(keep_full)
+
+	@classmethod
+	def coerce(cls, decimate):
+		''' Accepts None, a DecimationPolicy, a dict of DecimationPolicy keyword
+		arguments, a point budget (int) or a method name, and returns a
+		DecimationPolicy or None. '''
+
+		if decimate is None or isinstance(decimate, DecimationPolicy):
+			return decimate
+		if isinstance(decimate, dict):
+			return cls(**decimate)
+		if isinstance(decimate, (int, np.integer)) and not isinstance(decimate, bool):
+			return cls(max_points=int(decimate))
+		if isinstance(decimate, str):
+			return cls(method=decimate)
+		raise TypeError(f"Cannot interpret {type(decimate).__name__} as a decimation policy.")
+
+	def to_dict(self) -> dict:
+		return {"max_points": self.max_points, "method": self.method, "keep_full": self.keep_full}
+
+	def indices(self, values):
+		''' Indices of the points of `values` to keep, or None if it is short
+		enough to keep whole. '''
+
+		if len(values) <= self.max_points:
+			return None
+		return minmax_envelope(values, (self.max_points - 4) // 2)
+
+def _max_abs_error(original:np.ndarray, stored:np.ndarray, finite_mask:np.ndarray) -> float:
+	if not np.any(finite_mask):
+		return 0.0
+	diff = np.abs(stored[finite_mask].astype(np.float64) - original[finite_mask].astype(np.float64))
+	return float(diff.max())
+
+def decode_array(raw:np.ndarray, attrs) -> np.ndarray:
+	''' Decodes an array written with a PrecisionPolicy back to its original
+	dtype, checking that the recorded encoding is one this version knows and
+	that its recorded error is within its recorded bound. '''
+
+	raw = np.asarray(raw)
+	dtype = np.dtype(_decode(attrs.get("dtype", str(raw.dtype))))
+	enc = _decode(attrs.get(ATTR_ENCODING, "none"))
+	bound = attrs.get("graf_error_bound", None)
+	err = attrs.get("graf_max_error", 0.0)
+
+	if enc not in PRECISION_ENCODINGS:
+		raise ValueError(f"Unsupported data encoding '{enc}' (written by a newer GrAF?).")
+	if bound is not None and not float(err) <= float(bound):
+		raise ValueError(f"Corrupt '{enc}' dataset: recorded error {err} exceeds its bound {bound}.")
+
+	if enc in ("float32", "float16"):
+		if raw.dtype != np.dtype(enc):
+			raise ValueError(f"Corrupt '{enc}' dataset: stored as {raw.dtype}.")
+	elif enc == "quantize":
+		scale = float(attrs["graf_scale"])
+		if raw.dtype.kind != "u" or (bound is not None and scale / 2 > float(bound)):
+			raise ValueError(f"Corrupt quantized dataset (codes {raw.dtype}, step {scale}, bound {bound}).")
+		top = np.iinfo(raw.dtype).max
+		out = float(attrs["graf_offset"]) + raw.astype(np.float64) * scale
+		out[raw == top] = np.nan
+		out[raw == top - 1] = np.inf
+		out[raw == top - 2] = -np.inf
+		return out.astype(dtype)
+	return raw.astype(dtype) if raw.dtype != dtype else raw
+
+def read_storage_options(filename:str):
+	''' Returns the storage settings recorded in a GrAF file as a dict, or
+	None if the file was written without any. '''
+
+	with h5py.File(filename, 'r') as fh:
+		return recorded_storage(fh)
+
+def recorded_storage(fh:h5py.File):
+	''' Storage settings recorded on an open file (dict), or None. Used when
+	adding to an existing file so new datasets match the old ones. '''
+
+	raw = fh.attrs.get(ATTR_STORAGE, None)
+	if raw is None:
+		return None
+	if isinstance(raw, bytes):
+		raw = raw.decode("utf-8")
+	return json.loads(raw)
+
+# ------------------------------------------------------------------------------
+# TOME writer
+# ------------------------------------------------------------------------------
+
+def _list_to_array(lst:list) -> np.ndarray:
+	''' Converts a flat list to an ndarray the same way stardust.tome does,
+	falling back to per-element JSON strings for ragged/mixed data. '''
+
+	if not lst:
+		return np.array([])
+	if all(isinstance(x, str) for x in lst):
+		return np.array(lst, dtype=object)
+	try:
+		arr = np.array(lst)
+		if arr.dtype.kind in ("U", "S", "O"):
+			return np.array([json.dumps(x) for x in lst], dtype=object)
+		return arr
+	except ValueError:
+		return np.array([json.dumps(x) for x in lst], dtype=object)
+
+def _to_str(x) -> str:
+	if isinstance(x, (bytes, np.bytes_)):
+		try:
+			return bytes(x).decode("utf-8")
+		except Exception:
+			return bytes(x).decode("latin-1", "replace")
+	return str(x)
+
+def write_array(fh:h5py.Group, key:str, arr:np.ndarray, storage:StorageOptions=None, pytype:str="ndarray"):
+	''' Writes a numeric array as a TOME dataset, applying `storage`. '''
+
+	kw = storage.dataset_kwargs(arr) if storage is not None else {}
+	ds = fh.create_dataset(key, data=arr, **kw)
+	ds.attrs[ATTR_TYPE] = pytype
+	ds.attrs["dtype"] = str(arr.dtype)
+	return ds
+
+def _digest(data:np.ndarray) -> str:
+	h = hashlib.sha256()
+	h.update(str(data.dtype).encode())
+	h.update(str(data.shape).encode())
+	h.update(np.ascontiguousarray(data).data)
+	return h.hexdigest()[:32]
+
+def _write_data(fh:h5py.Group, key:str, data:np.ndarray, storage:StorageOptions=None,
+				pytype:str="ndarray", attrs:dict=None, links:dict=None, nbytes:int=None):
+	''' Writes a numeric dataset plus any decode attributes. When `links` (a
+	per-file dict) is given and an identical dataset was already written to
+	this file, a hard link to it is made instead, so the data is stored once
+	and every TOME/HDF5 reader still sees an ordinary dataset at `key`.
+	Contents are only hashed once two arrays of the same type and shape have
+	been seen. `nbytes` is the size of the array read back, if the stored
+	form is smaller (default data.nbytes). '''
+
+	attrs = attrs or {}
+	sig = None
+	if links is not None and (data.nbytes if nbytes is None else nbytes) >= SHARE_MIN_BYTES:
+		sig = (pytype, str(data.dtype), data.shape, json.dumps(attrs, sort_keys=True, default=str))
+		seen = links.setdefault(sig, [])
+		if seen:
+			digest = _digest(data)
+			for entry in seen:
+				if entry[0] is None:
+					entry[0] = _digest(entry[2])
+				if entry[0] == digest:
+					fh[key] = entry[1]
+					entry[1].attrs[ATTR_SHARED] = digest
+					return entry[1]
+
+	ds = write_array(fh, key, data, storage=storage, pytype=pytype)
+	for k, v in attrs.items():
+		ds.attrs[k] = v
+	if sig is not None:
+		links[sig].append([None, ds, data])
+	return ds
+
+def write_value(fh:h5py.Group, key:str, value, storage:StorageOptions=None, links:dict=None) -> bytes:
+	''' Writes a single key/value pair into an open HDF5 group in TOME layout.
+	Mirrors stardust.tome's type dispatch so files stay readable by any TOME
+	reader. `links` enables de-duplication of identical arrays (see
+	_write_data); write_tome passes one per file.
+
+	The new node is tagged with its content digest (ATTR_DIGEST), which is
+	also returned. '''
+
+	digest = None
+
+	# dict -> group
+	if isinstance(value, dict):
+		grp = fh.create_group(key)
+		grp.attrs[ATTR_TYPE] = "dict"
+		digest = write_dict(grp, value, storage=storage, links=links)
+
+	# list of dicts -> indexed subgroups
+	elif isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+		grp = fh.create_group(key)
+		grp.attrs[ATTR_TYPE] = "list_of_dicts"
+		for i, item in enumerate(value):
+			sub = grp.create_group(str(i))
+			sub.attrs[ATTR_TYPE] = "dict"
+			write_dict(sub, item, storage=storage, links=links)
+		digest = leaf_digest(value)
+
+	# list of strings -> vlen UTF-8
+	elif isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+		ds = fh.create_dataset(key, data=np.array(value, dtype=object),
+							   dtype=h5py.string_dtype(encoding="utf-8"))
+		ds.attrs[ATTR_TYPE] = "list"
+		ds.attrs["dtype"] = "str"
+		digest = leaf_digest(value)
+
+	# lossy-encoded float array: codes plus the attributes to decode them
+	elif isinstance(value, EncodedArray):
+		_write_data(fh, key, value.data, storage=storage, pytype=value.pytype,
+					attrs={"dtype": str(value.source.dtype), **value.attrs}, links=links)
+		digest = leaf_digest(value)
+
+	# exact arithmetic sequence: [start, step, n, last]
+	elif isinstance(value, ArithmeticArray):
+		_write_data(fh, key, value.to_array(), pytype="arithmetic",
+					attrs={"dtype": str(value.dtype)}, links=links, nbytes=value.n * value.dtype.itemsize)
+		digest = leaf_digest(value)
+
+	# dict of same-shaped records, stored column-wise
+	elif isinstance(value, RecordTable):
+		digest = value.write(fh, key, storage=storage, links=links)
+
+	# lazily-read array from another file: read it now
+	elif isinstance(value, LazyArray):
+		arr = value.load()
+		_write_data(fh, key, arr, storage=storage, links=links)
+		digest = leaf_digest(arr)
+
+	# numpy array
+	elif isinstance(value, np.ndarray):
+		if value.dtype.kind in ("U", "S", "O"):
+			flat = [_to_str(x) for x in value.ravel().tolist()]
+			ds = fh.create_dataset(key, data=np.array(flat, dtype=object),
+								   dtype=h5py.string_dtype(encoding="utf-8"))
+			ds.attrs[ATTR_TYPE] = "ndarray"
+			ds.attrs["dtype"] = "str"
+		else:
+			_write_data(fh, key, value, storage=storage, links=links)
+			digest = leaf_digest(value)
+
+	# plain list -> dataset
+	elif isinstance(value, list):
+		arr = _list_to_array(value)
+		if arr.dtype == object:
+			ds = fh.create_dataset(key, data=arr, dtype=h5py.string_dtype(encoding="utf-8"))
+			ds.attrs[ATTR_TYPE] = "list"
+			ds.attrs["dtype"] = "str"
+			ds.attrs["elem_encoding"] = "json"
+		else:
+			write_array(fh, key, arr, storage=storage, pytype="list")
+			digest = leaf_digest(arr.tolist())
+
+	# scalar str
+	elif isinstance(value, str):
+		ds = fh.create_dataset(key, data=value, dtype=h5py.string_dtype(encoding="utf-8"))
+		ds.attrs[ATTR_TYPE] = "str"
+		digest = leaf_digest(value)
+
+	# scalar bool (before int - bool is a subclass of int)
+	elif isinstance(value, (bool, np.bool_)):
+		ds = fh.create_dataset(key, data=int(value))
+		ds.attrs[ATTR_TYPE] = "bool"
+		digest = leaf_digest(bool(value))
+
+	# scalar numeric
+	elif isinstance(value, (int, float, complex, np.integer, np.floating)):
+		ds = fh.create_dataset(key, data=value)
+		ds.attrs[ATTR_TYPE] = type(value).__name__
+		digest = leaf_digest(value)
+
+	# fallback: JSON-encode (this is also how tuples, e.g. colors, are stored)
+	else:
+		ds = fh.create_dataset(key, data=json.dumps(value), dtype=h5py.string_dtype(encoding="utf-8"))
+		ds.attrs[ATTR_TYPE] = "json"
+
+	# Everything else is hashed as it reads back (type conversions included)
+	node = fh[key]
+	if digest is None:
+		digest = tree_digest(read_value(node))
+	node.attrs[ATTR_DIGEST] = digest.hex()
+	return digest
+
+def write_dict(fh:h5py.Group, data:dict, storage:StorageOptions=None, links:dict=None) -> bytes:
+	''' Writes every entry of `data` into the HDF5 group `fh`. Returns the
+	group's content digest (see tree_digest). '''
+	return entries_digest((str(k), write_value(fh, str(k), v, storage=storage, links=links))
+						  for k, v in data.items())
+
+def replace_value(fh:h5py.Group, key:str, value, storage:StorageOptions=None):
+	''' Writes `value` under `key`, first unlinking whatever was there. Used
+	for in-place updates of small members; nothing else in the file is
+	touched. HDF5 does not reclaim the unlinked space until the file is
+	repacked (h5repack), which is negligible for metadata-sized members. '''
+
+	if key in fh:
+		del fh[key]
+	write_value(fh, key, value, storage=storage)
+
+def append_list_item(fh:h5py.Group, key:str, item:dict, storage:StorageOptions=None):
+	''' Appends a dict to the list-of-dicts member `key` in place, writing only
+	the new element. A missing or empty member is replaced by a one-element
+	list. '''
+
+	node = fh.get(key, None)
+	if isinstance(node, h5py.Group) and _decode(node.attrs.get(ATTR_TYPE, "")) == "list_of_dicts":
+		idx = max((int(k) for k in node.keys()), default=-1) + 1
+		sub = node.create_group(str(idx))
+		sub.attrs[ATTR_TYPE] = "dict"
+		write_dict(sub, item, storage=storage)
+		return
+	if node is not None:
+		if read_value(node):
+			raise ValueError(f"'{key}' is not a list of dicts; cannot append to it.")
+		del fh[key]
+	write_value(fh, key, [item], storage=storage)
+
+def write_json(fh:h5py.Group, key:str, obj):
+	''' Writes `obj` as a single JSON string dataset (TOME pytype 'json'),
+	replacing any existing member of the same name. '''
+
+	if key in fh:
+		del fh[key]
+	ds = fh.create_dataset(key, data=json.dumps(obj), dtype=h5py.string_dtype(encoding="utf-8"))
+	ds.attrs[ATTR_TYPE] = "json"
+	return ds
+
+def write_tome(data:dict, filename:str, storage:StorageOptions=None, index:dict=None):
+	''' Writes a packed dictionary to `filename` in TOME layout, recording the
+	storage settings (if any) as a root attribute and the table of contents
+	(if given) as the root INDEX_KEY dataset.
+
+	Returns nothing; a failed write raises (OSError from h5py, or whatever
+	writing a value raised) and removes the partly written file. '''
+
+	storage = StorageOptions.coerce(storage)
+	fh = h5py.File(filename, 'w')
+	try:
+		with fh:
+			init_root(fh, storage)
+			fh.attrs[ATTR_DIGEST] = write_dict(fh, data, storage=storage, links={}).hex()
+			if index is not None:
+				write_json(fh, INDEX_KEY, index)
+	except BaseException:
+		# Truncated by the open above: what is left is not a valid file
+		try:
+			os.remove(filename)
+		except OSError:
+			pass
+		raise
+
+def init_root(fh:h5py.File, storage:StorageOptions=None):
+	''' Tags a newly created file's root group as a TOME dict and records the
+	storage settings (if any). '''
+
+	fh.attrs[ATTR_TYPE] = "dict"
+	if storage is not None:
+		fh.attrs[ATTR_STORAGE] = json.dumps(storage.to_dict())
+
+def create_extendable(fh:h5py.Group, key:str, arr:np.ndarray, chunk_len:int=16384,
+					  storage:StorageOptions=None) -> h5py.Dataset:
+	''' Writes a 1-D numeric array as a resizable TOME dataset (unlimited
+	length, fixed-size chunks) that can be grown with extend_dataset(). It
+	reads back exactly like any other array. Compression from `storage` is
+	applied regardless of min_bytes, since the final size is not known yet. '''
+
+	if key in fh:
+		del fh[key]
+	arr = np.asarray(arr).reshape(-1)
+	kw = {"chunks": (int(chunk_len),), "maxshape": (None,)}
+	if storage is not None and storage.compression is not None:
+		kw["compression"] = storage.compression
+		if storage.compression == "gzip":
+			kw["compression_opts"] = storage.compression_opts
+		kw["shuffle"] = bool(storage.shuffle)
+	ds = fh.create_dataset(key, data=arr, **kw)
+	ds.attrs[ATTR_TYPE] = "ndarray"
+	ds.attrs["dtype"] = str(arr.dtype)
+	return ds
+
+def extend_dataset(ds:h5py.Dataset, values:np.ndarray):
+	''' Appends `values` to a dataset made by create_extendable(). '''
+
+	values = np.asarray(values, dtype=ds.dtype).reshape(-1)
+	if values.size == 0:
+		return
+	n = ds.shape[0]
+	ds.resize((n + values.size,))
+	ds[n:] = values
+
+# ------------------------------------------------------------------------------
+# TOME reader
+# ------------------------------------------------------------------------------
+
+class LazyArray(NDArrayOperatorsMixin):
+	''' Stand-in for a numeric dataset in a lazily-read GrAF file. Shape and
+	dtype are known up front; the data itself is read from disk the first
+	time it is used (np.asarray(), arithmetic, iteration, ...) and cached.
+	Indexing before that reads only the requested slice.
+
+	The proxy needs the file it came from to still be open - see
+	Graf.close(). '''
+
+	def __init__(self, dataset:h5py.Dataset):
+		self._dataset = dataset
+		self._array = None
+		self._encoded = ATTR_ENCODING in dataset.attrs
+		self._region = None     # (start, stop) for a segment of a 1-D dataset
+		self.readonly = False   # set for datasets shared by several traces
+		self.shape = tuple(dataset.shape)
+		dtype_str = dataset.attrs.get("dtype", "")
+		if isinstance(dtype_str, bytes):
+			dtype_str = dtype_str.decode("utf-8")
+		try:
+			self.dtype = np.dtype(dtype_str) if dtype_str else dataset.dtype
+		except TypeError:
+			self.dtype = dataset.dtype
+
+	@property
+	def ndim(self):
+		return len(self.shape)
+
+	@property
+	def size(self):
+		return int(np.prod(self.shape))
+
+	@property
+	def nbytes(self):
+		return self.size * self.dtype.itemsize
+
+	@property
+	def loaded(self) -> bool:
+		''' True once the data has been read from disk. '''
+		return self._array is not None
+
+	def _check_open(self):
+		if self._dataset is None or not self._dataset:
+			raise ValueError("Cannot read lazily-loaded GrAF data: the file has been closed.")
+
+	def load(self) -> np.ndarray:
+		''' Reads (once) and returns the full array. '''
+		if self._array is None:
+			self._check_open()
+			self._array = self._from_disk(self._dataset[self._selection()])
+			if self.readonly:
+				self._array.flags.writeable = False
+			self._dataset = None
+		return self._array
+
+	def _selection(self):
+		return () if self._region is None else slice(*self._region)
+
+	def segment(self, start:int, stop:int) -> "LazyArray":
+		''' A LazyArray for elements [start, stop) of this (1-D, unread) one,
+		reading only those elements when used. '''
+		self._check_open()
+		seg = LazyArray(self._dataset)
+		seg._region = (int(start), int(stop))
+		seg.shape = (int(stop) - int(start),)
+		return seg
+
+	def _from_disk(self, raw) -> np.ndarray:
+		if self._encoded:
+			arr = decode_array(raw, self._dataset.attrs)
+		else:
+			arr = np.asarray(raw)
+		return arr.astype(self.dtype) if arr.dtype != self.dtype else arr
+
+	def __array__(self, dtype=None, copy=None):
+		arr = self.load()
+		if dtype is not None and arr.dtype != dtype:
+			return arr.astype(dtype)
+		if copy:
+			return arr.copy()
+		return arr
+
+	def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+		inputs = tuple(x.load() if isinstance(x, LazyArray) else x for x in inputs)
+		if "out" in kwargs:
+			kwargs["out"] = tuple(x.load() if isinstance(x, LazyArray) else x for x in kwargs["out"])
+		return getattr(ufunc, method)(*inputs, **kwargs)
+
+	def __getitem__(self, idx):
+		if self._array is not None:
+			return self._array[idx]
+		self._check_open()
+		if self._region is not None:
+			# Integers and forward slices are translated into the parent
+			# dataset; anything else reads the whole segment
+			span = range(*self._region)
+			if isinstance(idx, (int, np.integer)):
+				return self._from_disk(self._dataset[span[idx]])
+			if isinstance(idx, slice) and (idx.step or 1) > 0 and len(span[idx]):
+				sub = span[idx]
+				return self._from_disk(self._dataset[sub.start:sub.stop:sub.step])
+			return self.load()[idx]
+		try:
+			raw = self._dataset[idx]
+		except (TypeError, ValueError, IndexError):
+			return self.load()[idx]
+		return self._from_disk(raw)
+
+	def __len__(self):
+		if not self.shape:
+			raise TypeError("len() of unsized object")
+		return self.shape[0]
+
+	def __iter__(self):
+		return iter(self.load())
+
+	def __getattr__(self, name):
+		# Everything else (min, max, tolist, astype, ...) acts on the data
+		if name.startswith("_"):
+			raise AttributeError(name)
+		return getattr(self.load(), name)
+
+	def __repr__(self):
+		state = "loaded" if self.loaded else "on disk"
+		return f"<LazyArray shape={self.shape} dtype={self.dtype} ({state})>"
+
+def _decode(x):
+	if isinstance(x, (bytes, bytearray, np.bytes_)):
+		return _to_str(x)
+	return x
+
+def read_value(node, lazy:bool=False, shared:dict=None):
+	''' Rebuilds a Python value from an HDF5 node using its TOME '__pytype__'
+	tag, decoding exactly as stardust.tome does. With lazy=True, numeric
+	'ndarray' datasets come back as LazyArray proxies instead of being read.
+
+	`shared` is a per-file dict (read_tome passes one) through which datasets
+	hard-linked from several places (ATTR_SHARED) are read (or, for
+	arithmetic sequences, expanded) once: every reference gets a read-only
+	view of the same array (or the same LazyArray). Unshared arrays come
+	back writeable. '''
+
+	pytype = _decode(node.attrs.get(ATTR_TYPE, ""))
+
+	if isinstance(node, h5py.Group):
+		if pytype == "record_table":
+			return RecordTable.read(node, lazy=lazy)
+		if pytype == "list_of_dicts":
+			return [read_group(node[k], lazy=lazy, shared=shared) for k in sorted(node.keys(), key=int)]
+		return read_group(node, lazy=lazy, shared=shared)
+
+	digest = _decode(node.attrs.get(ATTR_SHARED, "")) if shared is not None else ""
+	if digest:
+		if digest not in shared:
+			val = read_value(node, lazy=lazy)
+			if isinstance(val, np.ndarray):
+				val.flags.writeable = False
+			elif isinstance(val, LazyArray):
+				val.readonly = True
+			shared[digest] = val
+		val = shared[digest]
+		return val.view() if isinstance(val, np.ndarray) else val
+
+	if pytype == "arithmetic":
+		start, step, n, last = np.asarray(node[()], dtype=np.float64)
+		dtype = _decode(node.attrs.get("dtype", "float64"))
+		return ArithmeticArray(start, step, int(n), last, dtype).expand()
+
+	if lazy and pytype in ("ndarray", "quantized") and node.ndim > 0 and node.dtype.kind in "biufc":
+		return LazyArray(node)
+
+	raw = node[()]
+
+	if pytype == "quantized" or ATTR_ENCODING in node.attrs:
+		return decode_array(raw, node.attrs)
+
+	if pytype == "str":
+		return str(_decode(raw))
+
+	if pytype == "bool":
+		return bool(raw)
+
+	if pytype == "ndarray":
+		arr = np.asarray(raw)
+		if arr.dtype.kind in ("S", "U", "O"):
+			decoded = np.array([_decode(x) for x in arr.ravel().tolist()])
+			try:
+				return decoded.reshape(arr.shape)
+			except Exception:
+				return decoded
+		dtype_str = _decode(node.attrs.get("dtype", ""))
+		if dtype_str and dtype_str != "str":
+			try:
+				arr = arr.astype(dtype_str)
+			except Exception:
+				pass
+		return arr
+
+	if pytype == "list":
+		arr = np.asarray(raw)
+		if arr.dtype.kind in ("S", "U", "O"):
+			decoded = [_decode(x) for x in arr.ravel().tolist()]
+			if _decode(node.attrs.get("elem_encoding", "")) == "json":
+				return [json.loads(x) for x in decoded]
+			return decoded
+		return arr.tolist()
+
+	if pytype == "json":
+		return json.loads(str(_decode(raw)))
+
+	if isinstance(raw, (bytes, np.bytes_, bytearray)):
+		return _decode(raw)
+	if isinstance(raw, np.ndarray):
+		if raw.dtype.kind in ("S", "U", "O"):
+			return [_decode(x) for x in raw.ravel().tolist()]
+		return raw.tolist()
+	if hasattr(raw, "item"):
+		return raw.item()
+	return raw
+
+def read_group(grp:h5py.Group, lazy:bool=False, exclude=(), shared:dict=None) -> dict:
+	''' Reads every member of an HDF5 group (except those named in `exclude`)
+	into a dict. '''
+	return {k: read_value(grp[k], lazy=lazy, shared=shared) for k in grp.keys() if k not in exclude}
+
+def read_tome(filename:str, exclude=()) -> dict:
+	''' Reads a whole TOME file into a packed dictionary. '''
+	with h5py.File(filename, 'r') as fh:
+		return read_group(fh, exclude=exclude, shared={})
+
+def read_json(fh:h5py.Group, key:str):
+	''' Reads a dataset written by write_json, or None if it is absent. '''
+	if key not in fh:
+		return None
+	return json.loads(str(_decode(fh[key][()])))
+
+# ------------------------------------------------------------------------------
+# Record tables
+# ------------------------------------------------------------------------------
+
+class RecordTable:
+	''' A dict of records (dicts with the same keys, e.g. the packed traces of
+	one axis) written column-wise as a single group (pytype 'record_table')
+	instead of one group per record:
+
+		keys        names of the records, in order
+		<field>     one 'column' dataset per scalar field; element i belongs
+		            to record i (see _write_column for the column types)
+		<field>/    one 'ragged' group per 1-D array field named in `ragged`:
+		  values    every distinct array, concatenated
+		  offsets   start of each distinct array in `values`, plus the end
+		  slots     index of the distinct array each record uses
+		  dtypes    per-record dtype (only if they differ)
+
+	The number of HDF5 objects depends on the number of fields, not records.
+	read_value() gives back the dict of records, so callers see the same
+	packed dict as for the one-group-per-record layout. `encode` (e.g.
+	PrecisionPolicy.encode) is applied to each concatenated `values` array. '''
+
+	def __init__(self, records:dict, ragged=(), encode=None):
+		self.records = records
+		self.ragged = tuple(ragged)
+		self.encode = encode
+
+	@classmethod
+	def build(cls, records:dict, ragged=(), encode=None, optional:dict=None):
+		''' Returns a RecordTable for `records`, or None if they cannot be
+		stored as one (no records, differing keys, non-1-D or non-numeric
+		ragged fields, array values in other fields). `optional` maps fields
+		that only some records have to the value the others are given. '''
+
+		rows = list(records.values())
+		if not rows or not all(isinstance(r, dict) for r in rows):
+			return None
+		if optional:
+			present = {f for r in rows for f in r if f in optional}
+			records = {k: {**r, **{f: optional[f] for f in present if f not in r}} for k, r in records.items()}
+			rows = list(records.values())
+		fields = list(rows[0].keys())
+		for r in rows:
+			if set(r.keys()) != set(fields):
+				return None
+			for f in fields:
+				v = r[f]
+				if f in ragged:
+					if np.ndim(v) != 1 or np.asarray(v).dtype.kind not in "biuf":
+						return None
+				elif isinstance(v, (np.ndarray, LazyArray, EncodedArray, ArithmeticArray, dict)):
+					return None
+		return cls(records, ragged=ragged, encode=encode)
+
+	@property
+	def fields(self) -> list:
+		return list(next(iter(self.records.values())).keys())
+
+	def __len__(self):
+		return len(self.records)
+
+	def write(self, fh:h5py.Group, key:str, storage:StorageOptions=None, links:dict=None) -> bytes:
+		''' Writes the table as the group `key` of `fh`. Returns the digest
+		of the dict of records read_value() will give back (see
+		tree_digest), computed from the data in memory. '''
+
+		grp = fh.create_group(key)
+		grp.attrs[ATTR_TYPE] = "record_table"
+		grp.attrs["fields"] = json.dumps(self.fields)
+		names = [str(k) for k in self.records.keys()]
+		grp.create_dataset("keys", data=np.array(names, dtype=object), dtype=h5py.string_dtype(encoding="utf-8"))
+		rows = list(self.records.values())
+		columns = {}
+		for f in self.fields:
+			values = [r[f] for r in rows]
+			if f in self.ragged:
+				columns[f] = self._write_ragged(grp, f, values, storage, links)
+			else:
+				self._write_column(grp, f, values)
+				columns[f] = values
+		return entries_digest((name, entries_digest((f, tree_digest(col[i])) for f, col in columns.items()))
+							  for i, name in enumerate(names))
+
+	@staticmethod
+	def _column_type(values:list) -> str:
+		if all(isinstance(v, (bool, np.bool_)) for v in values):
+			return "bool"
+		if all(isinstance(v, (int, np.integer)) and not isinstance(v, (bool, np.bool_)) for v in values):
+			return "int"
+		if all(isinstance(v, (float, np.floating)) for v in values):
+			return "float"
+		if all(isinstance(v, str) for v in values):
+			return "str"
+		# Fixed-length numeric tuples (colors) become an N x k array
+		if all(isinstance(v, (tuple, list)) for v in values) and len({len(v) for v in values}) == 1 and values[0]:
+			elems = [x for v in values for x in v]
+			if all(isinstance(x, (int, np.integer)) and not isinstance(x, (bool, np.bool_)) for x in elems):
+				return "int_tuple"
+			if all(isinstance(x, (float, np.floating)) for x in elems):
+				return "float_tuple"
+		return "json"
+
+	def _write_column(self, grp:h5py.Group, name:str, values:list):
+		''' Writes one scalar field as a dataset. 'bool' columns are uint8 (not
+		the HDF5 enum h5py uses for numpy bools, which MATLAB misreads);
+		anything that is not uniformly bool/int/float/str/numeric tuple is
+		stored as one JSON string per record. '''
+
+		coltype = self._column_type(values)
+		if coltype == "bool":
+			data = np.array(values, dtype=np.uint8)
+		elif coltype in ("int", "int_tuple"):
+			data = np.array(values, dtype=np.int64)
+		elif coltype in ("float", "float_tuple"):
+			data = np.array(values, dtype=np.float64)
+		else:
+			if coltype == "json":
+				values = [json.dumps(v) for v in values]
+			data = np.array(values, dtype=object)
+		if data.dtype == object:
+			ds = grp.create_dataset(name, data=data, dtype=h5py.string_dtype(encoding="utf-8"))
+		else:
+			ds = grp.create_dataset(name, data=data)
+		ds.attrs[ATTR_TYPE] = "column"
+		ds.attrs["coltype"] = coltype
+
+	def _write_ragged(self, grp:h5py.Group, name:str, values:list, storage, links) -> list:
+		''' Writes one array field as a concatenation of its distinct arrays.
+		Identical arrays (typically a shared x-axis) are stored once. Returns
+		the per-record arrays as they will read back (after `encode`). '''
+
+		sub = grp.create_group(name)
+		sub.attrs[ATTR_TYPE] = "ragged"
+		arrays = [np.asarray(v) for v in values]
+		dtype = np.result_type(*arrays) if arrays else np.dtype(np.float64)
+
+		unique = []
+		by_digest = {}
+		by_id = {}
+		slots = np.empty(len(arrays), dtype=np.int64)
+		for i, (v, arr) in enumerate(zip(values, arrays)):
+			slot = by_id.get(id(v), None)
+			if slot is None:
+				digest = _digest(arr)
+				slot = by_digest.get(digest, None)
+				if slot is None:
+					slot = len(unique)
+					unique.append(arr)
+					by_digest[digest] = slot
+				by_id[id(v)] = slot
+			slots[i] = slot
+
+		offsets = np.zeros(len(unique) + 1, dtype=np.int64)
+		offsets[1:] = np.cumsum([a.size for a in unique])
+		flat = np.concatenate([a.astype(dtype, copy=False) for a in unique]) if unique else np.empty(0, dtype=dtype)
+		stored = self.encode(flat) if self.encode is not None else flat
+		write_value(sub, "values", stored, storage=storage, links=links)
+		write_array(sub, "offsets", offsets)
+		write_array(sub, "slots", slots)
+		mixed = any(a.dtype != dtype for a in arrays)
+		if mixed:
+			ds = sub.create_dataset("dtypes", data=np.array([str(a.dtype) for a in arrays], dtype=object),
+									dtype=h5py.string_dtype(encoding="utf-8"))
+			ds.attrs[ATTR_TYPE] = "list"
+			ds.attrs["dtype"] = "str"
+
+		# What _ragged() will give back for each record
+		if isinstance(stored, EncodedArray):
+			stored = stored.decoded()
+		out = []
+		for s, arr in zip(slots, arrays):
+			seg = stored[offsets[s]:offsets[s + 1]]
+			out.append(seg.astype(arr.dtype) if mixed and seg.dtype != arr.dtype else seg)
+		return out
+
+	@staticmethod
+	def keys(grp:h5py.Group) -> list:
+		''' Record names of an on-disk record table. '''
+		return [_decode(k) for k in grp["keys"][()].tolist()]
+
+	@staticmethod
+	def column(grp:h5py.Group, name:str) -> list:
+		''' Values of one scalar field of an on-disk record table. '''
+
+		node = grp[name]
+		coltype = _decode(node.attrs.get("coltype", "json"))
+		raw = node[()]
+		if coltype == "bool":
+			return [bool(x) for x in raw.tolist()]
+		if coltype in ("int", "float", "int_tuple", "float_tuple"):
+			return raw.tolist()
+		decoded = [_decode(x) for x in raw.tolist()]
+		if coltype == "json":
+			return [json.loads(x) for x in decoded]
+		return decoded
+
+	@staticmethod
+	def _ragged(node:h5py.Group, rows:list, lazy:bool) -> list:
+		''' Per-record arrays of one ragged field. Eager full reads give views
+		of one array; partial or lazy reads only read the requested spans.
+		Arrays used by more than one record come back read-only. '''
+
+		offsets = node["offsets"][()]
+		slots = node["slots"][()]
+		dtypes = read_value(node["dtypes"]) if "dtypes" in node else None
+		uses = np.bincount(slots, minlength=len(offsets) - 1)
+		on_demand = lazy or len(rows) < len(slots)
+		values = read_value(node["values"], lazy=on_demand)
+		if not isinstance(values, LazyArray):
+			values = np.asarray(values)
+
+		out = []
+		for i in rows:
+			s = int(slots[i])
+			a, b = int(offsets[s]), int(offsets[s + 1])
+			if isinstance(values, LazyArray):
+				seg = values.segment(a, b)
+				if dtypes is not None:
+					seg.dtype = np.dtype(dtypes[i])
+				seg.readonly = uses[s] > 1
+				if not lazy:
+					seg = seg.load()
+			else:
+				seg = values[a:b]
+				if dtypes is not None and seg.dtype != dtypes[i]:
+					seg = seg.astype(dtypes[i])
+				elif uses[s] > 1:
+					seg.flags.writeable = False
+			out.append(seg)
+		return out
+
+	@classmethod
+	def read(cls, grp:h5py.Group, lazy:bool=False, names:list=None) -> dict:
+		''' Reads an on-disk record table back into a dict of records, or
+		only the records named in `names`. '''
+
+		keys = cls.keys(grp)
+		if names is None:
+			rows = list(range(len(keys)))
+		else:
+			rows = [keys.index(n) for n in names if n in keys]
+		fields = json.loads(_decode(grp.attrs["fields"]))
+		out = {keys[i]: {} for i in rows}
+		for f in fields:
+			node = grp[f]
+			if isinstance(node, h5py.Group):
+				vals = cls._ragged(node, rows, lazy)
+			else:
+				col = cls.column(grp, f)
+				vals = [col[i] for i in rows]
+			for i, v in zip(rows, vals):
+				out[keys[i]][f] = v
+		return out
+
+def is_record_table(node) -> bool:
+	return isinstance(node, h5py.Group) and _decode(node.attrs.get(ATTR_TYPE, "")) == "record_table"
+
+# ------------------------------------------------------------------------------
+# Content digests
+# ------------------------------------------------------------------------------
+
+# Streaming structural hash. Every value is fed to SHA-256 as a type tag, a
+# length/shape header and its payload: arrays contribute dtype, shape and their
+# raw little-endian C-order bytes (in blocks, without building lists or JSON),
+# dict keys are sorted, numpy scalars hash like the Python values they hold and
+# lists/tuples hash alike, so the digest only depends on content - not on the
+# platform's byte order or on how a codec round-tripped a container.
+_HASH_BLOCK = 1 << 22  # bytes of array data hashed per update
+
+def _hash_array(h, arr:np.ndarray):
+	if arr.dtype.kind == 'O':
+		h.update(b"o%d:%s;" % (arr.ndim, ",".join(str(n) for n in arr.shape).encode()))
+		for item in arr.reshape(-1):
+			hash_value(h, item)
+		return
+	if arr.dtype.byteorder == '>' or (arr.dtype.byteorder == '=' and sys.byteorder == 'big'):
+		arr = arr.astype(arr.dtype.newbyteorder('<'))
+	dtype = arr.dtype.str.replace('|', '<').replace('=', '<')
+	h.update(b"a%s;%s;" % (dtype.encode(), ",".join(str(n) for n in arr.shape).encode()))
+	flat = arr.reshape(-1) if arr.flags.c_contiguous else None
+	if flat is None:
+		# Non-contiguous: hash row blocks instead of copying the whole array.
+		rows = max(1, _HASH_BLOCK // max(1, arr[0].nbytes if len(arr) else 1))
+		for i in range(0, len(arr), rows):
+			h.update(np.ascontiguousarray(arr[i:i + rows]).reshape(-1).view(np.uint8))
+		return
+	step = max(1, _HASH_BLOCK // max(1, arr.itemsize))
+	for i in range(0, flat.size, step):
+		h.update(flat[i:i + step].view(np.uint8))
+
+def hash_value(h, o):
+	if o is None:
+		h.update(b"n")
+	elif isinstance(o, (bool, np.bool_)):
+		h.update(b"b1" if o else b"b0")
+	elif isinstance(o, (int, np.integer)):
+		h.update(b"i%d;" % int(o))
+	elif isinstance(o, (float, np.floating)):
+		v = float(o)
+		h.update(b"fnan" if v != v else b"f" + np.float64(v).astype('<f8').tobytes())
+	elif isinstance(o, (complex, np.complexfloating)):
+		h.update(b"c")
+		hash_value(h, o.real)
+		hash_value(h, o.imag)
+	elif isinstance(o, (str, np.str_)):
+		b = str(o).encode("utf-8")
+		h.update(b"s%d:" % len(b))
+		h.update(b)
+	elif isinstance(o, (bytes, bytearray, np.bytes_)):
+		h.update(b"y%d:" % len(o))
+		h.update(bytes(o))
+	elif isinstance(o, dict):
+		items = sorted(((str(k), v) for k, v in o.items()), key=lambda kv: kv[0])
+		h.update(b"d%d:" % len(items))
+		for k, v in items:
+			hash_value(h, k)
+			hash_value(h, v)
+	elif isinstance(o, (list, tuple)):
+		h.update(b"l%d:" % len(o))
+		for v in o:
+			hash_value(h, v)
+	elif isinstance(o, np.ndarray):
+		_hash_array(h, o)
+	elif isinstance(o, LazyArray):
+		_hash_array(h, o.load())
+	elif isinstance(o, EncodedArray):
+		_hash_array(h, o.decoded())
+	elif isinstance(o, ArithmeticArray):
+		_hash_array(h, o.expand())
+	elif isinstance(o, RecordTable):
+		hash_value(h, o.records)
+	else:
+		hash_value(h, str(o))
+
+def leaf_digest(o) -> bytes:
+	''' Digest of a value that is not a dict (see tree_digest). '''
+	h = hashlib.sha256(b"V")
+	hash_value(h, o)
+	return h.digest()
+
+def entries_digest(entries) -> bytes:
+	''' Digest of a dict node from its (key, child digest) pairs. '''
+	h = hashlib.sha256(b"D")
+	for k, d in sorted(entries, key=lambda kd: kd[0]):
+		kb = str(k).encode("utf-8")
+		h.update(b"%d:" % len(kb))
+		h.update(kb)
+		h.update(d)
+	return h.digest()
+
+def tree_digest(obj) -> bytes:
+	''' Content digest of a packed structure. Dicts are hashed from their
+	children's digests (a Merkle tree), everything else is a leaf hashed with
+	hash_value, so the digest of any subtree can be cached or stored and
+	reused unchanged (see ATTR_DIGEST and graf.base._TrackedNode). '''
+	if isinstance(obj, dict):
+		return entries_digest((str(k), tree_digest(v)) for k, v in obj.items())
+	return leaf_digest(obj)
+
+def stored_digest(node):
+	''' The ATTR_DIGEST of an HDF5 node as bytes, or None if it has none. '''
+	val = node.attrs.get(ATTR_DIGEST, None)
+	return None if val is None else bytes.fromhex(_decode(val))
+
+def _digest_members(grp:h5py.Group) -> list:
+	return [k for k in grp.keys() if k != INDEX_KEY]
+
+def _is_dict_group(node) -> bool:
+	return isinstance(node, h5py.Group) and _decode(node.attrs.get(ATTR_TYPE, "dict")) == "dict"
+
+def compute_digest(node, trust_members:bool=True) -> bytes:
+	''' Digest of an HDF5 node computed from its contents: tree_digest of the
+	value it reads back as, or for dict groups the roll-up of their members.
+	With trust_members=True, members' stored digests are used where present
+	(so only what lacks one is read); False re-reads everything. '''
+
+	if _is_dict_group(node):
+		entries = []
+		for k in _digest_members(node):
+			d = stored_digest(node[k]) if trust_members else None
+			entries.append((k, d if d is not None else compute_digest(node[k], trust_members)))
+		return entries_digest(entries)
+	return tree_digest(read_value(node))
+
+def refresh_digests(fh:h5py.File, paths):
+	''' Brings ATTR_DIGEST up to date after the nodes at `paths` were changed
+	in place: each is recomputed from its data (members' stored digests are
+	trusted), then every group above them is rolled up again. Files written
+	without digests are left as they are. '''
+
+	if ATTR_DIGEST not in fh.attrs:
+		return
+	parents = set()
+	for path in paths:
+		path = path.strip("/")
+		if path and path in fh:
+			fh[path].attrs[ATTR_DIGEST] = compute_digest(fh[path]).hex()
+		parts = path.split("/") if path else []
+		parents.update("/".join(parts[:i]) for i in range(len(parts)))
+	for path in sorted(parents, key=lambda p: -1 if not p else p.count("/"), reverse=True):
+		node = fh[path] if path else fh
+		node.attrs[ATTR_DIGEST] = compute_digest(node).hex()
+
+def verify_digests(node, report:dict, path:str=None) -> bytes:
+	''' Recomputes the digest of `node` and everything below it from the
+	data, comparing each with its stored ATTR_DIGEST. Paths whose content
+	does not match go to report["mismatched"], paths without a stored digest
+	to report["unverified"]; report["checked"] counts compared nodes.
+	Returns the recomputed digest. '''
+
+	path = node.name.strip("/") if path is None else path
+	if _is_dict_group(node):
+		actual = entries_digest((k, verify_digests(node[k], report, f"{path}/{k}".strip("/")))
+								for k in _digest_members(node))
+	else:
+		actual = tree_digest(read_value(node))
+	stored = stored_digest(node)
+	if stored is None:
+		report["unverified"].append(path)
+	else:
+		report["checked"] += 1
+		if stored != actual:
+			report["mismatched"].append(path)
+	return actual
+
+def diff_digests(a:h5py.Group, b:h5py.Group, report:dict, path:str=""):
+	''' Compares two groups member by member, descending only into members
+	whose stored digests differ (members without one are compared by
+	content). Adds paths to report["added"] (only in b), report["removed"]
+	(only in a) and report["changed"]. '''
+
+	keys_a, keys_b = set(_digest_members(a)), set(_digest_members(b))
+	for k in sorted(keys_a | keys_b):
+		sub = f"{path}/{k}" if path else k
+		if k not in keys_a:
+			report["added"].append(sub)
+			continue
+		if k not in keys_b:
+			report["removed"].append(sub)
+			continue
+		na, nb = a[k], b[k]
+		da, db = stored_digest(na), stored_digest(nb)
+		if da is not None and da == db:
+			continue
+		if _is_dict_group(na) and _is_dict_group(nb):
+			diff_digests(na, nb, report, sub)
+		elif (da if da is not None else compute_digest(na)) != (db if db is not None else compute_digest(nb)):
+			report["changed"].append(sub)
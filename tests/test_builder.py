@@ -0,0 +1,140 @@
+"""Tests for building Grafs directly from arrays (Graf.new / Axis.add_*)."""
+import os
+import subprocess
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from graf.base import Graf, Surface, Trace
+
+
+def _scales_match(built, mimicked):
+    for name in ("x_axis", "y_axis_L", "y_axis_R", "z_axis"):
+        a, b = getattr(built, name), getattr(mimicked, name)
+        assert a.is_valid == b.is_valid, name
+        if a.is_valid:
+            assert np.allclose([a.val_min, a.val_max], [b.val_min, b.val_max]), name
+            assert a.tick_list == b.tick_list, name
+            assert a.tick_label_list == b.tick_label_list, name
+
+
+class TestNew:
+
+    def test_grid_of_axes(self):
+        g = Graf.new(2, 3)
+        assert list(g.axes) == [f"Ax{i}" for i in range(6)]
+        assert g.get_axis((1, 2)) is g.axes["Ax5"]
+        assert not g.axes["Ax0"].y_axis_R.is_valid and not g.axes["Ax0"].z_axis.is_valid
+
+    def test_rejects_empty_grid(self):
+        with pytest.raises(ValueError):
+            Graf.new(0, 1)
+
+
+class TestAddTrace:
+
+    def test_matches_mimicked_figure(self):
+        x = np.linspace(0, 7.3, 50)
+        y = np.linspace(-2, 3e4, 50).astype(np.float32)
+        fig, ax = plt.subplots()
+        ax.plot(x, y, label="a")
+        ax.plot(x, -y, "--o", label="b")
+        mimicked = Graf(fig).axes["Ax0"]
+        plt.close(fig)
+
+        built = Graf.new().axes["Ax0"]
+        built.add_trace(x, y, label="a")
+        built.add_trace(x, -y, label="b", line_type="--", marker_type="o")
+
+        _scales_match(built, mimicked)
+        for key in ("Tr0", "Tr1"):
+            a, b = built.traces[key], mimicked.traces[key]
+            for field in ("display_name", "line_color", "marker_color", "line_type", "marker_type",
+                          "line_width", "marker_size"):
+                assert getattr(a, field) == getattr(b, field), field
+            assert a.y_data.dtype == np.float32
+
+    def test_twin_and_3d(self):
+        ax = Graf.new().axes["Ax0"]
+        ax.add_trace([0, 1], [0, 1])
+        ax.add_trace([0, 1], [0, 100], use_twin=True)
+        assert ax.y_axis_R.is_valid and ax.y_axis_R.val_max > 100
+
+        ax3 = Graf.new().axes["Ax0"]
+        tr = ax3.add_trace([0, 1, 2], [0, 1, 2], [5, 6, 7])
+        assert tr.trace_type == Trace.TRACE_LINE3D and ax3.z_axis.is_valid
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            Graf.new().axes["Ax0"].add_trace([0, 1, 2], [0, 1])
+        with pytest.raises(ValueError):
+            Graf.new().axes["Ax0"].add_trace([0, 1], [0, 1], line_type="~")
+
+
+class TestAddErrorbar:
+
+    def test_errors_and_limits(self):
+        x = np.arange(5.0)
+        ax = Graf.new().axes["Ax0"]
+        tr = ax.add_errorbar(x, x, yerr=[np.full(5, 0.5), np.full(5, 2.0)], xerr=0.1, capsize=3)
+        assert tr.has_error_bars and tr.err_cap_visible
+        assert np.array_equal(tr.y_err_pos, np.full(5, 2.0)) and np.array_equal(tr.x_err_neg, np.full(5, 0.1))
+        assert ax.y_axis_L.val_max > 6.0   # the bars are inside the view
+
+    def test_bad_errors(self):
+        with pytest.raises(ValueError):
+            Graf.new().axes["Ax0"].add_errorbar([0, 1], [0, 1], yerr=[1, 2, 3])
+        with pytest.raises(ValueError):
+            Graf.new().axes["Ax0"].add_errorbar([0, 1], [0, 1], yerr=-1)
+
+
+class TestAddSurface:
+
+    def test_image_matches_pcolormesh(self):
+        z = np.random.default_rng(0).random((8, 12))
+        x, y = np.arange(13.0), np.arange(9.0) * 2
+        fig, ax = plt.subplots()
+        ax.pcolormesh(x, y, z)
+        mimicked = Graf(fig).axes["Ax0"]
+        plt.close(fig)
+
+        built = Graf.new().axes["Ax0"]
+        built.add_surface(x, y, z)
+        assert built.axis_type == mimicked.axis_type
+        _scales_match(built, mimicked)
+        a, b = built.surfaces["Sf0"], mimicked.surfaces["Sf0"]
+        assert a.grid_layout == b.grid_layout and np.array_equal(a.x_grid, b.x_grid)
+        assert np.array_equal(a.z_grid, b.z_grid) and a.cmap == b.cmap
+
+    def test_centers_become_edges(self):
+        ax = Graf.new().axes["Ax0"]
+        sf = ax.add_surface(np.arange(4.0), np.arange(3.0), np.zeros((3, 4)), colorbar=True, vmin=0, vmax=2)
+        xs, ys = sf.get_axis_vectors()
+        assert np.allclose(xs, np.arange(5.0) - 0.5) and np.allclose(ys, np.arange(4.0) - 0.5)
+        assert sf.has_colorbar and sf.colorbar_ticks[0] == 0 and sf.colorbar_ticks[-1] == 2
+
+    def test_3d_surface_round_trip(self, tmp_path):
+        X, Y = np.meshgrid(np.linspace(-1, 1, 10), np.linspace(0, 2, 8))
+        g = Graf.new()
+        g.axes["Ax0"].add_surface(X, Y, X * Y, surf_type=Surface.SURF_SURFACE)
+        path = str(tmp_path / "built.graf")
+        g.write_graf(path)
+        g2 = Graf()
+        g2.read_graf(path)
+        sf = g2.axes["Ax0"].surfaces["Sf0"]
+        assert g2.axes["Ax0"].z_axis.is_valid and sf.grid_layout == Surface.GRID_UNIFORM
+        assert np.allclose(sf.z_grid, X * Y)
+        plt.close(g2.to_fig())
+
+
+def test_no_pyplot_without_figures(tmp_path):
+    code = ("import sys, numpy as np\n"
+            "from graf.base import Graf\n"
+            "g = Graf.new()\n"
+            "g.axes['Ax0'].add_trace(np.arange(3.0), np.arange(3.0))\n"
+            f"g.write_graf({str(tmp_path / 'a.graf')!r})\n"
+            "assert 'matplotlib.pyplot' not in sys.modules\n")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", code], check=True, env=env)
@@ -0,0 +1,145 @@
+"""Round-trip tests for the TOME, NPZ and JSON codecs."""
+import json
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from graf.base import Graf, inspect_graf, save_graf, _stable_content_hash
+from graf.codecs import GrafCodec, available_codecs, get_codec, register_codec
+from .conftest import roundtrip
+
+
+FORMATS = ["graf", "npz", "json"]
+
+
+def _make_fig():
+    fig, axes = plt.subplots(1, 2)
+    x = np.linspace(0, 1, 200)
+    axes[0].plot(x, np.sin(x).astype(np.float32), label="sin", color=(0.1, 0.2, 0.3))
+    axes[0].errorbar(x[:10], x[:10], yerr=0.1 * np.ones(10), label="err")
+    axes[0].set_xticks([0, 0.5, 1])
+    axes[1].pcolormesh(np.random.default_rng(0).random((8, 12)))
+    axes[1].set_title("mesh")
+    return fig
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+class TestRegistry:
+
+    @pytest.mark.parametrize("filename,name", [
+        ("a.graf", "tome"), ("a.H5", "tome"), ("a.npz", "npz"), ("a.json", "json"), ("a.unknown", "tome"),
+    ])
+    def test_by_extension(self, filename, name):
+        assert get_codec(filename).name == name
+
+    def test_explicit_format(self, tmp_path):
+        path = str(tmp_path / "cache.bin")
+        save_graf(_make_fig(), path, format="npz")
+        g = Graf()
+        g.read_graf(path, format="npz")
+        assert g.axes["Ax1"].title == "mesh"
+        with pytest.raises(ValueError):
+            get_codec(path, "xml")
+
+    def test_capabilities_declared(self):
+        caps = available_codecs()
+        assert "lazy" in caps["tome"]
+        assert "zero_dependency" in caps["npz"] and "zero_dependency" in caps["json"]
+
+    def test_register_rejects_unknown_capability(self):
+        class Bad(GrafCodec):
+            name = "bad"
+            capabilities = frozenset(("teleport",))
+            write = read = lambda self, *a, **k: None
+        with pytest.raises(ValueError):
+            register_codec(Bad())
+
+    def test_incomplete_codec_rejected(self):
+        class WriteOnly(GrafCodec):
+            name = "write_only"
+            def write(self, packet, filename, storage=None, index=None):
+                pass
+        with pytest.raises(TypeError):
+            register_codec(WriteOnly())
+        assert "write_only" not in available_codecs()
+
+
+# ---------------------------------------------------------------------------
+# Round trips
+# ---------------------------------------------------------------------------
+
+class TestRoundTrip:
+
+    @pytest.mark.parametrize("ext", FORMATS)
+    def test_data_preserved(self, tmp_path, ext):
+        g = roundtrip(_make_fig(), tmp_path, name=f"fig.{ext}")
+        y = g.get_ydata((0, 0), trace_label="sin")
+        assert y.dtype == np.float32
+        assert np.array_equal(y, np.sin(np.linspace(0, 1, 200)).astype(np.float32))
+        assert g.get_trace((0, 0), trace_label="err").has_error_bars
+        assert g.axes["Ax1"].surfaces["Sf0"].z_grid.shape == (8, 12)
+        assert g.to_fig() is not None
+
+    def test_same_content_in_every_format(self, tmp_path):
+        hashes = set()
+        for ext in FORMATS:
+            g = roundtrip(_make_fig(), tmp_path, name=f"fig.{ext}")
+            pkt = g.pack()
+            pkt["info"].pop("provenance")
+            pkt["info"].pop("history")
+            hashes.add(_stable_content_hash(pkt))
+        assert len(hashes) == 1
+
+    @pytest.mark.parametrize("ext", FORMATS)
+    def test_index_and_partial_read(self, tmp_path, ext):
+        path = str(tmp_path / f"fig.{ext}")
+        save_graf(_make_fig(), path)
+        index = inspect_graf(path)
+        assert index["n_axes"] == 2 and "rebuilt" not in index
+        g = Graf()
+        g.read_graf(path, axes=[(0, 1)])
+        assert list(g.axes.keys()) == ["Ax1"]
+
+    def test_json_is_plain_json(self, tmp_path):
+        path = str(tmp_path / "fig.json")
+        save_graf(_make_fig(), path)
+        with open(path) as fh:
+            doc = json.load(fh)
+        tr = [t for t in doc["graf"]["axes"]["Ax0"]["traces"].values() if t["display_name"] == "sin"][0]
+        ref = tr["y_data"]["__ndarray__"]
+        assert ref["dtype"] == "<f4" and ref["shape"] == [200]
+
+    @pytest.mark.parametrize("ext", ["npz", "json"])
+    def test_unsupported_options_rejected(self, tmp_path, ext):
+        g = Graf(_make_fig())
+        with pytest.raises(ValueError):
+            g.write_graf(str(tmp_path / f"fig.{ext}"), precision="float32")
+        if ext == "json":
+            with pytest.raises(ValueError):
+                g.write_graf(str(tmp_path / f"fig.{ext}"), storage="gzip")
+
+    def test_npz_failed_write_keeps_file(self, tmp_path, monkeypatch):
+        path = tmp_path / "fig.npz"
+        g = Graf(_make_fig())
+        g.write_graf(str(path))
+        before = path.read_bytes()
+
+        def broken(fh, **arrays):
+            fh.write(b"PK partial")
+            raise OSError("disk full")
+        monkeypatch.setattr(np, "savez", broken)
+        g.supertitle = "changed"
+        with pytest.raises(OSError):
+            g.write_graf(str(path))
+        assert path.read_bytes() == before
+        assert [p.name for p in tmp_path.iterdir()] == ["fig.npz"]
+
+    def test_npz_compression(self, tmp_path):
+        g = Graf(_make_fig())
+        g.write_graf(str(tmp_path / "plain.npz"))
+        g.write_graf(str(tmp_path / "small.npz"), storage="gzip")
+        assert (tmp_path / "small.npz").stat().st_size < (tmp_path / "plain.npz").stat().st_size
@@ -4,7 +4,7 @@ import matplotlib.colors as mcolors
 import numpy as np
 import pytest
 
-from graf.base import Graf, Axis
+from graf.base import Graf, Axis, _nearest_index
 from .conftest import roundtrip, roundtrip_fig
 
 
@@ -270,3 +270,43 @@ class TestReconstruct:
                     ecolor='violet', elinewidth=1, capsize=4, capthick=1.5)
         _, fig2 = roundtrip_fig(fig, tmp_path)
         assert fig2 is not None
+
+
+# ---------------------------------------------------------------------------
+# Vectorized segment matching
+# ---------------------------------------------------------------------------
+
+class TestSegmentMatching:
+
+    @pytest.mark.parametrize("values", [
+        [0.0, 1.0, 2.0, 3.0],
+        [3.0, 1.0, 1.0, 2.0, 0.0, 2.0],        # duplicates: lowest index wins
+        [0.0, 2.0, 1.0, 3.0, np.inf, -np.inf],
+        [0.0, np.nan, 1.0, np.nan],            # argmin reports the first NaN
+    ])
+    def test_nearest_index_matches_argmin(self, values):
+        vals = np.array(values)
+        targets = np.array([-5.0, 0.0, 0.5, 1.0, 1.5, 2.5, 3.0, 9.0, np.inf, np.nan])
+        with np.errstate(invalid="ignore"):
+            expected = [int(np.argmin(np.abs(vals - t))) for t in targets]
+        assert list(_nearest_index(vals, targets)) == expected
+
+    def test_nearest_index_random(self):
+        rng = np.random.default_rng(3)
+        vals = np.round(rng.normal(size=500), 2)
+        targets = rng.normal(size=300)
+        expected = [int(np.argmin(np.abs(vals - t))) for t in targets]
+        assert list(_nearest_index(vals, targets)) == expected
+
+    def test_large_errorbar_trace(self, tmp_path):
+        n = 20000
+        rng = np.random.default_rng(0)
+        x = np.sort(rng.random(n)) * 100
+        y = rng.normal(size=n)
+        yerr = np.abs(rng.normal(size=(2, n)))
+        xerr = np.full(n, 1e-4)
+        g = roundtrip(_eb_fig(x, y, xerr=xerr, yerr=yerr, fmt='o'), tmp_path)
+        tr = _first_trace(g)
+        assert np.allclose(tr.y_err_neg, yerr[0])
+        assert np.allclose(tr.y_err_pos, yerr[1])
+        assert np.allclose(tr.x_err_neg, xerr) and np.allclose(tr.x_err_pos, xerr)
@@ -0,0 +1,1386 @@
+"""Tests for on-disk layout options, lazy reads and partial reads."""
+import h5py
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from graf.base import Graf, Axis, Trace, GraphStyle, save_graf, open_graf, inspect_graf, read_axis, read_trace, read_surface
+from graf.base import append_trace, append_axis, update_graf, GrafStreamWriter, GrafArchive, inspect_archive
+from graf.base import AsyncSaver, save_graf_async, _stable_content_hash
+from graf.base import verify_graf, diff_graf
+from graf.storage import StorageOptions, PrecisionPolicy, DecimationPolicy, LazyArray, INDEX_KEY, read_storage_options
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def make_big_fig(n=50_000, offset=0.0):
+    x = np.linspace(0, 10, n)
+    fig, ax = plt.subplots()
+    ax.plot(x, np.sin(x) + offset)
+    ax.plot(x[:10], np.cos(x[:10]))
+    return fig, x
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    """Closes every figure a test opened."""
+    yield
+    plt.close("all")
+
+
+@pytest.fixture
+def save_fig(tmp_path):
+    """Factory: saves a figure to tmp_path/name with save_graf(**kwargs), closes it and returns the path."""
+    def save(fig, name="test.graf", **kwargs):
+        path = str(tmp_path / name)
+        save_graf(fig, path, **kwargs)
+        plt.close(fig)
+        return path
+    return save
+
+
+@pytest.fixture
+def write_fig(tmp_path):
+    """Factory: mimics a figure, closes it, applies tweak(graf) and writes it to tmp_path/name with
+    write_graf(**kwargs). Returns (path, graf)."""
+    def write(fig, name="test.graf", tweak=None, **kwargs):
+        g = Graf(fig)
+        plt.close(fig)
+        if tweak is not None:
+            tweak(g)
+        path = str(tmp_path / name)
+        g.write_graf(path, **kwargs)
+        return path, g
+    return write
+
+
+@pytest.fixture
+def big_file(save_fig):
+    """Factory: saves make_big_fig(n), after tweak(fig), with save_graf(**kwargs). Returns (path, x)."""
+    def save(n=5000, name="big.graf", tweak=None, **kwargs):
+        fig, x = make_big_fig(n)
+        if tweak is not None:
+            tweak(fig)
+        return save_fig(fig, name, **kwargs), x
+    return save
+
+
+# ---------------------------------------------------------------------------
+# Compression
+# ---------------------------------------------------------------------------
+
+class TestCompression:
+
+    def test_default_is_contiguous(self, tmp_path):
+        fig, _ = make_big_fig()
+        path = str(tmp_path / "plain.graf")
+        save_graf(fig, path)
+        plt.close(fig)
+        with h5py.File(path, 'r') as fh:
+            ds = fh['axes/Ax0/traces/Tr0/x_data']
+            assert ds.chunks is None
+            assert ds.compression is None
+        assert read_storage_options(path) is None
+
+    @pytest.mark.parametrize("codec", ["gzip", "lzf"])
+    def test_large_arrays_compressed(self, tmp_path, codec):
+        fig, _ = make_big_fig()
+        path = str(tmp_path / "packed.graf")
+        save_graf(fig, path, storage=StorageOptions(compression=codec))
+        plt.close(fig)
+        with h5py.File(path, 'r') as fh:
+            ds = fh['axes/Ax0/traces/Tr0/y_data']
+            assert ds.chunks is not None
+            assert ds.compression == codec
+            assert ds.shuffle
+
+    def test_small_arrays_stay_contiguous(self, tmp_path):
+        fig, _ = make_big_fig()
+        path = str(tmp_path / "packed.graf")
+        save_graf(fig, path, storage={"min_bytes": 1024})
+        plt.close(fig)
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/Tr1/y_data'].chunks is None
+            assert fh['axes/Ax0/traces/Tr0/y_data'].chunks is not None
+
+    def test_settings_recorded(self, tmp_path):
+        fig, _ = make_big_fig()
+        path = str(tmp_path / "packed.graf")
+        save_graf(fig, path, storage=StorageOptions(compression="gzip", compression_opts=7))
+        plt.close(fig)
+        rec = read_storage_options(path)
+        assert rec["compression"] == "gzip"
+        assert rec["compression_opts"] == 7
+        assert rec["shuffle"] is True
+
+    def test_roundtrip_is_transparent(self, tmp_path):
+        fig, x = make_big_fig()
+        path = str(tmp_path / "packed.graf")
+        save_graf(fig, path, storage="gzip")
+        plt.close(fig)
+        g = Graf()
+        g.read_graf(path)
+        assert np.array_equal(g.get_xdata(), x)
+        assert np.array_equal(g.get_ydata(), np.sin(x))
+
+    def test_compressed_surface_roundtrip(self, tmp_path):
+        z = np.random.default_rng(0).random((300, 200)).astype(np.float32)
+        fig, ax = plt.subplots()
+        ax.imshow(z)
+        path = str(tmp_path / "surf.graf")
+        save_graf(fig, path, storage="gzip")
+        plt.close(fig)
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/surfaces/Sf0/z_grid'].compression == "gzip"
+        g = Graf()
+        g.read_graf(path)
+        sf = g.axes['Ax0'].surfaces['Sf0']
+        assert sf.z_grid.dtype == np.float32
+        assert np.array_equal(sf.z_grid, z)
+
+    def test_bad_compression_rejected(self):
+        with pytest.raises(ValueError):
+            StorageOptions(compression="zstd")
+
+
+# ---------------------------------------------------------------------------
+# Lazy loading
+# ---------------------------------------------------------------------------
+
+class TestLazyLoading:
+
+    @pytest.fixture
+    def lazy_file(self, big_file):
+        return big_file(2000, "lazy.graf", tweak=lambda fig: fig.suptitle("Lazy"))
+
+    def test_metadata_without_data(self, lazy_file):
+        path, _ = lazy_file
+        with open_graf(path) as g:
+            assert g.supertitle == "Lazy"
+            t = g.axes['Ax0'].traces['Tr0']
+            assert isinstance(t.y_data, LazyArray)
+            assert not t.y_data.loaded
+            assert t.y_data.shape == (2000,)
+            assert len(t.y_data) == 2000
+
+    def test_data_read_on_first_use(self, lazy_file):
+        path, x = lazy_file
+        with open_graf(path) as g:
+            t = g.axes['Ax0'].traces['Tr1']
+            assert np.array_equal(g.get_ydata(trace_idx=0), np.sin(x))
+            assert g.axes['Ax0'].traces['Tr0'].y_data.loaded
+            assert not t.y_data.loaded
+            assert np.allclose(t.y_data + 0, np.cos(x[:10]))
+
+    def test_slice_reads_without_loading(self, lazy_file):
+        path, x = lazy_file
+        with open_graf(path) as g:
+            t = g.axes['Ax0'].traces['Tr0']
+            assert np.array_equal(t.y_data[10:20], np.sin(x[10:20]))
+            assert not t.y_data.loaded
+
+    def test_close_releases_handle(self, lazy_file):
+        path, x = lazy_file
+        g = Graf()
+        g.read_graf(path, lazy=True)
+        used = g.get_xdata()
+        g.close()
+        assert np.array_equal(used, x)
+        with pytest.raises(ValueError):
+            np.asarray(g.axes['Ax0'].traces['Tr0'].y_data)
+        # Handle is really gone: the file can be rewritten
+        fig2, _ = make_big_fig(10)
+        save_graf(fig2, path)
+        plt.close(fig2)
+
+    def test_load_all_then_close(self, lazy_file):
+        path, x = lazy_file
+        g = open_graf(path)
+        g.load_all()
+        g.close()
+        assert np.array_equal(g.get_ydata(), np.sin(x))
+        plt.close(g.to_fig())
+
+    def test_lazy_graf_can_be_saved(self, tmp_path, lazy_file):
+        path, x = lazy_file
+        with open_graf(path) as g:
+            g.write_graf(str(tmp_path / "copy.graf"))
+            g.write_graf(path)
+        g2 = Graf()
+        g2.read_graf(str(tmp_path / "copy.graf"))
+        assert np.array_equal(g2.get_xdata(), x)
+        g3 = Graf()
+        g3.read_graf(path)
+        assert np.array_equal(g3.get_xdata(), x)
+
+    def test_lazy_surface(self, tmp_path):
+        z = np.random.default_rng(1).random((40, 30))
+        fig, ax = plt.subplots()
+        ax.imshow(z)
+        path = str(tmp_path / "surf.graf")
+        save_graf(fig, path)
+        plt.close(fig)
+        with open_graf(path) as g:
+            sf = g.axes['Ax0'].surfaces['Sf0']
+            assert isinstance(sf.z_grid, LazyArray)
+            assert np.array_equal(np.asarray(sf.z_grid), z)
+            plt.close(g.to_fig())
+
+
+# ---------------------------------------------------------------------------
+# Partial reads
+# ---------------------------------------------------------------------------
+
+class TestPartialReads:
+
+    @pytest.fixture
+    def grid_file(self, save_fig):
+        fig, axs = plt.subplots(2, 3)
+        for r in range(2):
+            for c in range(3):
+                x = np.arange(10) + 100 * r + 10 * c
+                axs[r, c].plot(x, x * 2, label=f"first {r}{c}")
+                axs[r, c].plot(x, x * 3, label=f"second {r}{c}")
+                axs[r, c].set_title(f"{r},{c}")
+        axs[1, 2].cla()
+        axs[1, 2].imshow(np.arange(12.0).reshape(3, 4))
+        return save_fig(fig, "grid.graf")
+
+    def test_read_trace_by_index(self, grid_file):
+        path = grid_file
+        tr = read_trace(path, axis_pos=(1, 0), trace_idx=1)
+        assert tr.display_name == "second 10"
+        assert np.array_equal(tr.y_data, (np.arange(10) + 100) * 3)
+
+    def test_read_trace_by_label(self, grid_file):
+        path = grid_file
+        tr = read_trace(path, axis_pos=(0, 2), trace_label="second 02")
+        assert np.array_equal(tr.x_data, np.arange(10) + 20)
+
+    def test_read_trace_missing(self, grid_file):
+        path = grid_file
+        assert read_trace(path, axis_pos=(0, 0), trace_idx=7) is None
+        assert read_trace(path, axis_pos=(5, 5)) is None
+        assert read_trace(path, axis_pos=(0, 0), trace_label="nope") is None
+
+    def test_read_trace_matches_full_read(self, grid_file):
+        path = grid_file
+        g = Graf()
+        g.read_graf(path)
+        tr = read_trace(path, axis_pos=(1, 1), trace_label="first 11")
+        assert np.array_equal(tr.x_data, g.get_xdata((1, 1), trace_label="first 11"))
+
+    def test_read_surface(self, grid_file):
+        path = grid_file
+        sf = read_surface(path, axis_pos=(1, 2))
+        assert np.array_equal(sf.z_grid, np.arange(12.0).reshape(3, 4))
+        assert read_surface(path, axis_pos=(0, 0)) is None
+
+    def test_read_axis(self, grid_file):
+        path = grid_file
+        ax = read_axis(path, axis_pos=(0, 1))
+        assert ax.title == "0,1"
+        assert len(ax.traces) == 2
+
+    def test_read_graf_axes_filter(self, grid_file):
+        path = grid_file
+        g = Graf()
+        g.read_graf(path, axes=[(0, 1), (1, 2)])
+        assert len(g.axes) == 2
+        assert g.get_axis((0, 1)).title == "0,1"
+        assert g.get_axis((0, 0)) is None
+        assert len(g.get_axis((1, 2)).surfaces) == 1
+
+    def test_read_graf_axes_filter_lazy(self, grid_file):
+        path = grid_file
+        with open_graf(path) as full:
+            key = [k for k, a in full.axes.items() if a.title == "1,0"][0]
+        with Graf() as g:
+            g.read_graf(path, lazy=True, axes=[key])
+            assert list(g.axes) == [key]
+            assert isinstance(g.axes[key].traces['Tr0'].x_data, LazyArray)
+
+
+# ---------------------------------------------------------------------------
+# Table of contents
+# ---------------------------------------------------------------------------
+
+class TestInspect:
+
+    @pytest.fixture
+    def toc_file(self, save_fig):
+        x = np.linspace(0, 1, 100)
+        y = x * 4.0
+        y[3] = np.nan
+        fig, axs = plt.subplots(1, 2)
+        axs[0].plot(x, y, label="ramp")
+        axs[0].set_title("left")
+        axs[1].imshow(np.arange(12, dtype=np.float32).reshape(3, 4))
+        fig.suptitle("Catalog")
+        return save_fig(fig, "toc.graf")
+
+    def test_index_contents(self, toc_file):
+        path = toc_file
+        index = inspect_graf(path)
+        assert index["supertitle"] == "Catalog"
+        assert index["n_axes"] == 2
+        kinds = [e["kind"] for e in index["entries"]]
+        assert kinds.count("axis") == 2
+        tr = [e for e in index["entries"] if e["kind"] == "trace"][0]
+        assert tr["label"] == "ramp"
+        assert tr["shape"] == [100]
+        assert tr["dtype"] == "float64"
+        assert tr["nan_count"] == 1
+        assert tr["min"] == pytest.approx(0.0)
+        assert tr["max"] == pytest.approx(4.0)
+        assert tr["nbytes"] == 1600
+        assert tr["datasets"]["x_data"]["nan_count"] == 0
+        sf = [e for e in index["entries"] if e["kind"] == "surface"][0]
+        assert sf["shape"] == [3, 4]
+        assert sf["dtype"] == "float32"
+        assert sf["max"] == 11.0
+
+    def test_paths_resolve(self, toc_file):
+        path = toc_file
+        with h5py.File(path, 'r') as fh:
+            for e in inspect_graf(path)["entries"]:
+                assert e["path"] in fh
+
+    def test_index_not_part_of_graf(self, toc_file):
+        path = toc_file
+        g = Graf()
+        g.read_graf(path)
+        assert INDEX_KEY not in g.pack()
+        with open_graf(path) as lz:
+            assert lz.supertitle == "Catalog"
+
+    def test_legacy_file_rebuilt(self, toc_file):
+        path = toc_file
+        with h5py.File(path, 'a') as fh:
+            del fh[INDEX_KEY]
+        index = inspect_graf(path)
+        assert index["rebuilt"] is True
+        tr = [e for e in index["entries"] if e["kind"] == "trace"][0]
+        assert tr["shape"] == [100]
+        assert tr["min"] is None
+
+
+# ---------------------------------------------------------------------------
+# In-place appends
+# ---------------------------------------------------------------------------
+
+class TestAppend:
+
+    def _new_trace(self, label="run 2"):
+        fig, ax = plt.subplots()
+        line, = ax.plot(np.arange(5.0), np.arange(5.0) ** 2, label=label)
+        tr = Trace(line)
+        plt.close(fig)
+        return tr
+
+    def test_append_trace_roundtrip(self, big_file):
+        path, _ = big_file(name="grow.graf")
+        assert append_trace(path, (0, 0), self._new_trace()) == "axes/Ax0/traces/Tr2"
+        g = Graf()
+        g.read_graf(path)
+        assert len(g.axes['Ax0'].traces) == 3
+        assert np.array_equal(g.get_ydata(trace_label="run 2"), np.arange(5.0) ** 2)
+
+    def test_existing_datasets_untouched(self, big_file):
+        path, _ = big_file(name="grow.graf")
+        with h5py.File(path, 'r') as fh:
+            before = fh['axes/Ax0/traces/Tr0/x_data'].id.get_offset()
+        append_trace(path, (0, 0), self._new_trace())
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/Tr0/x_data'].id.get_offset() == before
+
+    def test_history_and_index_updated(self, big_file):
+        path, _ = big_file(name="grow.graf")
+        append_trace(path, (0, 0), self._new_trace(), source_app="daq 1.0")
+        g = Graf()
+        g.read_graf(path)
+        last = g.info.history[-1]
+        assert last["action"] == "appended trace"
+        assert last["appended"] == "axes/Ax0/traces/Tr2"
+        assert last["app"] == "daq 1.0" and "rewritten" not in last
+        assert len(g.info.history) == 2
+        index = inspect_graf(path)
+        ax = [e for e in index["entries"] if e["kind"] == "axis"][0]
+        assert ax["n_traces"] == 3
+        tr = [e for e in index["entries"] if e["path"] == "axes/Ax0/traces/Tr2"][0]
+        assert tr["label"] == "run 2"
+        assert tr["max"] == 16.0
+
+    def test_uses_recorded_storage(self, big_file):
+        path, _ = big_file(name="grow.graf", storage={"min_bytes": 0})
+        append_trace(path, (0, 0), self._new_trace())
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/Tr2/x_data'].compression == "gzip"
+
+    def test_missing_axis(self, big_file):
+        path, _ = big_file(name="grow.graf")
+        with pytest.raises(KeyError):
+            append_trace(path, (3, 3), self._new_trace())
+
+    def test_append_axis(self, big_file):
+        path, _ = big_file(name="grow.graf")
+        fig, axs = plt.subplots(1, 2)
+        axs[1].plot([1, 2, 3], [4, 5, 6], label="side")
+        axs[1].set_title("added")
+        ax = Axis(GraphStyle(), axs[1])
+        plt.close(fig)
+        assert append_axis(path, ax) == "axes/Ax1"
+        g = Graf()
+        g.read_graf(path)
+        assert g.get_axis((0, 1)).title == "added"
+        assert inspect_graf(path)["n_axes"] == 2
+        plt.close(g.to_fig())
+
+    def test_graf_method_mirrors_in_memory(self, big_file):
+        path, _ = big_file(name="grow.graf")
+        with open_graf(path) as g:
+            g.append_trace(path, (0, 0), self._new_trace())
+            assert len(g.axes['Ax0'].traces) == 3
+            assert g.info.history[-1]["action"] == "appended trace"
+        g2 = Graf()
+        g2.read_graf(path)
+        assert len(g2.axes['Ax0'].traces) == 3
+
+
+# ---------------------------------------------------------------------------
+# In-place style/metadata updates
+# ---------------------------------------------------------------------------
+
+class TestUpdate:
+
+    @pytest.fixture
+    def restyle_file(self, big_file):
+        def tweak(fig):
+            fig.axes[0].set_title("before")
+            fig.axes[0].set_xlabel("x")
+        return big_file(name="restyle.graf", tweak=tweak, description="old")[0]
+
+    def _offsets(self, path):
+        with h5py.File(path, 'r') as fh:
+            return [fh[f'axes/Ax0/traces/Tr{i}/{f}'].id.get_offset()
+                    for i in range(2) for f in ("x_data", "y_data")]
+
+    def test_style_object(self, restyle_file):
+        path = restyle_file
+        before = self._offsets(path)
+        style = GraphStyle()
+        style.set_all_font_families("serif")
+        style.title_font.bold = True
+        update_graf(path, style=style)
+        g = Graf()
+        g.read_graf(path)
+        assert g.style.title_font.font == "serif"
+        assert g.style.title_font.bold
+        assert self._offsets(path) == before
+
+    def test_partial_updates(self, restyle_file):
+        path = restyle_file
+        written = update_graf(path, style={"label_font": {"italic": True}},
+                              info={"description": "new"},
+                              axes_meta={(0, 0): {"title": "after", "x_axis": {"label": "time"}}},
+                              supertitle="Top")
+        assert "axes/Ax0/x_axis/label" in written
+        g = Graf()
+        g.read_graf(path)
+        assert g.style.label_font.italic
+        assert not g.style.title_font.italic
+        assert g.info.description == "new"
+        assert g.supertitle == "Top"
+        assert g.axes['Ax0'].title == "after"
+        assert g.axes['Ax0'].x_axis.label == "time"
+        assert g.info.history[-1]["action"] == "updated metadata"
+        assert len(g.info.history) == 2
+        assert g.info.provenance["created_utc"]
+        index = inspect_graf(path)
+        assert index["supertitle"] == "Top"
+        assert index["entries"][0]["label"] == "after"
+
+    def test_protected_fields_rejected(self, restyle_file):
+        path = restyle_file
+        with pytest.raises(ValueError):
+            update_graf(path, info={"history": []})
+        with pytest.raises(ValueError):
+            update_graf(path, axes_meta={"Ax0": {"traces": {}}})
+        with pytest.raises(KeyError):
+            update_graf(path, axes_meta={(4, 4): {"title": "nope"}})
+
+    def test_noop_leaves_history(self, restyle_file):
+        path = restyle_file
+        assert update_graf(path) == []
+        g = Graf()
+        g.read_graf(path)
+        assert len(g.info.history) == 1
+
+
+# ---------------------------------------------------------------------------
+# Streaming writer
+# ---------------------------------------------------------------------------
+
+class TestStreamWriter:
+
+    def test_roundtrip(self, tmp_path):
+        path = str(tmp_path / "run.graf")
+        with GrafStreamWriter(path, traces=["a", "b"], buffer_points=64) as w:
+            for i in range(20):
+                x = np.arange(10.0) + 10 * i
+                w.append(x, np.sin(x), trace="a")
+            w.append(1.0, 2.0, trace="b")
+        g = Graf()
+        g.read_graf(path)
+        x = np.arange(200.0)
+        assert np.array_equal(g.get_xdata(trace_label="a"), x)
+        assert np.allclose(g.get_ydata(trace_label="a"), np.sin(x))
+        assert np.array_equal(g.get_xdata(trace_label="b"), [1.0])
+
+    def test_datasets_are_resizable(self, tmp_path):
+        path = str(tmp_path / "run.graf")
+        with GrafStreamWriter(path, traces=["a"], chunk_points=128) as w:
+            w.append(np.arange(1000), np.arange(1000))
+        with h5py.File(path, 'r') as fh:
+            ds = fh['axes/Ax0/traces/Tr0/x_data']
+            assert ds.maxshape == (None,)
+            assert ds.chunks == (128,)
+            assert ds.dtype == np.float64
+
+    def test_template_figure(self, tmp_path):
+        fig, ax = plt.subplots()
+        ax.plot([0.0, 1.0], [5.0, 6.0], label="sweep")
+        ax.set_xlabel("Time (s)")
+        path = str(tmp_path / "run.graf")
+        with GrafStreamWriter(path, fig) as w:
+            w.append([2.0, 3.0], [7.0, 8.0])
+        plt.close(fig)
+        g = Graf()
+        g.read_graf(path)
+        assert np.array_equal(g.get_xdata(), [0.0, 1.0, 2.0, 3.0])
+        ax = g.axes['Ax0']
+        assert ax.x_axis.label == "Time (s)"
+        assert ax.x_axis.val_max >= 3.0
+        assert ax.y_axis_L.val_max >= 8.0
+        plt.close(g.to_fig())
+
+    def test_flushed_data_survives_crash(self, tmp_path):
+        path = str(tmp_path / "run.graf")
+        w = GrafStreamWriter(path, traces=["a"])
+        w.append(np.arange(5.0), np.arange(5.0))
+        w.flush()
+        w.append(np.arange(5.0), np.arange(5.0))
+        w._fh.close()  # process dies without close()
+        g = Graf()
+        g.read_graf(path)
+        assert np.array_equal(g.get_xdata(), np.arange(5.0))
+
+    def test_provenance_and_index(self, tmp_path):
+        path = str(tmp_path / "run.graf")
+        with GrafStreamWriter(path, traces=["a"], source_app="daq") as w:
+            w.append([1.0, np.nan, 3.0], [4.0, 5.0, 6.0])
+        g = Graf()
+        g.read_graf(path)
+        assert g.info.history[-1]["action"] == "streamed"
+        assert g.info.provenance["source_format"] == "stream"
+        tr = inspect_graf(path)["entries"][1]
+        assert tr["shape"] == [3]
+        assert tr["max"] == 6.0
+        assert tr["datasets"]["x_data"]["nan_count"] == 1
+
+    def test_bad_appends(self, tmp_path):
+        path = str(tmp_path / "run.graf")
+        with GrafStreamWriter(path, traces=["a", "b"]) as w:
+            with pytest.raises(ValueError):
+                w.append([1.0], [1.0])
+            with pytest.raises(KeyError):
+                w.append([1.0], [1.0], trace="c")
+            with pytest.raises(ValueError):
+                w.append([1.0, 2.0], [1.0], trace="a")
+
+    def test_swmr_reader_sees_flushed_data(self, tmp_path):
+        path = str(tmp_path / "run.graf")
+        with GrafStreamWriter(path, traces=["a"], swmr=True) as w:
+            w.append(np.arange(5.0), np.arange(5.0))
+            w.flush()
+            with h5py.File(path, 'r', swmr=True) as fh:
+                assert fh['axes/Ax0/traces/Tr0/x_data'].shape == (5,)
+
+
+# ---------------------------------------------------------------------------
+# Lossy precision policies
+# ---------------------------------------------------------------------------
+
+class TestPrecision:
+
+    @pytest.fixture
+    def lossy_file(self, write_fig):
+        def write(precision, n=5000, tweak=None):
+            x = np.linspace(0, 10, n)
+            y = np.sin(x) * 100
+            y[5] = np.nan
+            y[6] = np.inf
+            fig, ax = plt.subplots()
+            ax.plot(x, y, label="main")
+            ax.plot(x, y * 2, label="exempt")
+            return write_fig(fig, "lossy.graf", tweak=tweak, precision=precision)[0], x, y
+        return write
+
+    def _ds(self, path, key="Tr0", field="y_data"):
+        with h5py.File(path, 'r') as fh:
+            ds = fh[f'axes/Ax0/traces/{key}/{field}']
+            return ds.dtype, dict(ds.attrs)
+
+    def test_float32_cast(self, lossy_file):
+        path, x, y = lossy_file("float32")
+        dtype, attrs = self._ds(path)
+        assert dtype == np.float32
+        assert attrs["graf_encoding"] == "float32"
+        g = Graf()
+        g.read_graf(path)
+        y2 = g.get_ydata()
+        assert y2.dtype == np.float64
+        assert np.allclose(y2, y, rtol=1e-6, equal_nan=True)
+        assert np.isinf(y2[6])
+
+    def test_quantize_within_bound(self, lossy_file):
+        policy = PrecisionPolicy("quantize", rel_tol=1e-4)
+        path, x, y = lossy_file(policy)
+        dtype, attrs = self._ds(path)
+        assert dtype == np.uint16
+        bound = attrs["graf_error_bound"]
+        assert bound == pytest.approx(1e-4 * 200, rel=1e-3)
+        g = Graf()
+        g.read_graf(path)
+        y2 = g.get_ydata()
+        finite = np.isfinite(y)
+        assert np.max(np.abs(y2[finite] - y[finite])) <= bound
+        assert np.isnan(y2[5]) and y2[6] == np.inf
+
+    def test_bound_not_met_stays_exact(self, lossy_file):
+        path, x, y = lossy_file(PrecisionPolicy("float16", abs_tol=1e-9))
+        dtype, attrs = self._ds(path)
+        assert dtype == np.float64
+        assert "graf_encoding" not in attrs
+
+    def test_per_trace_override(self, lossy_file):
+        def exempt(g):
+            g.axes['Ax0'].traces['Tr1'].precision = "none"
+        path, _, _ = lossy_file("float32", tweak=exempt)
+        assert self._ds(path, "Tr0")[0] == np.float32
+        assert self._ds(path, "Tr1")[0] == np.float64
+
+    def test_short_arrays_exact(self, lossy_file):
+        path, _, _ = lossy_file("float32", n=10)
+        assert self._ds(path)[0] == np.float64
+
+    @pytest.mark.parametrize("policy", [{"encoding": "quantize", "abs_tol": 1e-3},
+                                        {"encoding": "quantize", "rel_tol": 1e-4}])
+    def test_constant_array(self, save_fig, policy):
+        fig, ax = plt.subplots()
+        ax.plot(np.arange(100.0), np.full(100, 7.5))
+        ax.plot(np.arange(100.0), np.zeros(100))
+        path = save_fig(fig, "flat.graf", precision=policy)
+        g = Graf()
+        g.read_graf(path)
+        assert np.array_equal(g.get_ydata(trace_idx=0), np.full(100, 7.5))
+        assert np.array_equal(g.get_ydata(trace_idx=1), np.zeros(100))
+
+    def test_lazy_read_decodes(self, lossy_file):
+        path, x, y = lossy_file({"encoding": "quantize", "abs_tol": 1e-3})
+        with open_graf(path) as g:
+            arr = g.axes['Ax0'].traces['Tr0'].y_data
+            assert isinstance(arr, LazyArray)
+            assert arr.dtype == np.float64
+            assert np.allclose(arr[100:110], y[100:110], atol=1e-3)
+            assert np.allclose(np.asarray(arr)[10:], y[10:], atol=1e-3)
+
+    def test_index_records_encoding(self, lossy_file):
+        path, _, _ = lossy_file(PrecisionPolicy("quantize", abs_tol=0.01))
+        tr = inspect_graf(path)["entries"][1]
+        ds = tr["datasets"]["y_data"]
+        assert ds["encoding"] == "quantize"
+        assert ds["max_error"] <= 0.01
+        assert ds["stored_nbytes"] < ds["nbytes"]
+
+    def test_surface_quantized(self, tmp_path):
+        z = np.random.default_rng(3).random((200, 100))
+        fig, ax = plt.subplots()
+        ax.imshow(z)
+        g = Graf(fig)
+        plt.close(fig)
+        path = str(tmp_path / "surf.graf")
+        g.write_graf(path, precision=PrecisionPolicy("quantize", abs_tol=1e-3))
+        sf = read_surface(path, (0, 0))
+        assert np.max(np.abs(sf.z_grid - z)) <= 1e-3
+
+    def test_checked_on_read(self, lossy_file):
+        path, _, _ = lossy_file(PrecisionPolicy("quantize", abs_tol=0.01))
+        with h5py.File(path, 'a') as fh:
+            fh['axes/Ax0/traces/Tr0/y_data'].attrs["graf_scale"] = 1.0
+        with pytest.raises(ValueError):
+            read_trace(path, (0, 0), 0)
+        with h5py.File(path, 'a') as fh:
+            fh['axes/Ax0/traces/Tr0/y_data'].attrs["graf_encoding"] = "zfp"
+        with pytest.raises(ValueError):
+            read_trace(path, (0, 0), 0)
+
+    def test_bad_policy_rejected(self):
+        with pytest.raises(ValueError):
+            PrecisionPolicy("quantize")
+        with pytest.raises(ValueError):
+            PrecisionPolicy("bfloat16")
+
+
+# ---------------------------------------------------------------------------
+# Shared and arithmetic data arrays
+# ---------------------------------------------------------------------------
+
+class TestSharedData:
+
+    @pytest.fixture
+    def shared_file(self, save_fig):
+        def save(x, n_traces=20):
+            fig, ax = plt.subplots()
+            for i in range(n_traces):
+                ax.plot(x, np.cos(x * (i + 1)), label=f"t{i}")
+            return save_fig(fig, "shared.graf")
+        return save
+
+    def test_duplicates_stored_once(self, shared_file):
+        x = np.sort(np.random.default_rng(0).random(5000))
+        path = shared_file(x)
+        with h5py.File(path, 'r') as fh:
+            trs = fh['axes/Ax0/traces']
+            first = trs['Tr0/x_data']
+            assert all(trs[f'Tr{i}/x_data'] == first for i in range(20))
+            assert trs['Tr0/y_data'] != trs['Tr1/y_data']
+        g = Graf()
+        g.read_graf(path)
+        xs = [g.get_xdata(trace_idx=i) for i in range(20)]
+        assert np.array_equal(xs[7], x)
+        assert all(np.shares_memory(xs[0], xi) for xi in xs)
+        assert not xs[0].flags.writeable
+
+    def test_linspace_stored_as_parameters(self, shared_file):
+        x = np.linspace(-3, 7, 100_000)
+        path = shared_file(x, n_traces=2)
+        with h5py.File(path, 'r') as fh:
+            ds = fh['axes/Ax0/traces/Tr0/x_data']
+            assert ds.shape == (4,)
+            assert ds.attrs["__pytype__"] == "arithmetic"
+        g = Graf()
+        g.read_graf(path)
+        assert np.array_equal(g.get_xdata(), x)
+        assert g.get_xdata().dtype == np.float64
+        assert inspect_graf(path)["entries"][1]["datasets"]["x_data"]["encoding"] == "arithmetic"
+
+    @pytest.mark.parametrize("lazy", [False, True])
+    def test_linspace_shared(self, shared_file, lazy):
+        x = np.linspace(0, 1, 2000)
+        path = shared_file(x, n_traces=50)
+        with h5py.File(path, 'r') as fh:
+            trs = fh['axes/Ax0/traces']
+            assert all(trs[f'Tr{i}/x_data'] == trs['Tr0/x_data'] for i in range(50))
+        g = Graf()
+        g.read_graf(path, lazy=lazy)
+        xs = [g.get_xdata(trace_idx=i) for i in range(50)]
+        assert np.array_equal(xs[49], x)
+        assert all(np.shares_memory(xs[0], xi) for xi in xs)
+        assert not xs[0].flags.writeable
+        g.close()
+
+    @pytest.mark.parametrize("x", [np.arange(0, 500, 5), np.linspace(0, 1, 300, dtype=np.float32)])
+    def test_arithmetic_roundtrip_exact(self, x, shared_file):
+        path = shared_file(x, n_traces=1)
+        tr = read_trace(path, (0, 0), 0)
+        assert tr.x_data.dtype == x.dtype
+        assert np.array_equal(tr.x_data, x)
+
+    def test_near_arithmetic_stays_exact(self, shared_file):
+        x = np.linspace(0, 1, 1000)
+        x[500] += 1e-12
+        path = shared_file(x, n_traces=1)
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/Tr0/x_data'].shape == (1000,)
+        assert np.array_equal(read_trace(path, (0, 0), 0).x_data, x)
+
+    def test_lazy_shared(self, shared_file):
+        x = np.sort(np.random.default_rng(1).random(5000))
+        path = shared_file(x, n_traces=3)
+        with open_graf(path) as g:
+            trs = g.axes['Ax0'].traces
+            assert trs['Tr0'].x_data is trs['Tr2'].x_data
+            assert np.array_equal(np.asarray(trs['Tr1'].x_data), x)
+
+
+# ---------------------------------------------------------------------------
+# Trace tables (axes with many traces)
+# ---------------------------------------------------------------------------
+
+class TestTraceTable:
+
+    @pytest.fixture
+    def table_file(self, write_fig):
+        def write(n_traces=300, **kwargs):
+            rng = np.random.default_rng(3)
+            x = np.sort(rng.random(100))
+            fig, ax = plt.subplots()
+            for i in range(n_traces):
+                ax.plot(x, rng.random(100) + i, label=f"run{i}", linewidth=1 + i % 3)
+            ax.plot(np.arange(7), np.arange(7, dtype=np.int32), label="ints")
+            return write_fig(fig, "table.graf", **kwargs)
+        return write
+
+    def test_selected_above_threshold(self, table_file):
+        path, _ = table_file()
+        with h5py.File(path, 'r') as fh:
+            grp = fh['axes/Ax0/traces']
+            assert grp.attrs["__pytype__"] == "record_table"
+            assert "Tr0" not in grp
+            assert len(grp['keys']) == 301
+        assert inspect_graf(path)["entries"][0]["trace_layout"] == "table"
+
+    def test_below_threshold_uses_groups(self, table_file):
+        path, _ = table_file(n_traces=10)
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces'].attrs["__pytype__"] == "dict"
+        path, _ = table_file(trace_table_min=0)
+        with h5py.File(path, 'r') as fh:
+            assert "Tr0" in fh['axes/Ax0/traces']
+
+    def test_roundtrip(self, table_file):
+        path, g = table_file()
+        g2 = Graf()
+        g2.read_graf(path)
+        trs, trs2 = g.axes['Ax0'].traces, g2.axes['Ax0'].traces
+        assert list(trs2.keys()) == list(trs.keys())
+        for key in ("Tr0", "Tr17", "Tr300"):
+            for f in Trace.DATA_FIELDS:
+                a, b = getattr(trs[key], f), getattr(trs2[key], f)
+                assert np.array_equal(a, b) and a.dtype == b.dtype
+            assert trs2[key].display_name == trs[key].display_name
+            assert trs2[key].line_width == trs[key].line_width
+            assert tuple(trs2[key].line_color) == tuple(trs[key].line_color)
+        assert g2.get_trace(trace_label="run42").display_name == "run42"
+        assert g2.to_fig() is not None
+
+    def test_shared_x_stored_once(self, table_file):
+        path, g = table_file()
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/x_data/values'].shape == (100 + 7,)
+        g2 = Graf()
+        g2.read_graf(path)
+        x0, x1 = g2.get_xdata(trace_idx=0), g2.get_xdata(trace_idx=1)
+        assert np.shares_memory(x0, x1)
+        assert not x0.flags.writeable
+
+    def test_read_trace_and_lazy(self, table_file):
+        path, g = table_file()
+        tr = read_trace(path, (0, 0), trace_label="run5")
+        assert np.array_equal(tr.y_data, g.axes['Ax0'].traces['Tr5'].y_data)
+        assert read_trace(path, (0, 0), 300).y_data.dtype == np.int32
+        assert read_trace(path, (0, 0), trace_label="missing") is None
+        with open_graf(path) as g2:
+            y = g2.axes['Ax0'].traces['Tr9'].y_data
+            assert isinstance(y, LazyArray) and not y.loaded
+            assert np.array_equal(y[10:20], g.axes['Ax0'].traces['Tr9'].y_data[10:20])
+            assert np.array_equal(np.asarray(y), g.axes['Ax0'].traces['Tr9'].y_data)
+
+    def test_precision_applies_per_column(self, table_file):
+        path, g = table_file(precision=PrecisionPolicy("quantize", abs_tol=1e-3))
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/y_data/values'].attrs["graf_encoding"] == "quantize"
+        g2 = Graf()
+        g2.read_graf(path)
+        err = np.abs(g2.axes['Ax0'].traces['Tr12'].y_data - g.axes['Ax0'].traces['Tr12'].y_data)
+        assert err.max() <= 1e-3
+
+    def test_append_trace(self, table_file):
+        path, _ = table_file()
+        new = Trace()
+        new.x_data = np.arange(3.0)
+        new.y_data = np.array([3.0, 1.0, 2.0])
+        new.display_name = "appended"
+        assert append_trace(path, (0, 0), new) == "axes/Ax0/traces/Tr301"
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces'].attrs["__pytype__"] == "record_table"
+        assert np.array_equal(read_trace(path, (0, 0), trace_label="appended").y_data, new.y_data)
+        assert inspect_graf(path)["entries"][0]["n_traces"] == 302
+        g = Graf()
+        g.read_graf(path)
+        last = g.info.history[-1]
+        assert last["action"] == "rewrote trace table" and last["rewritten"] == "axes/Ax0/traces"
+
+
+# ---------------------------------------------------------------------------
+# Multi-figure archives
+# ---------------------------------------------------------------------------
+
+class TestArchive:
+
+    def test_add_and_read(self, tmp_path):
+        path = str(tmp_path / "campaign.grafa")
+        with GrafArchive(path, "w") as arc:
+            arc.add("a", Graf(make_big_fig(200)[0], description="first", conditions={"temp_C": 25}))
+            arc.add("b", make_big_fig(200, 1.0)[0])
+        with GrafArchive(path, "r") as arc:
+            assert arc.names() == ["a", "b"]
+            assert "b" in arc and len(arc) == 2
+            g = arc.read("b")
+        assert np.allclose(g.get_ydata(), np.sin(np.linspace(0, 10, 200)) + 1.0)
+        assert g.info.provenance["created_utc"]
+
+    def test_index_scan(self, tmp_path):
+        path = str(tmp_path / "campaign.grafa")
+        with GrafArchive(path) as arc:
+            g = Graf(make_big_fig(200)[0], description="first", conditions={"temp_C": 25})
+            arc.add("a", g)
+        index = inspect_archive(path)
+        entry = index["members"][0]
+        assert entry["name"] == "a"
+        assert entry["description"] == "first"
+        assert entry["conditions"] == {"temp_C": 25}
+        assert entry["content_sha256"] == g.info.history[-1]["content_sha256"]
+        assert entry["created_utc"] == g.info.provenance["created_utc"]
+        assert entry["n_traces"] == 2
+
+    def test_append_in_place(self, tmp_path):
+        path = str(tmp_path / "campaign.grafa")
+        with GrafArchive(path) as arc:
+            arc.add("a", make_big_fig(200)[0])
+        with h5py.File(path, 'r') as fh:
+            ds_id = fh['members/a/axes/Ax0/traces/Tr0/y_data'].id.get_offset()
+        with GrafArchive(path) as arc:
+            arc.add("b", make_big_fig(200, 2.0)[0])
+            with pytest.raises(ValueError):
+                arc.add("b", make_big_fig(200)[0])
+            arc.add("b", make_big_fig(200, 3.0)[0], overwrite=True)
+        with h5py.File(path, 'r') as fh:
+            assert fh['members/a/axes/Ax0/traces/Tr0/y_data'].id.get_offset() == ds_id
+        with GrafArchive(path, "r") as arc:
+            assert arc.names() == ["a", "b"]
+            assert np.allclose(arc.read("b").get_ydata()[0], 3.0)
+
+    def test_lazy_member(self, tmp_path):
+        path = str(tmp_path / "campaign.grafa")
+        with GrafArchive(path) as arc:
+            arc.add("a", make_big_fig(200)[0])
+            arc.add("b", make_big_fig(200, 1.0)[0])
+        with GrafArchive(path, "r") as arc:
+            g = arc.read("a", lazy=True)
+            y = g.axes['Ax0'].traces['Tr0'].y_data
+            assert isinstance(y, LazyArray) and not y.loaded
+            assert np.allclose(np.asarray(y), np.sin(np.linspace(0, 10, 200)))
+            assert arc.inspect("a")["n_axes"] == 1
+
+    def test_remove_and_errors(self, tmp_path):
+        path = str(tmp_path / "campaign.grafa")
+        with GrafArchive(path) as arc:
+            arc.add("a", make_big_fig(200)[0])
+            arc.remove("a")
+            assert arc.names() == []
+            with pytest.raises(KeyError):
+                arc.read("a")
+            with pytest.raises(ValueError):
+                arc.add("x/y", make_big_fig(200)[0])
+        plain = str(tmp_path / "plain.graf")
+        save_graf(make_big_fig(200)[0], plain)
+        with pytest.raises(ValueError):
+            GrafArchive(plain, "r")
+        with pytest.raises(ValueError):
+            inspect_archive(plain)
+
+
+# ---------------------------------------------------------------------------
+# Background saves
+# ---------------------------------------------------------------------------
+
+class TestAsyncSave:
+
+    def test_snapshot_isolated_from_figure(self, tmp_path):
+        x = np.arange(100.0)
+        y = np.sin(x)
+        fig, ax = plt.subplots()
+        ax.plot(x, y)
+        path = str(tmp_path / "snap.graf")
+        with AsyncSaver() as saver:
+            fut = save_graf_async(fig, path, saver=saver)
+            y[:] = 0.0  # mutated after submit; must not reach the file
+            fut.result()
+        g = Graf()
+        g.read_graf(path)
+        assert np.allclose(g.get_ydata(), np.sin(x))
+
+    def test_write_graf_async_updates_provenance(self, tmp_path):
+        g = Graf(make_big_fig(1000)[0])
+        path = str(tmp_path / "a.graf")
+        with AsyncSaver() as saver:
+            snap = g.write_graf_async(path, saver=saver, precision="float32").result()
+        assert g.info.history[-1]["content_sha256"] == snap.info.history[-1]["content_sha256"]
+        with h5py.File(path, 'r') as fh:
+            assert fh['axes/Ax0/traces/Tr0/y_data'].dtype == np.float32
+
+    def test_queued_saves_merge_history(self, tmp_path):
+        g = Graf(make_big_fig(1000)[0])
+        with AsyncSaver(max_pending=4) as saver:
+            futures = [g.write_graf_async(str(tmp_path / "a.graf"), saver=saver),
+                       g.write_graf_async(str(tmp_path / "b.graf"), saver=saver)]
+            g.supertitle = "changed"
+            futures.append(g.write_graf_async(str(tmp_path / "c.graf"), saver=saver))
+            for f in futures:
+                f.result()
+        assert [e["action"] for e in g.info.history] == ["created", "saved"]
+        assert g.info.history[-1]["content_sha256"] == g._data_hash()
+
+    def test_bounded_queue(self, tmp_path):
+        saver = AsyncSaver(max_pending=2)
+        g = Graf(make_big_fig(2000)[0])
+        futures = [g.write_graf_async(str(tmp_path / f"f{i}.graf"), saver=saver) for i in range(6)]
+        assert saver.pending <= 2
+        saver.shutdown()
+        assert all(f.done() and f.exception() is None for f in futures)
+        assert saver.pending == 0
+        with pytest.raises(ValueError):
+            AsyncSaver(max_pending=0)
+
+    def test_errors_on_future(self, tmp_path):
+        g = Graf(make_big_fig(100)[0])
+        with AsyncSaver() as saver:
+            fut = g.write_graf_async(str(tmp_path / "x.json"), saver=saver, precision="float32")
+            with pytest.raises(ValueError):
+                fut.result()
+            ok = g.write_graf_async(str(tmp_path / "y.graf"), saver=saver)
+            assert ok.result() is not None
+
+
+# ---------------------------------------------------------------------------
+# Content hash
+# ---------------------------------------------------------------------------
+
+class TestContentHash:
+
+    def test_layout_independent(self):
+        a = np.arange(24.0).reshape(4, 6)
+        h = _stable_content_hash({"z": a, "n": 3})
+        assert h == _stable_content_hash({"n": np.int64(3), "z": a.astype(">f8")})
+        assert h == _stable_content_hash({"n": 3, "z": np.asfortranarray(a)})
+        assert h != _stable_content_hash({"n": 3, "z": a.astype(np.float32)})
+        assert h != _stable_content_hash({"n": 3, "z": a.reshape(6, 4)})
+        assert _stable_content_hash([1.0, np.nan]) == _stable_content_hash((np.float32(1.0), float("nan")))
+
+    def test_pack_once_per_save(self, tmp_path, monkeypatch):
+        g = Graf(make_big_fig(1000)[0])
+        calls = []
+        pack = Graf.pack
+        monkeypatch.setattr(Graf, "pack", lambda self, *a, **k: calls.append(1) or pack(self, *a, **k))
+        g.write_graf(str(tmp_path / "a.graf"))
+        assert len(calls) == 1
+        g.write_graf(str(tmp_path / "a.graf"))
+        assert [e["action"] for e in g.info.history] == ["created"]
+        g2 = Graf()
+        g2.read_graf(str(tmp_path / "a.graf"))
+        assert g2.info.history[-1]["content_sha256"] == g._data_hash()
+
+    def test_cached_array_digests(self, monkeypatch):
+        import graf.base as gb
+        g = Graf(make_big_fig(1000)[0])
+        h0 = g._data_hash()
+        leaves = []
+        leaf = gb.leaf_digest
+        monkeypatch.setattr(gb, "leaf_digest", lambda o: leaves.append(o) or leaf(o))
+        g.axes["Ax0"].title = "changed"
+        h1 = g._data_hash()
+        assert h1 != h0
+        assert not any(isinstance(o, np.ndarray) and o.size >= 1000 for o in leaves)
+        tr = g.axes["Ax0"].traces["Tr0"]
+        with pytest.raises(ValueError):
+            tr.y_data[0] = 5.0  # hashed arrays are frozen
+        tr.mark_modified()
+        tr.y_data[0] = 5.0
+        h2 = g._data_hash()
+        assert h2 != h1
+        tr.y_data = tr.y_data.copy()
+        assert g._data_hash() == h2
+
+    def test_views_not_frozen(self):
+        base = np.linspace(0, 1, 1000)
+        g = Graf(make_big_fig(1000)[0])
+        tr = g.axes["Ax0"].traces["Tr0"]
+        tr.y_data = base[::1]  # a view of a writeable array can't be protected
+        h0 = g._data_hash()
+        base[0] = 5.0
+        assert tr.y_data.flags.writeable
+        assert g._data_hash() != h0
+
+    def test_shared_array_thawed(self):
+        g = Graf(make_big_fig(1000)[0])
+        ax = g.axes["Ax0"]
+        ax.traces["Tr1"].y_data = ax.traces["Tr0"].y_data
+        h0 = g._data_hash()
+        ax.traces["Tr0"].mark_modified()
+        ax.traces["Tr1"].y_data[0] = 5.0
+        assert g._data_hash() != h0
+
+    def test_unchanged_save_skipped(self, tmp_path):
+        path = tmp_path / "a.graf"
+        g = Graf(make_big_fig(1000)[0])
+        g.write_graf(str(path))
+        stamp = path.stat().st_mtime_ns
+        g.write_graf(str(path), skip_unchanged=True)
+        assert path.stat().st_mtime_ns == stamp
+        g.write_graf(str(path), storage="gzip", skip_unchanged=True)  # different options: rewritten
+        stamp = path.stat().st_mtime_ns
+        g.supertitle = "new"
+        g.write_graf(str(path), storage="gzip", skip_unchanged=True)
+        assert path.stat().st_mtime_ns != stamp
+        assert [e["action"] for e in g.info.history] == ["created", "saved"]
+
+    @pytest.mark.parametrize("ext", ["graf", "json"])
+    def test_failed_write_raises(self, tmp_path, monkeypatch, ext):
+        import graf.storage as gs
+        import graf.codecs as gc
+        path = tmp_path / f"a.{ext}"
+        g = Graf(make_big_fig(1000)[0])
+        g.write_graf(str(path))
+        g.supertitle = "changed"
+        monkeypatch.setattr(gs, "write_dict", lambda *a, **k: 1 / 0)
+        monkeypatch.setattr(gc, "_to_tree", lambda *a, **k: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            g.write_graf(str(path))
+        assert [e["action"] for e in g.info.history] == ["created"]
+        if ext == "json":     # failed before the file was touched
+            old = Graf()
+            old.read_graf(str(path))
+            assert old.supertitle == ""
+        else:                 # the truncated HDF5 file is removed
+            assert not path.exists()
+        with pytest.raises(OSError):
+            g.write_graf(str(tmp_path / "missing" / "a.graf"))
+
+    @pytest.mark.parametrize("skip_unchanged", [False, True])
+    def test_in_place_edit_written(self, tmp_path, skip_unchanged):
+        path = str(tmp_path / "a.graf")
+        g = Graf(make_big_fig(1000)[0])
+        g.write_graf(path)
+        tr = g.axes["Ax0"].traces["Tr0"]
+        with pytest.raises(ValueError):
+            tr.y_data[:] = 7
+        tr.mark_modified()
+        tr.y_data[:] = 7
+        g.write_graf(path, skip_unchanged=skip_unchanged)
+        assert [e["action"] for e in g.info.history] == ["created", "saved"]
+        assert g.info.history[-1]["content_sha256"] == g._data_hash()
+        g2 = Graf()
+        g2.read_graf(path)
+        assert np.all(g2.axes["Ax0"].traces["Tr0"].y_data == 7)
+
+
+# ---------------------------------------------------------------------------
+# Content digests in the file
+# ---------------------------------------------------------------------------
+
+class TestDigests:
+
+    @pytest.mark.parametrize("kw", [{}, {"storage": "gzip"}, {"precision": {"encoding": "quantize", "abs_tol": 1e-4}},
+                                    {"trace_table_min": 2}])
+    def test_verify_clean_file(self, tmp_path, kw):
+        path = str(tmp_path / "a.graf")
+        Graf(make_big_fig(500)[0]).write_graf(path, **kw)
+        report = verify_graf(path)
+        assert report["ok"] and report["checked"] > 10 and not report["unverified"]
+
+    def test_tables_hashed_in_memory(self, tmp_path, monkeypatch):
+        import graf.storage as gs
+        fig = make_big_fig(500)[0]
+        fig.axes[0].plot(np.arange(5.0), np.arange(5, dtype=np.float32))
+        g = Graf(fig)
+        g.write_graf(str(tmp_path / "a.graf"))  # history becomes a list of dicts
+        read_back = []
+        read_value = gs.read_value
+        monkeypatch.setattr(gs, "read_value", lambda node, *a, **k: read_back.append(
+            node.attrs.get(gs.ATTR_TYPE, "")) or read_value(node, *a, **k))
+        path = str(tmp_path / "b.graf")
+        g.write_graf(path, trace_table_min=2, action="table",
+                     precision={"encoding": "quantize", "abs_tol": 1e-4})
+        assert not {"record_table", "list_of_dicts"} & set(read_back)
+        monkeypatch.undo()
+        assert verify_graf(path)["ok"]
+
+    def test_detects_corruption(self, tmp_path):
+        path = str(tmp_path / "a.graf")
+        save_graf(make_big_fig(500)[0], path)
+        with h5py.File(path, 'a') as fh:
+            fh['axes/Ax0/traces/Tr1/y_data'][3] = 7.0
+        report = verify_graf(path)
+        assert not report["ok"]
+        assert "axes/Ax0/traces/Tr1/y_data" in report["mismatched"]
+        assert "" in report["mismatched"]
+        assert verify_graf(path, paths=["axes/Ax0/traces/Tr0"])["ok"]
+        assert not verify_graf(path, paths=["axes/Ax0/traces/Tr1"])["ok"]
+
+    def test_in_place_edits_keep_digests(self, tmp_path):
+        path = str(tmp_path / "a.graf")
+        save_graf(make_big_fig(500)[0], path)
+        append_trace(path, (0, 0), Trace(plt.subplots()[1].plot([1.0, 2.0], [3.0, 4.0])[0]))
+        update_graf(path, supertitle="new", axes_meta={(0, 0): {"x_axis": {"label": "t (s)"}}})
+        assert verify_graf(path)["ok"]
+        stream = str(tmp_path / "s.graf")
+        with GrafStreamWriter(stream, traces=["a"], buffer_points=10) as w:
+            for i in range(5):
+                w.append(np.arange(20.0) + 20 * i, np.ones(20))
+        assert verify_graf(stream)["ok"]
+
+    def test_diff(self, tmp_path):
+        a, b, c = (str(tmp_path / f"{n}.graf") for n in "abc")
+        g = Graf(make_big_fig(500)[0])
+        g.write_graf(a)
+        g.write_graf(b)
+        save_graf(make_big_fig(500, 1.0)[0], c)
+        assert diff_graf(a, b)["identical"]
+        d = diff_graf(a, c)
+        assert "axes/Ax0/traces/Tr0/y_data" in d["changed"]
+        assert not any(p.startswith("axes/Ax0/traces/Tr1") for p in d["changed"])
+        assert not [p for p in d["added"] + d["removed"] if not p.startswith("info/")]
+        append_trace(c, (0, 0), g.axes["Ax0"].traces["Tr1"])
+        assert "axes/Ax0/traces/Tr2" in diff_graf(a, c)["added"]
+
+
+# ---------------------------------------------------------------------------
+# Machine identity
+# ---------------------------------------------------------------------------
+
+class TestSystemInfo:
+
+    def test_probed_once(self, tmp_path, monkeypatch):
+        import graf.base as gb
+        calls = []
+        probe = gb._probe_system_info
+        monkeypatch.setattr(gb, "_probe_system_info", lambda: calls.append(1) or probe())
+        gb.set_system_info()
+        try:
+            for i in range(3):
+                save_graf(make_big_fig(100)[0], str(tmp_path / f"f{i}.graf"))
+            assert len(calls) == 1
+            gb.system_info(refresh=True)
+            assert len(calls) == 2
+        finally:
+            gb.set_system_info()
+
+    def test_override(self, tmp_path, monkeypatch):
+        import graf.base as gb
+        monkeypatch.setattr(gb, "_probe_system_info", lambda: pytest.fail("machine was probed"))
+        gb.set_system_info({"hostname": "bench-7", "cpu_model": "x"}, os_platform="Linux")
+        try:
+            path = str(tmp_path / "a.graf")
+            save_graf(make_big_fig(100)[0], path)
+            g = Graf()
+            g.read_graf(path)
+            prov = g.info.provenance
+            assert prov["hostname"] == "bench-7" and prov["os_platform"] == "Linux"
+            assert "machine_arch" not in prov
+        finally:
+            gb.set_system_info()
+
+
+# ---------------------------------------------------------------------------
+# Decimation
+# ---------------------------------------------------------------------------
+
+class TestDecimation:
+
+    @pytest.fixture
+    def scope_fig(self):
+        def make(n=200_000):
+            rng = np.random.default_rng(0)
+            x = np.linspace(0, 1, n)
+            y = rng.normal(size=n).astype(np.float32)
+            y[12345] = 40.0      # one-sample spikes
+            y[n - 7] = -40.0
+            fig, ax = plt.subplots()
+            ax.plot(x, y, label="scope")
+            ax.plot([0, 1], [0, 1], label="short")
+            return fig, x, y
+        return make
+
+    def test_envelope_keeps_extremes(self, scope_fig):
+        fig, x, y = scope_fig()
+        g = Graf(fig, decimate=2000)
+        tr = g.get_trace(trace_label="scope")
+        assert tr.decimation == "minmax" and tr.full_length == len(y)
+        assert len(tr.y_data) <= 2000
+        assert tr.y_data.max() == 40.0 and tr.y_data.min() == -40.0
+        assert np.all(np.diff(tr.x_data) > 0)
+        assert np.array_equal(g.get_ydata(trace_label="scope", full=True), y)
+        assert not g.get_trace(trace_label="short").decimation
+
+    def test_write_time_sidecar(self, scope_fig, write_fig):
+        fig, x, y = scope_fig()
+        path, g = write_fig(fig, "scope.graf", decimate=DecimationPolicy(max_points=1000))
+        assert len(g.get_trace(trace_label="scope").y_data) == len(y)    # the Graf is untouched
+
+        with h5py.File(path, "r") as fh:
+            grp = [t for t in fh["axes/Ax0/traces"].values() if t["display_name"][()] == b"scope"][0]
+            assert grp["y_data"].shape[0] <= 1000 and grp["y_full"].shape == y.shape
+        g2 = open_graf(path)
+        assert isinstance(g2.get_trace(trace_label="scope").y_full, LazyArray)   # sidecar stays on disk
+        assert len(g2.get_ydata(trace_label="scope")) <= 1000
+        assert np.array_equal(g2.get_ydata(trace_label="scope", full=True), y)
+        assert np.allclose(g2.get_xdata(trace_label="scope", full=True), x)
+        assert len(g2.to_fig().axes[0].lines[0].get_ydata()) <= 1000
+        g2.close()
+
+    def test_fields_only_for_decimated(self, tmp_path, scope_fig):
+        from graf.storage import tree_digest
+        g = Graf(scope_fig(20_000)[0])
+        short = g.get_trace(trace_label="short")
+        assert not set(Trace.DECIMATION_FIELDS) & set(short.pack())
+        assert short.content_hash() == tree_digest(short.pack()).hex()
+        path = str(tmp_path / "a.graf")
+        g.write_graf(path, decimate=1000)
+        with h5py.File(path, "r") as fh:
+            for grp in fh["axes/Ax0/traces"].values():
+                assert ("y_full" in grp) == (grp["display_name"][()] == b"scope")
+        g2 = Graf()
+        g2.read_graf(path)
+        short = g2.get_trace(trace_label="short")
+        assert not short.unpack_report.missing
+        assert short.decimation == "" and short.full_length == 0 and len(short.y_full) == 0
+
+    def test_table_with_decimated_trace(self, save_fig):
+        fig, ax = plt.subplots()
+        x = np.linspace(0, 1, 20_000)
+        ax.plot(x, np.sin(40 * x), label="long")
+        for i in range(299):
+            ax.plot([0, 1, 2], [i, i + 1, i], label=f"short{i}")
+        path = save_fig(fig, "table.graf", decimate=1000)
+        with h5py.File(path, "r") as fh:
+            assert fh["axes/Ax0/traces"].attrs["__pytype__"] == "record_table"
+        g = Graf()
+        g.read_graf(path)
+        long, short = g.get_trace(trace_label="long"), g.get_trace(trace_label="short7")
+        assert long.decimation == "minmax" and len(long.y_data) <= 1000
+        assert np.array_equal(g.get_ydata(trace_label="long", full=True), np.sin(40 * x))
+        assert short.decimation == "" and len(short.y_full) == 0
+        assert np.array_equal(short.y_data, [7, 8, 7])
+        assert short.content_hash() == Graf(fig).get_trace(trace_label="short7").content_hash()
+
+    def test_drop_full(self, scope_fig, save_fig):
+        fig, _, y = scope_fig()
+        path = save_fig(fig, "small.graf", decimate={"max_points": 500, "keep_full": False})
+        g = Graf()
+        g.read_graf(path)
+        tr = g.get_trace(trace_label="scope")
+        assert tr.full_length == len(y) and len(tr.y_full) == 0
+        with pytest.raises(ValueError):
+            g.get_ydata(trace_label="scope", full=True)
+        assert tr.decimate(100) and len(tr.y_data) <= 100     # re-decimates the envelope
+
+    def test_policy_validation(self):
+        assert DecimationPolicy.coerce(100).max_points == 100
+        with pytest.raises(ValueError):
+            DecimationPolicy(method="lttb")
+        with pytest.raises(TypeError):
+            DecimationPolicy.coerce(1.5)
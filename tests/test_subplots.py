@@ -3,7 +3,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pytest
 
-from graf.base import Graf
+from graf.base import Graf, has_twinx, _twinned_axes, _infer_grid_positions
 from .conftest import roundtrip, roundtrip_fig
 
 
@@ -185,3 +185,41 @@ class TestReconstructSubplots:
         g, fig2 = roundtrip_fig(fig, tmp_path)
         # Each of the 3 data axes should be recreated (colorbars don't apply here)
         assert len(g.axes) == 3
+
+
+# ---------------------------------------------------------------------------
+# Twin detection and grid inference on large figures
+# ---------------------------------------------------------------------------
+
+class TestLargeLayouts:
+
+    def test_sharex_grid_has_no_twins(self):
+        fig, axes = plt.subplots(8, 8, sharex=True)
+        assert _twinned_axes(fig.axes) == set()
+        g = Graf(fig)
+        plt.close(fig)
+        assert len(g.axes) == 64
+        assert sorted(tuple(a.position) for a in g.axes.values()) == [(r, c) for r in range(8) for c in range(8)]
+
+    def test_twins_match_has_twinx(self):
+        for sharex in (True, False):
+            fig, axes = plt.subplots(3, 3, sharex=sharex)
+            for ax in axes.flat[::2]:
+                ax.twinx()
+            assert _twinned_axes(fig.axes) == {ax for ax in fig.axes if has_twinx(ax)}
+            assert len(_twinned_axes(fig.axes)) == 10
+            plt.close(fig)
+        g = Graf(fig)
+        plt.close(fig)
+        assert len(g.axes) == 9
+        assert sum(a.y_axis_R.is_valid for a in g.axes.values()) == 5
+
+    def test_inferred_grid(self):
+        fig = plt.figure()
+        axes = [fig.add_axes([0.05 + 0.1 * c, 0.05 + 0.1 * r, 0.08, 0.08]) for r in range(6) for c in range(6)]
+        wide = fig.add_axes([0.05, 0.65, 0.18, 0.08])
+        pos = _infer_grid_positions(axes + [wide])
+        plt.close(fig)
+        assert pos[axes[0]] == ([12, 0], [1, 1])       # bottom-left; rows counted from the top
+        assert pos[axes[35]] == ([2, 10], [1, 1])
+        assert pos[wide] == ([0, 0], [1, 3])
@@ -73,6 +73,36 @@ class TestPcolormeshUniform:
         sf = list(g.axes['Ax0'].surfaces.values())[0]
         assert np.allclose(np.array(sf.z_grid), Z, atol=1e-6)
 
+    def test_grid_stored_as_start_step_count(self, tmp_path):
+        X, Y = _uniform_xy(20, 15)
+        Z = _gaussian(X, Y)
+        fig, ax = plt.subplots()
+        ax.pcolormesh(X, Y, Z)
+        g = roundtrip(fig, tmp_path)
+        sf = list(g.axes['Ax0'].surfaces.values())[0]
+        assert sf.grid_layout == Surface.GRID_UNIFORM
+        assert np.asarray(sf.x_grid).shape == (3,)
+        assert np.asarray(sf.y_grid).shape == (3,)
+        # Centre coordinates were given, so matplotlib stored cell corners
+        x_vec, y_vec = sf.get_axis_vectors()
+        assert len(x_vec) == 21 and len(y_vec) == 16
+        assert np.allclose((x_vec[:-1] + x_vec[1:]) / 2, X[0, :])
+        assert np.allclose((y_vec[:-1] + y_vec[1:]) / 2, Y[:, 0])
+
+    def test_rectilinear_grid_stored_as_vectors(self, tmp_path):
+        x = np.logspace(0, 2, 12)
+        y = np.array([0.0, 0.5, 2.0, 2.2, 5.0, 9.0])
+        X, Y = np.meshgrid(x, y)
+        Z = X[:-1, :-1] * Y[:-1, :-1]
+        fig, ax = plt.subplots()
+        ax.pcolormesh(X, Y, Z)
+        g = roundtrip(fig, tmp_path)
+        sf = list(g.axes['Ax0'].surfaces.values())[0]
+        assert sf.grid_layout == Surface.GRID_RECTILINEAR
+        assert np.array_equal(sf.x_grid, x)
+        assert np.array_equal(sf.y_grid, y)
+        assert np.allclose(np.array(sf.z_grid), Z)
+
     def test_axis_labels_preserved(self, tmp_path):
         X, Y = _uniform_xy()
         Z = _gaussian(X, Y)
@@ -133,6 +163,15 @@ class TestPcolormeshNonUniform:
         x_corners = np.array(sf.x_grid)
         assert x_corners.shape == X.shape
 
+    def test_curvilinear_grid_layout(self, tmp_path):
+        X, Y, Z = self._polar_grid()
+        fig, ax = plt.subplots()
+        ax.pcolormesh(X, Y, Z)
+        g = roundtrip(fig, tmp_path)
+        sf = list(g.axes['Ax0'].surfaces.values())[0]
+        assert sf.grid_layout == Surface.GRID_CURVILINEAR
+        assert sf.get_axis_vectors() is None
+
     def test_corner_coords_values(self, tmp_path):
         X, Y, Z = self._polar_grid()
         fig, ax = plt.subplots()
@@ -158,6 +197,41 @@ class TestPcolormeshNonUniform:
         assert fig2 is not None
 
 
+# ---------------------------------------------------------------------------
+# Files written before compact grids
+# ---------------------------------------------------------------------------
+
+class TestLegacyGrids:
+
+    def test_full_2d_grids_still_load(self, tmp_path):
+        from stardust.tome import dict_to_tome
+        X, Y = _uniform_xy()
+        Z = _gaussian(X, Y)
+        fig, ax = plt.subplots()
+        ax.pcolormesh(X, Y, Z)
+        pkt = Graf(fig).pack()
+        plt.close(fig)
+
+        # Old writers stored meshgrid corner matrices and had no grid_layout
+        sf_pkt = pkt['axes']['Ax0']['surfaces']['Sf0']
+        del sf_pkt['grid_layout']
+        x_vec = np.linspace(-3, 3, 21)
+        y_vec = np.linspace(-2, 2, 16)
+        Xc, Yc = np.meshgrid(x_vec, y_vec)
+        sf_pkt['x_grid'] = Xc.tolist()
+        sf_pkt['y_grid'] = Yc.tolist()
+        path = str(tmp_path / "legacy.graf")
+        dict_to_tome(pkt, path)
+
+        g = Graf()
+        g.read_graf(path)
+        sf = g.axes['Ax0'].surfaces['Sf0']
+        assert sf.grid_layout == Surface.GRID_CURVILINEAR
+        assert np.allclose(sf.get_grid()[0], Xc)
+        fig2 = g.to_fig()
+        plt.close(fig2)
+
+
 # ---------------------------------------------------------------------------
 # Colorbar on pcolormesh
 # ---------------------------------------------------------------------------
@@ -267,6 +341,7 @@ class TestImshow:
         g = roundtrip(fig, tmp_path)
         sf = list(g.axes['Ax0'].surfaces.values())[0]
         assert sf.uniform_grid == True
+        assert sf.grid_layout == Surface.GRID_UNIFORM
 
     def test_colorbar_label_preserved(self, tmp_path):
         Z = self._z()
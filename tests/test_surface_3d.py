@@ -60,13 +60,13 @@ class TestGridReconstruction:
         X, Y, Z = _sinc_grid()
         g = roundtrip(_make_surf_fig(X, Y, Z), tmp_path)
         sf = list(g.axes['Ax0'].surfaces.values())[0]
-        assert np.array(sf.x_grid).shape == X.shape
+        assert sf.get_grid()[0].shape == X.shape
 
     def test_y_grid_shape(self, tmp_path):
         X, Y, Z = _sinc_grid()
         g = roundtrip(_make_surf_fig(X, Y, Z), tmp_path)
         sf = list(g.axes['Ax0'].surfaces.values())[0]
-        assert np.array(sf.y_grid).shape == Y.shape
+        assert sf.get_grid()[1].shape == Y.shape
 
     def test_z_grid_shape(self, tmp_path):
         X, Y, Z = _sinc_grid()
@@ -84,7 +84,7 @@ class TestGridReconstruction:
         X, Y, Z = _sinc_grid(extent=3)
         g = roundtrip(_make_surf_fig(X, Y, Z), tmp_path)
         sf = list(g.axes['Ax0'].surfaces.values())[0]
-        x = np.array(sf.x_grid)
+        x = sf.get_grid()[0]
         assert x.min() == pytest.approx(X.min(), abs=1e-6)
         assert x.max() == pytest.approx(X.max(), abs=1e-6)
 
@@ -94,6 +94,53 @@ class TestGridReconstruction:
         sf = list(g.axes['Ax0'].surfaces.values())[0]
         assert sf.uniform_grid == True
 
+    def test_grid_stored_compactly(self, tmp_path):
+        X, Y, Z = _sinc_grid()
+        g = roundtrip(_make_surf_fig(X, Y, Z), tmp_path)
+        sf = list(g.axes['Ax0'].surfaces.values())[0]
+        assert sf.grid_layout == Surface.GRID_UNIFORM
+        assert np.asarray(sf.x_grid).shape == (3,)
+        assert np.allclose(sf.get_grid()[0], X, atol=1e-6)
+        assert np.allclose(sf.get_grid()[1], Y, atol=1e-6)
+
+
+    def test_patch_order_exact(self):
+        x = np.linspace(0.1, 0.7, 13)
+        y = np.linspace(2.0, -1.0, 9)
+        X, Y = np.meshgrid(x, y)
+        Z = np.cos(X) * Y
+        fig = _make_surf_fig(X, Y, Z, rstride=1, cstride=1)
+        sf = Surface(fig.axes[0].collections[0])
+        xv, yv = sf.get_axis_vectors()
+        assert np.array_equal(xv, x)
+        assert np.array_equal(yv, y[::-1])
+        assert np.array_equal(sf.z_grid, Z[::-1, :])
+
+    def test_strided_patches(self):
+        X, Y = np.meshgrid(np.arange(13.0), np.arange(10.0))
+        Z = X * Y
+        fig = _make_surf_fig(X, Y, Z, rstride=3, cstride=4)
+        sf = Surface(fig.axes[0].collections[0])
+        drawn = ~np.isnan(sf.z_grid)
+        assert sf.z_grid.shape == Z.shape
+        assert np.array_equal(sf.z_grid[drawn], Z[drawn])
+        assert drawn[::3, :].all() and drawn[:, ::4].all() and not drawn[1, 1]
+
+    def test_curvilinear_surface(self):
+        R, T = np.meshgrid(np.linspace(1, 2, 6), np.linspace(0, np.pi, 8))
+        fig = _make_surf_fig(R * np.cos(T), R * np.sin(T), R, rstride=1, cstride=1)
+        sf = Surface(fig.axes[0].collections[0])
+        assert sf.grid_layout == Surface.GRID_CURVILINEAR
+        assert np.allclose(sf.get_grid()[0], R * np.cos(T))
+        assert np.allclose(sf.z_grid, R)
+
+    def test_nan_faces_fall_back(self):
+        X, Y, Z = _sinc_grid()
+        Z[4, 4] = np.nan
+        fig = _make_surf_fig(X, Y, Z, rstride=1, cstride=1)
+        sf = Surface(fig.axes[0].collections[0])
+        assert sf.z_grid.shape == Z.shape
+        assert np.allclose(sf.z_grid[0], Z[0])
 
 # ---------------------------------------------------------------------------
 # Labels and metadata
@@ -4,7 +4,7 @@ import matplotlib.colors as mcolors
 import numpy as np
 import pytest
 
-from graf.base import Graf, Axis
+from graf.base import Graf, Axis, save_graf
 from .conftest import roundtrip, roundtrip_fig
 
 
@@ -34,7 +34,7 @@ class TestDataFidelity:
     def test_z_data_empty_for_2d(self, xy, tmp_path):
         x, y = xy
         g = roundtrip(make_fig(x, y), tmp_path)
-        assert g.axes['Ax0'].traces['Tr0'].z_data == []
+        assert len(g.axes['Ax0'].traces['Tr0'].z_data) == 0
 
     def test_single_point(self, tmp_path):
         fig, ax = plt.subplots()
@@ -61,6 +61,24 @@ class TestDataFidelity:
         t = g.axes['Ax0'].traces['Tr0']
         assert np.allclose(t.y_data, x ** 3)
 
+    def test_data_is_ndarray(self, xy, tmp_path):
+        x, y = xy
+        g = roundtrip(make_fig(x, y), tmp_path)
+        t = g.axes['Ax0'].traces['Tr0']
+        assert isinstance(t.x_data, np.ndarray)
+        assert isinstance(t.y_data, np.ndarray)
+        assert isinstance(g.get_xdata(), np.ndarray)
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.int16, np.float64])
+    def test_dtype_preserved(self, tmp_path, dtype):
+        x = np.arange(50, dtype=dtype)
+        y = (np.arange(50) % 7).astype(dtype)
+        g = roundtrip(make_fig(x, y), tmp_path)
+        t = g.axes['Ax0'].traces['Tr0']
+        assert t.x_data.dtype == dtype
+        assert t.y_data.dtype == dtype
+        assert np.array_equal(t.y_data, y)
+
     def test_nan_in_data_preserved(self, tmp_path):
         x = np.array([1.0, 2.0, np.nan, 4.0, 5.0])
         y = np.array([1.0, np.nan, 3.0, 4.0, 5.0])
@@ -312,6 +330,44 @@ class TestTwinAxes:
         assert np.allclose(right_trace.y_data, x ** 2)
 
 
+# ---------------------------------------------------------------------------
+# Data capture
+# ---------------------------------------------------------------------------
+
+class TestCapture:
+
+    def test_copy_is_independent(self, tmp_path):
+        x = np.arange(100, dtype=np.int16)
+        line, = plt.subplots()[1].plot(x, x.astype(np.float32))
+        g = Graf(line.figure)
+        t = g.axes['Ax0'].traces['Tr0']
+        assert t.x_data.dtype == np.int16 and t.y_data.dtype == np.float32
+        assert not np.shares_memory(t.y_data, line.get_ydata())
+        line.get_ydata()[:] = -1
+        assert t.y_data[5] == 5
+        plt.close(line.figure)
+
+    def test_no_copy_shares_line_data(self, tmp_path):
+        x = np.linspace(0, 1, 1000, dtype=np.float32)
+        line, = plt.subplots()[1].plot(x, x ** 2)
+        g = Graf(line.figure, copy_data=False)
+        t = g.axes['Ax0'].traces['Tr0']
+        assert np.shares_memory(t.x_data, line.get_xdata())
+        assert np.shares_memory(t.y_data, line.get_ydata())
+        assert t.y_data.dtype == np.float32
+        plt.close(line.figure)
+
+    def test_save_graf_round_trips(self, xy, tmp_path):
+        x, y = xy
+        fig = make_fig(x, y)
+        save_graf(fig, str(tmp_path / "t.graf"))
+        plt.close(fig)
+        g = Graf()
+        g.read_graf(str(tmp_path / "t.graf"))
+        t = g.axes['Ax0'].traces['Tr0']
+        assert np.array_equal(t.x_data, x) and np.array_equal(t.y_data, y)
+
+
 # ---------------------------------------------------------------------------
 # Reconstruct without error
 # ---------------------------------------------------------------------------